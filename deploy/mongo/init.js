@@ -1,4 +1,6 @@
 db = db.getSiblingDB("talentum");
+// Solo corre con un volumen nuevo: los backfills e índices de colecciones existentes
+// también los aplica src/migraciones.py (al arrancar la API o con python -m src.migraciones)
 
 // Colección existente de perfiles
 db.createCollection("perfiles");
@@ -17,6 +19,37 @@ db.perfiles.updateOne(
   { upsert: true }
 );
 
+// Skills normalizados en minúsculas para filtrar el listado por índice (exacto y por prefijo)
+db.perfiles.updateMany({}, [
+  {
+    $set: {
+      skills_lower: {
+        $setDifference: [
+          {
+            $map: {
+              input: {
+                $switch: {
+                  branches: [
+                    { case: { $isArray: "$skills" }, then: "$skills" },
+                    { case: { $eq: [{ $type: "$skills" }, "string"] }, then: { $split: ["$skills", ","] } }
+                  ],
+                  default: []
+                }
+              },
+              as: "s",
+              in: { $toLower: { $trim: { input: "$$s" } } }
+            }
+          },
+          [""]
+        ]
+      }
+    }
+  }
+]);
+db.perfiles.createIndex({ skills_lower: 1, email: 1 });
+db.perfiles.createIndex({ skills_lower: 1, seniority: 1, email: 1 });
+db.perfiles.createIndex({ seniority: 1, email: 1 });
+
 // NUEVO: Colección de cursos
 db.createCollection("cursos");
 db.cursos.createIndex({ codigo: 1 }, { unique: true });
@@ -53,6 +86,21 @@ db.empresas.insertOne({
 // NUEVO: Colección de ofertas laborales
 db.createCollection("ofertas");
 db.ofertas.createIndex({ empresa_id: 1 });
+// Listado y búsqueda de ofertas (siempre filtran por estado; el cursor recorre _id descendente)
+db.ofertas.createIndex({ estado: 1, _id: -1 });
+db.ofertas.createIndex({ estado: 1, modalidad: 1, _id: -1 });
+db.ofertas.createIndex({ estado: 1, ubicacion: 1, _id: -1 });
+db.ofertas.createIndex({ estado: 1, tipo_contrato: 1, _id: -1 });
+db.ofertas.createIndex({ estado: 1, salario: 1 });
+// Texto completo con prefijo de igualdad sobre estado (solo se admite un índice de texto por colección)
+db.ofertas.createIndex(
+  { estado: 1, titulo: "text", requisitos: "text", descripcion: "text" },
+  {
+    name: "ofertas_texto",
+    weights: { titulo: 10, requisitos: 5, descripcion: 1 },
+    default_language: "spanish"
+  }
+);
 
 db.ofertas.insertOne({
   titulo: "Senior Backend Developer",
@@ -70,4 +118,37 @@ db.ofertas.insertOne({
 
 // NUEVO: Colección de historial de cambios
 db.createCollection("historial_cambios");
-db.historial_cambios.createIndex({ candidato_email: 1, timestamp: -1 });
\ No newline at end of file
+db.historial_cambios.createIndex({ candidato_email: 1, timestamp: -1 });
+// Colección de solicitudes de conexión
+db.createCollection("solicitudes_conexion");
+
+// Backfill de la clave canónica del par (emails ordenados) para documentos previos
+db.solicitudes_conexion.updateMany(
+  { par: { $exists: false } },
+  [{
+    $set: {
+      par: {
+        $cond: [
+          { $lt: ["$remitente_email", "$destinatario_email"] },
+          { $concat: ["$remitente_email", "|", "$destinatario_email"] },
+          { $concat: ["$destinatario_email", "|", "$remitente_email"] }
+        ]
+      }
+    }
+  }]
+);
+
+// Un solo par pendiente o aceptado por pareja de usuarios (las rechazadas no cuentan)
+db.solicitudes_conexion.createIndex(
+  { par: 1 },
+  { unique: true, partialFilterExpression: { estado: { $in: ["pendiente", "aceptada"] } } }
+);
+// Bandejas de entrada/salida y red de contactos (paginadas por _id)
+db.solicitudes_conexion.createIndex({ destinatario_email: 1, estado: 1, _id: -1 });
+db.solicitudes_conexion.createIndex({ remitente_email: 1, estado: 1, _id: -1 });
+
+// Eventos de sincronización que viajan en el mismo documento hasta pasar al outbox de PostgreSQL
+// (src/outbox.py los releva; el índice sparse solo contiene los documentos con eventos pendientes)
+["perfiles", "ofertas", "solicitudes_conexion"].forEach(function (coleccion) {
+  db.getCollection(coleccion).createIndex({ _eventos: 1 }, { sparse: true });
+});
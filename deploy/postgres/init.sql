@@ -1,4 +1,5 @@
 CREATE EXTENSION IF NOT EXISTS pgcrypto;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 -- Tabla existente de candidatos
 CREATE TABLE IF NOT EXISTS candidatos (
@@ -18,9 +19,15 @@ CREATE TABLE IF NOT EXISTS procesos (
     feedback TEXT,
     feedback_encrypted BYTEA,  -- NUEVO: Feedback cifrado
     notas_confidenciales TEXT,  -- NUEVO: Notas solo para RRHH/admin
-    updated_at TIMESTAMPTZ DEFAULT now()
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()  -- NOT NULL: forma parte del cursor del listado
 );
 
+-- Listados de procesos (paginación keyset sobre updated_at, id)
+CREATE INDEX IF NOT EXISTS idx_procesos_fecha ON procesos (updated_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_procesos_candidato_fecha ON procesos (candidato_id, updated_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_procesos_estado_fecha ON procesos (estado, updated_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_procesos_puesto_trgm ON procesos USING gin (puesto gin_trgm_ops);
+
 -- NUEVO: Tabla de aplicaciones a ofertas
 CREATE TABLE IF NOT EXISTS aplicaciones (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -30,6 +37,10 @@ CREATE TABLE IF NOT EXISTS aplicaciones (
     fecha_aplicacion TIMESTAMPTZ DEFAULT now()
 );
 
+-- Historial de aplicaciones por candidato (paginación keyset)
+CREATE INDEX IF NOT EXISTS idx_aplicaciones_candidato_fecha
+    ON aplicaciones (candidato_email, fecha_aplicacion DESC, id DESC);
+
 -- NUEVO: Tabla de entrevistas
 CREATE TABLE IF NOT EXISTS entrevistas (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -63,6 +74,34 @@ CREATE TABLE IF NOT EXISTS usuarios (
     created_at TIMESTAMPTZ DEFAULT now()
 );
 
+-- Búsqueda de contactos por subcadena (ILIKE '%q%') sobre nombre o email
+CREATE INDEX IF NOT EXISTS idx_usuarios_nombre_trgm ON usuarios USING gin (nombre gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_usuarios_email_trgm ON usuarios USING gin (email gin_trgm_ops);
+
+-- NUEVO: Outbox transaccional para propagar cambios a Neo4j/Redis/Mongo (lo drena src/outbox.py)
+CREATE TABLE IF NOT EXISTS outbox (
+    id BIGSERIAL PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    payload JSONB NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente' CHECK (estado IN ('pendiente', 'procesando', 'procesado', 'fallido')),
+    intentos INT NOT NULL DEFAULT 0,
+    proximo_intento TIMESTAMPTZ NOT NULL DEFAULT now(),
+    locked_at TIMESTAMPTZ,
+    ultimo_error TEXT,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    procesado_at TIMESTAMPTZ
+);
+
+-- Solo los eventos por procesar entran en el índice que recorre el worker
+CREATE INDEX IF NOT EXISTS idx_outbox_pendientes
+    ON outbox (id)
+    WHERE estado IN ('pendiente', 'procesando');
+
+-- Limpieza periódica de eventos procesados que superaron la retención
+CREATE INDEX IF NOT EXISTS idx_outbox_procesados
+    ON outbox (procesado_at)
+    WHERE estado = 'procesado';
+
 -- Usuario administrador predefinido (NO se puede crear más desde el registro)
 -- Email: admin@talentum.plus
 -- Contraseña: Admin2025!
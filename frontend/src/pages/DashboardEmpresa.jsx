@@ -59,12 +59,9 @@ export default function DashboardEmpresa() {
       // Obtener procesos (con manejo de errores)
       let candidatosEnProceso = 0;
       try {
-        const procesosRes = await axios.get('http://localhost:8080/procesos');
-        const procesos = procesosRes.data.procesos || [];
-        
-        // Contar candidatos únicos en procesos
-        const candidatosUnicos = new Set(procesos.map(p => p.candidato_email));
-        candidatosEnProceso = candidatosUnicos.size;
+        // El backend cuenta los candidatos distintos sobre todos los procesos (no solo la página)
+        const procesosRes = await axios.get('http://localhost:8080/procesos', { params: { limit: 1 } });
+        candidatosEnProceso = procesosRes.data.candidatos_unicos || 0;
       } catch (error) {
         console.warn('⚠️ No se pudieron cargar los procesos:', error.message);
       }
@@ -0,0 +1,425 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import inspect
+import functools
+from collections import OrderedDict
+from datetime import date, datetime, time as hora
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+from src.database_async import redis_client_async
+from src.cambios import al_cambiar, emitir_cambio
+
+# Cuánto puede tardar un cálculo antes de que otro worker deje de esperarlo y calcule por su cuenta
+CACHE_LOCK_TIMEOUT = float(os.getenv("CACHE_LOCK_TIMEOUT", "10"))
+CACHE_LOCK_POLL = 0.05
+# Entradas máximas del tier en memoria de cada proceso (LRU)
+CACHE_LOCAL_MAX = int(os.getenv("CACHE_LOCAL_MAX", "2048"))
+
+_LIBERAR_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class _LiderCancelado(Exception):
+    """La llamada que estaba calculando se canceló (ej: el cliente cortó): quien la esperaba reintenta"""
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave: solo la primera ejecuta, el resto espera su resultado"""
+
+    def __init__(self):
+        self._en_vuelo: Dict[str, asyncio.Future] = {}
+
+    async def do(self, clave: str, calcular: Callable[[], Awaitable[Any]]) -> Any:
+        futuro = self._en_vuelo.get(clave)
+        while futuro is not None:
+            try:
+                return await asyncio.shield(futuro)
+            except _LiderCancelado:
+                # El primero que despierta pasa a calcular; el resto espera a ese
+                futuro = self._en_vuelo.get(clave)
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._en_vuelo[clave] = futuro
+        try:
+            resultado = await calcular()
+            futuro.set_result(resultado)
+            return resultado
+        except asyncio.CancelledError:
+            # Cancelar el futuro cancelaría a todos los que esperan: se les pide que reintenten
+            futuro.set_exception(_LiderCancelado())
+            futuro.exception()
+            raise
+        except BaseException as e:
+            futuro.set_exception(e)
+            # Marcar la excepción como consumida si nadie más la esperaba
+            futuro.exception()
+            raise
+        finally:
+            if self._en_vuelo.get(clave) is futuro:
+                del self._en_vuelo[clave]
+
+
+_single_flight = SingleFlight()
+
+
+class CacheLocal:
+    """
+    Tier en memoria del proceso delante de Redis: LRU acotado con TTL por entrada.
+    Los valores se comparten entre requests, así que deben tratarse como de solo lectura.
+
+    Cada descarte avanza un contador de generación. Quien va a calcular un valor toma
+    generacion() antes y lo pasa a guardar(): si la clave se invalidó mientras tanto,
+    el valor (ya viejo) no se guarda.
+    """
+
+    def __init__(self, maximo: int):
+        self.maximo = maximo
+        self._entradas: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._generacion = 0
+        # Generación del último descarte de cada clave (LRU acotado como las entradas)
+        self._descartes: "OrderedDict[str, int]" = OrderedDict()
+        # Generación más alta entre los descartes que salieron del LRU: antes de eso no se sabe qué se invalidó
+        self._piso = 0
+
+    def generacion(self) -> int:
+        return self._generacion
+
+    def _invalidada_desde(self, clave: str, generacion: int) -> bool:
+        return generacion < self._piso or self._descartes.get(clave, 0) > generacion
+
+    def obtener(self, clave: str) -> Tuple[bool, Any]:
+        """Devuelve (encontrado, valor)"""
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return False, None
+        vence, valor = entrada
+        if vence <= time.monotonic():
+            del self._entradas[clave]
+            return False, None
+        self._entradas.move_to_end(clave)
+        return True, valor
+
+    def guardar(self, clave: str, valor: Any, ttl: float, generacion: Optional[int] = None):
+        """Con `generacion` (tomada antes de calcular el valor) no guarda si la clave se invalidó después"""
+        if generacion is not None and self._invalidada_desde(clave, generacion):
+            return
+        self._entradas[clave] = (time.monotonic() + ttl, valor)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.maximo:
+            self._entradas.popitem(last=False)
+
+    def descartar(self, claves: Iterable[str]):
+        self._generacion += 1
+        for clave in claves:
+            self._entradas.pop(clave, None)
+            self._descartes[clave] = self._generacion
+            self._descartes.move_to_end(clave)
+        while len(self._descartes) > self.maximo:
+            _, generacion = self._descartes.popitem(last=False)
+            self._piso = max(self._piso, generacion)
+
+
+cache_local = CacheLocal(CACHE_LOCAL_MAX)
+
+
+async def difundir_invalidacion(claves: Iterable[str]):
+    """Descarta las claves del tier local de este proceso y avisa al resto de workers/réplicas"""
+    claves = [clave.decode() if isinstance(clave, bytes) else clave for clave in claves]
+    if not claves:
+        return
+    cache_local.descartar(claves)
+    try:
+        await emitir_cambio("cache_invalidada", claves=claves)
+    except Exception as e:
+        print(f"⚠️ Error al difundir invalidación de caché: {e}")
+
+
+@al_cambiar("cache_invalidada")
+async def _descartar_local(evento: dict):
+    cache_local.descartar(evento.get("claves", []))
+
+
+async def invalidar_claves(claves: Iterable[str]):
+    """Borra claves de Redis y de los tiers locales de todos los procesos"""
+    claves = list(claves)
+    if not claves:
+        return
+    await redis_client_async.delete(*claves)
+    await difundir_invalidacion(claves)
+
+
+# Claves con un refresco en segundo plano en curso en este proceso (stale-while-revalidate)
+_refrescando: Set[str] = set()
+# Referencias a las tareas de refresco para que no las recolecte el GC antes de terminar
+_tareas_refresco: Set[asyncio.Task] = set()
+
+
+class Politica:
+    """
+    TTLs de una entrada de caché:
+    - ttl: segundos en que el valor se sirve como fresco
+    - stale: segundos extra en que se sirve vencido mientras se recalcula en segundo plano
+    - ttl_ausente: segundos que se recuerda un resultado None (ej: 404); 0 = no se cachea
+    - ttl_local: segundos en el tier en memoria del proceso; 0 = solo Redis
+    """
+
+    def __init__(self, ttl: int, stale: int = 0, ttl_ausente: int = 0, ttl_local: float = 0):
+        self.ttl = ttl
+        self.stale = stale
+        self.ttl_ausente = ttl_ausente
+        self.ttl_local = ttl_local
+
+
+def _clave_tag(tag: str) -> str:
+    return f"tag:{tag}"
+
+
+def _json_default(valor):
+    # Mismo formato que la respuesta de FastAPI sin caché (isoformat), así un hit no difiere de un miss
+    if isinstance(valor, (datetime, date, hora)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _decodificar(cached) -> Tuple[Any, float]:
+    """Devuelve (valor, fresco_hasta). Las entradas sin sobre (formato anterior) se consideran frescas."""
+    dato = json.loads(cached)
+    if isinstance(dato, dict) and "fresco_hasta" in dato and "valor" in dato:
+        return dato["valor"], dato["fresco_hasta"]
+    return dato, float("inf")
+
+
+def _encolar_guardado(pipe, clave: str, valor: Any, politica: Politica, tags: Iterable[str]):
+    """Agrega al pipeline el SETEX de la entrada y su registro en los sets de cada tag"""
+    if valor is None:
+        if not politica.ttl_ausente:
+            return
+        fresco, expira = politica.ttl_ausente, politica.ttl_ausente
+    else:
+        fresco, expira = politica.ttl, politica.ttl + politica.stale
+    sobre = {"valor": valor, "fresco_hasta": time.time() + fresco}
+
+    pipe.setex(clave, expira, json.dumps(sobre, default=_json_default))
+    for tag in tags:
+        # El set del tag vive al menos tanto como su entrada más longeva (NX: primera vez, GT: solo extender)
+        pipe.sadd(_clave_tag(tag), clave)
+        pipe.expire(_clave_tag(tag), expira, nx=True)
+        pipe.expire(_clave_tag(tag), expira, gt=True)
+
+
+async def _guardar(clave: str, valor: Any, politica: Politica, tags: Iterable[str]):
+    """Guarda el valor y lo registra en los sets de cada tag, en un solo round trip"""
+    async with redis_client_async.pipeline(transaction=False) as pipe:
+        _encolar_guardado(pipe, clave, valor, politica, tags)
+        await pipe.execute()
+
+
+async def _calcular_con_lock(clave: str, politica: Politica, calcular: Callable[[], Awaitable[Any]],
+                             tags: Iterable[str]) -> Any:
+    """
+    Lock distribuido en Redis: entre workers/réplicas, solo uno recalcula la clave;
+    los demás esperan a que aparezca en caché (o calculan si el dueño del lock tarda demasiado).
+    """
+    lock = f"lock:{clave}"
+    token = uuid.uuid4().hex
+    if await redis_client_async.set(lock, token, nx=True, px=int(CACHE_LOCK_TIMEOUT * 1000)):
+        try:
+            valor = await calcular()
+            await _guardar(clave, valor, politica, tags)
+            return valor
+        finally:
+            await redis_client_async.eval(_LIBERAR_LOCK, 1, lock, token)
+
+    espera = 0.0
+    while espera < CACHE_LOCK_TIMEOUT:
+        await asyncio.sleep(CACHE_LOCK_POLL)
+        espera += CACHE_LOCK_POLL
+        cached = await redis_client_async.get(clave)
+        if cached is not None:
+            valor, fresco_hasta = _decodificar(cached)
+            if fresco_hasta > time.time():
+                return valor
+        if not await redis_client_async.exists(lock):
+            break
+
+    valor = await calcular()
+    await _guardar(clave, valor, politica, tags)
+    return valor
+
+
+async def _revalidar(clave: str, politica: Politica, calcular: Callable[[], Awaitable[Any]],
+                     tags: Iterable[str]):
+    """Recalcula una entrada vencida en segundo plano; si otro proceso ya la está recalculando, no hace nada"""
+    lock = f"lock:{clave}"
+    token = uuid.uuid4().hex
+    try:
+        if await redis_client_async.set(lock, token, nx=True, px=int(CACHE_LOCK_TIMEOUT * 1000)):
+            try:
+                await _guardar(clave, await calcular(), politica, tags)
+            finally:
+                await redis_client_async.eval(_LIBERAR_LOCK, 1, lock, token)
+    except Exception as e:
+        print(f"⚠️ Error revalidando caché {clave}: {e}")
+    finally:
+        _refrescando.discard(clave)
+
+
+async def leer_o_calcular(clave: str, ttl: Union[int, Politica], calcular: Callable[[], Awaitable[Any]],
+                          tags: Iterable[str] = ()) -> Tuple[Any, bool]:
+    """
+    Cache read-through con protección single-flight (en el proceso y entre procesos).
+    `ttl` puede ser un entero o una Politica con stale-while-revalidate y caché negativa.
+    Devuelve (valor, desde_cache).
+    """
+    politica = ttl if isinstance(ttl, Politica) else Politica(ttl)
+    tags = list(tags)
+
+    cached = await redis_client_async.get(clave)
+    if cached is not None:
+        valor, fresco_hasta = _decodificar(cached)
+        if fresco_hasta <= time.time() and clave not in _refrescando:
+            # Vencido pero dentro de la ventana stale: se sirve y se recalcula en segundo plano
+            _refrescando.add(clave)
+            tarea = asyncio.create_task(_revalidar(clave, politica, calcular, tags))
+            _tareas_refresco.add(tarea)
+            tarea.add_done_callback(_tareas_refresco.discard)
+        return valor, True
+
+    valor = await _single_flight.do(clave, lambda: _calcular_con_lock(clave, politica, calcular, tags))
+    return valor, False
+
+
+def cacheado(clave: Union[str, Callable[..., str]], ttl: int, stale: int = 0, ttl_ausente: int = 0,
+             ttl_local: float = 0, tags: Iterable[Union[str, Callable[..., str]]] = ()):
+    """
+    Decorador read-through para coroutines.
+    `clave` y cada tag son un template con los argumentos de la función (ej: "perfil:{email}")
+    o un callable que recibe los mismos argumentos. Un resultado None se cachea ttl_ausente segundos.
+    Con ttl_local > 0 se agrega el tier en memoria (para datos calientes que cambian poco);
+    las invalidaciones por clave o tag se difunden a todos los procesos por pub/sub.
+
+    La función decorada devuelve el valor; además expone:
+    - .leer(*args) -> (valor, desde_cache)
+    - .clave(*args) -> clave de Redis
+    - .invalidar(*args) -> borra la entrada
+    """
+    politica = Politica(ttl, stale, ttl_ausente, ttl_local)
+
+    def decorador(func):
+        firma = inspect.signature(func)
+
+        def construir(plantilla, args, kwargs) -> str:
+            if callable(plantilla):
+                return plantilla(*args, **kwargs)
+            argumentos = firma.bind(*args, **kwargs)
+            argumentos.apply_defaults()
+            return plantilla.format(**argumentos.arguments)
+
+        def clave_de(*args, **kwargs) -> str:
+            return construir(clave, args, kwargs)
+
+        async def leer(*args, **kwargs) -> Tuple[Any, bool]:
+            clave_redis = clave_de(*args, **kwargs)
+            if politica.ttl_local:
+                encontrado, valor = cache_local.obtener(clave_redis)
+                if encontrado:
+                    return valor, True
+
+            generacion = cache_local.generacion()
+            valor, desde_cache = await leer_o_calcular(
+                clave_redis,
+                politica,
+                lambda: func(*args, **kwargs),
+                tags=[construir(tag, args, kwargs) for tag in tags]
+            )
+            if politica.ttl_local and valor is not None:
+                cache_local.guardar(clave_redis, valor, politica.ttl_local, generacion)
+            elif politica.ttl_local and politica.ttl_ausente:
+                cache_local.guardar(clave_redis, None, min(politica.ttl_local, politica.ttl_ausente), generacion)
+            return valor, desde_cache
+
+        async def invalidar(*args, **kwargs):
+            await invalidar_claves([clave_de(*args, **kwargs)])
+
+        @functools.wraps(func)
+        async def envoltorio(*args, **kwargs):
+            valor, _ = await leer(*args, **kwargs)
+            return valor
+
+        envoltorio.leer = leer
+        envoltorio.clave = clave_de
+        envoltorio.invalidar = invalidar
+        return envoltorio
+
+    return decorador
+
+
+async def leer_o_calcular_muchos(ids: Iterable[str], clave_de: Callable[[str], str], politica: Politica,
+                                 calcular: Callable[[List[str]], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Versión por lote de leer_o_calcular: tier local, un solo MGET en Redis y una sola llamada a
+    `calcular` con los ids faltantes (que devuelve {id: valor}; los ausentes quedan en None).
+    Las entradas vencidas se recalculan junto con las faltantes (sin stale-while-revalidate).
+    """
+    resultado: Dict[str, Any] = {}
+    pendientes = []
+    for id in dict.fromkeys(ids):
+        if politica.ttl_local:
+            encontrado, valor = cache_local.obtener(clave_de(id))
+            if encontrado:
+                resultado[id] = valor
+                continue
+        pendientes.append(id)
+    if not pendientes:
+        return resultado
+
+    generacion = cache_local.generacion()
+    faltantes = []
+    ahora = time.time()
+    for id, cached in zip(pendientes, await redis_client_async.mget([clave_de(id) for id in pendientes])):
+        if cached is not None:
+            valor, fresco_hasta = _decodificar(cached)
+            if fresco_hasta > ahora:
+                resultado[id] = valor
+                if politica.ttl_local:
+                    cache_local.guardar(clave_de(id), valor, politica.ttl_local, generacion)
+                continue
+        faltantes.append(id)
+    if not faltantes:
+        return resultado
+
+    calculados = await calcular(faltantes)
+    async with redis_client_async.pipeline(transaction=False) as pipe:
+        for id in faltantes:
+            valor = resultado[id] = calculados.get(id)
+            _encolar_guardado(pipe, clave_de(id), valor, politica, ())
+            if politica.ttl_local and (valor is not None or politica.ttl_ausente):
+                cache_local.guardar(clave_de(id), valor, politica.ttl_local if valor is not None
+                                    else min(politica.ttl_local, politica.ttl_ausente), generacion)
+        await pipe.execute()
+    return resultado
+
+
+async def invalidar_tags(tags: Iterable[str]) -> int:
+    """Borra todas las claves registradas bajo los tags indicados. Devuelve cuántas se borraron."""
+    claves_tags = [_clave_tag(tag) for tag in tags]
+    if not claves_tags:
+        return 0
+
+    async with redis_client_async.pipeline(transaction=False) as pipe:
+        for clave_tag in claves_tags:
+            pipe.smembers(clave_tag)
+        miembros = await pipe.execute()
+
+    claves = set()
+    for grupo in miembros:
+        claves.update(grupo)
+    await redis_client_async.delete(*claves, *claves_tags)
+    await difundir_invalidacion(claves)
+    return len(claves)
@@ -0,0 +1,53 @@
+import json
+import asyncio
+from typing import Dict, List, Callable, Awaitable, Optional
+from src.database_async import redis_client_async
+
+# Canal de Redis por el que viajan los eventos de cambio a todos los workers y réplicas
+CANAL_CAMBIOS = "talentum:cambios"
+
+# tipo de evento -> suscriptores locales (cachés, índices de matching, etc.)
+_suscriptores: Dict[str, List[Callable[[dict], Awaitable[None]]]] = {}
+
+
+def al_cambiar(tipo: str):
+    """Decorador para suscribir una coroutine a un tipo de evento de cambio"""
+    def decorador(func):
+        _suscriptores.setdefault(tipo, []).append(func)
+        return func
+    return decorador
+
+
+async def emitir_cambio(tipo: str, **datos):
+    """Publica un evento de cambio; lo reciben todos los procesos suscriptos (incluido este)"""
+    await redis_client_async.publish(CANAL_CAMBIOS, json.dumps({"tipo": tipo, **datos}, default=str))
+
+
+async def _despachar(evento: dict):
+    for suscriptor in _suscriptores.get(evento.get("tipo"), []):
+        try:
+            await suscriptor(evento)
+        except Exception as e:
+            print(f"⚠️ Error procesando cambio {evento.get('tipo')} en {suscriptor.__name__}: {e}")
+
+
+async def escuchar_cambios(detener: Optional[asyncio.Event] = None):
+    """
+    Loop de fondo: recibe los eventos del canal y los despacha a los suscriptores locales.
+    Si se corta la conexión con Redis, se reconecta.
+    """
+    detener = detener or asyncio.Event()
+    while not detener.is_set():
+        pubsub = redis_client_async.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(CANAL_CAMBIOS)
+            while not detener.is_set():
+                mensaje = await pubsub.get_message(timeout=1.0)
+                if mensaje is None:
+                    continue
+                await _despachar(json.loads(mensaje["data"]))
+        except Exception as e:
+            print(f"⚠️ Listener de cambios desconectado: {e}")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
@@ -0,0 +1,63 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from motor.motor_asyncio import AsyncIOMotorClient
+from redis import asyncio as aioredis
+from neo4j import AsyncGraphDatabase
+from src.database import POSTGRES_DSN, POSTGRES_POOL_MIN, POSTGRES_POOL_MAX, POSTGRES_POOL_TIMEOUT
+
+# Clientes asíncronos: no bloquean el event loop de uvicorn mientras esperan I/O
+
+# MongoDB (motor)
+mongo_client_async = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/talentum"))
+mongo_db_async = mongo_client_async.talentum
+
+# Redis (redis.asyncio)
+redis_client_async = aioredis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+
+# Neo4j (driver async oficial)
+neo4j_driver_async = AsyncGraphDatabase.driver(
+    os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+    auth=("neo4j", "neo4j1234")
+)
+
+# PostgreSQL (asyncpg): el pool necesita un event loop, se crea en el arranque de la app.
+# asyncpg se importa recién ahí, así el módulo (y lo que depende de él) se importa sin el driver
+postgres_pool_async = None
+_postgres_pool_lock = asyncio.Lock()
+
+
+async def init_async_clients():
+    """Crea los recursos que requieren un event loop activo (pool asyncpg)"""
+    global postgres_pool_async
+    async with _postgres_pool_lock:
+        if postgres_pool_async is None:
+            import asyncpg
+            postgres_pool_async = await asyncpg.create_pool(
+                POSTGRES_DSN,
+                min_size=POSTGRES_POOL_MIN,
+                max_size=POSTGRES_POOL_MAX
+            )
+
+
+async def close_async_clients():
+    """Cierra todos los clientes asíncronos al apagar la app"""
+    global postgres_pool_async
+    if postgres_pool_async is not None:
+        await postgres_pool_async.close()
+        postgres_pool_async = None
+    await neo4j_driver_async.close()
+    await redis_client_async.aclose()
+    mongo_client_async.close()
+
+
+@asynccontextmanager
+async def get_postgres_conn_async():
+    """
+    Presta una conexión asyncpg del pool durante el bloque `async with`.
+    asyncpg descarta la transacción pendiente al devolverla al pool.
+    """
+    if postgres_pool_async is None:
+        await init_async_clients()
+    async with postgres_pool_async.acquire(timeout=POSTGRES_POOL_TIMEOUT) as conn:
+        yield conn
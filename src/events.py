@@ -1,20 +1,61 @@
-from src.database import mongo_db, neo4j_driver, redis_client, postgres_conn
+from src.database_async import mongo_db_async, neo4j_driver_async, get_postgres_conn_async
+from src.outbox import registrar_manejador
+from src.graph_writer import escribir_skills, desvincular_skills, diferencia_skills
+from src.cambios import emitir_cambio
+from src.cache import leer_o_calcular, invalidar_tags, invalidar_claves
+from src.matching import (
+    puntuar, usar_indice, skills_normalizados, normalizar_lista_skills, PROYECCION_PERFIL, SENIORITY_POR_DEFECTO
+)
+from src.scoring import niveles_desde, skills_con_relacionados
+from src.matches_ofertas import recalcular_matches_oferta, actualizar_matches_candidato
+import os
 import json
-from typing import List, Dict
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import List, Dict, Optional, Awaitable
 
-async def sincronizar_candidato_creado(candidato: dict):
+# TTL de respaldo del caché de matching: la invalidación normal es por skill al cambiar un candidato
+MATCHING_CACHE_TTL = 600
+
+# Deadline (segundos) de cada store durante la sincronización entre bases
+SYNC_TIMEOUTS = {
+    "neo4j": float(os.getenv("SYNC_TIMEOUT_NEO4J", "5")),
+    "postgres": float(os.getenv("SYNC_TIMEOUT_POSTGRES", "3")),
+    "mongo": float(os.getenv("SYNC_TIMEOUT_MONGO", "3")),
+    "redis": float(os.getenv("SYNC_TIMEOUT_REDIS", "1")),
+}
+
+
+async def _sincronizar_store(store: str, operacion: Awaitable) -> Dict:
+    """Ejecuta la escritura de un store con su propio deadline y reporta su resultado"""
+    try:
+        await asyncio.wait_for(operacion, timeout=SYNC_TIMEOUTS[store])
+        return {"store": store, "ok": True, "error": None}
+    except asyncio.TimeoutError:
+        error = f"timeout tras {SYNC_TIMEOUTS[store]}s"
+    except Exception as e:
+        error = str(e)
+    print(f"⚠️ Error sincronizando {store}: {error}")
+    return {"store": store, "ok": False, "error": error}
+
+
+async def sincronizar_en_paralelo(operaciones: Dict[str, Awaitable]) -> Dict[str, Dict]:
     """
-    Cuando se crea un candidato en MongoDB, sincroniza con Neo4j, Redis y PostgreSQL
+    Lanza las escrituras de cada store de forma concurrente.
+    La latencia total es la del store más lento, no la suma de todos.
+    Devuelve el resultado por store: {"neo4j": {"ok": True, "error": None}, ...}
     """
-    email = candidato["email"]
-    nombre = candidato["nombre"]
-    skills = candidato.get("skills", [])
-    seniority = candidato.get("seniority", "Junior")
-    
-    # 1. Sincronizar con Neo4j (crear nodo + relaciones)
-    with neo4j_driver.session() as session:
+    resultados = await asyncio.gather(*(
+        _sincronizar_store(store, operacion) for store, operacion in operaciones.items()
+    ))
+    return {r["store"]: {"ok": r["ok"], "error": r["error"]} for r in resultados}
+
+
+async def _neo4j_crear_candidato(email: str, nombre: str, seniority: str, skills: List[str]):
+    async def crear(tx):
         # Crear nodo Candidato
-        session.run(
+        await tx.run(
             """
             MERGE (c:Candidato {id: $email})
             SET c.nombre = $nombre, c.seniority = $seniority, c.activo = true
@@ -23,98 +64,220 @@ async def sincronizar_candidato_creado(candidato: dict):
             nombre=nombre,
             seniority=seniority
         )
-        
-        # Crear relaciones con Skills
-        for skill in skills:
-            session.run(
-                """
-                MERGE (s:Skill {nombre: $skill})
-                WITH s
-                MATCH (c:Candidato {id: $email})
-                MERGE (c)-[:DOMINA]->(s)
-                """,
-                skill=skill,
-                email=email
-            )
+        # Crear relaciones con Skills (un solo UNWIND)
+        await escribir_skills(tx, "candidato", email, skills)
     
-    # 2. Crear entrada en PostgreSQL para tracking
-    with postgres_conn.cursor() as cursor:
-        cursor.execute(
+    async with neo4j_driver_async.session() as session:
+        await session.execute_write(crear)
+    
+    # El caché de matching deriva del grafo: se invalida recién después del commit
+    await invalidar_matching(skills)
+
+
+async def _postgres_upsert_candidato(email: str, nombre: str, seniority: str):
+    async with get_postgres_conn_async() as conn:
+        await conn.execute(
             """
             INSERT INTO candidatos (nombre, email, seniority)
-            VALUES (%s, %s, %s)
+            VALUES ($1, $2, $3)
             ON CONFLICT (email) DO UPDATE 
             SET nombre = EXCLUDED.nombre, seniority = EXCLUDED.seniority
             """,
-            (nombre, email, seniority)
+            nombre, email, seniority
         )
-        postgres_conn.commit()
-    
-    # 3. Cachear perfil en Redis
-    redis_client.setex(
-        f"perfil:{email}",
-        3600,
-        json.dumps({
-            "nombre": nombre,
-            "seniority": seniority,
-            "skills": skills
-        })
-    )
+
+
+async def _redis_invalidar_candidato(email: str, skills: List[str]):
+    # El perfil se cachea completo en la primera lectura; acá solo se descarta un posible 404 cacheado
+    await invalidar_claves([f"perfil:{email}"])
+    await emitir_cambio("candidato_creado", email=email, skills=skills)
+
+
+async def sincronizar_candidato_creado(candidato: dict) -> Dict[str, Dict]:
+    """
+    Cuando se crea un candidato en MongoDB, sincroniza con Neo4j, Redis y PostgreSQL
+    (en paralelo, cada store con su propio deadline)
+    """
+    email = candidato["email"]
+    nombre = candidato["nombre"]
+    skills = candidato.get("skills", [])
+    seniority = candidato.get("seniority") or SENIORITY_POR_DEFECTO
+    
+    resultado = await sincronizar_en_paralelo({
+        # 1. Neo4j: nodo + relaciones (y luego invalidar matchings que ahora podrían incluirlo)
+        "neo4j": _neo4j_crear_candidato(email, nombre, seniority, skills),
+        # 2. PostgreSQL: entrada para tracking
+        "postgres": _postgres_upsert_candidato(email, nombre, seniority),
+        # 3. Redis: descartar el perfil cacheado y avisar el alta
+        "redis": _redis_invalidar_candidato(email, skills),
+    })
     
-    print(f"✅ Candidato {email} sincronizado en Neo4j, PostgreSQL y Redis")
-
-
-async def sincronizar_candidato_actualizado(email: str, cambios: dict):
-    """
-    Cuando se actualiza un candidato en MongoDB, propaga cambios
-    """
-    # 1. Actualizar Neo4j si cambió seniority o skills
-    if "seniority" in cambios or "skills" in cambios:
-        with neo4j_driver.session() as session:
-            if "seniority" in cambios:
-                session.run(
-                    "MATCH (c:Candidato {id: $email}) SET c.seniority = $seniority",
-                    email=email,
-                    seniority=cambios["seniority"]
-                )
-            
-            if "skills" in cambios:
-                # Eliminar skills antiguos
-                session.run(
-                    "MATCH (c:Candidato {id: $email})-[r:DOMINA]->(:Skill) DELETE r",
-                    email=email
-                )
-                # Agregar nuevos
-                for skill in cambios["skills"]:
-                    session.run(
-                        """
-                        MERGE (s:Skill {nombre: $skill})
-                        WITH s
-                        MATCH (c:Candidato {id: $email})
-                        MERGE (c)-[:DOMINA]->(s)
-                        """,
-                        skill=skill,
-                        email=email
-                    )
-    
-    # 2. Invalidar caché
-    redis_client.delete(f"perfil:{email}")
-    redis_client.delete(f"recomendaciones:{email}")
-    
-    print(f"✅ Candidato {email} actualizado y caché invalidado")
-
-
-async def sincronizar_proceso_creado(proceso: dict):
+    if all(r["ok"] for r in resultado.values()):
+        print(f"✅ Candidato {email} sincronizado en Neo4j, PostgreSQL y Redis")
+    return resultado
+
+
+def _tags_matching(skills: List[str]) -> List[str]:
+    # El matching no distingue mayúsculas: los tags tampoco
+    return [f"matching:skill:{skill}" for skill in skills_normalizados(skills)]
+
+
+async def invalidar_matching(skills: Optional[List[str]]):
     """
-    Cuando se crea un proceso en PostgreSQL, actualiza Neo4j
+    Invalida solo los resultados de matching cuya búsqueda incluye alguno de estos skills.
+    None significa que no se sabe qué skills se vieron afectados: invalida todo el matching.
     """
-    candidato_id = proceso["candidato_id"]
-    puesto = proceso["puesto"]
-    estado = proceso["estado"]
+    await invalidar_tags(["matching"] if skills is None else _tags_matching(skills))
+
+
+async def _neo4j_actualizar_candidato(email: str, cambios: dict, agregadas: List[str],
+                                      eliminadas: Optional[List[str]],
+                                      skills_afectadas: Optional[List[str]]):
+    async def actualizar(tx):
+        if "seniority" in cambios:
+            await tx.run(
+                "MATCH (c:Candidato {id: $email}) SET c.seniority = $seniority",
+                email=email,
+                seniority=cambios["seniority"]
+            )
+        
+        if "nombre" in cambios:
+            await tx.run(
+                "MATCH (c:Candidato {id: $email}) SET c.nombre = $nombre",
+                email=email,
+                nombre=cambios["nombre"]
+            )
+        
+        if "activo" in cambios:
+            await tx.run(
+                "MATCH (c:Candidato {id: $email}) SET c.activo = $activo",
+                email=email,
+                activo=bool(cambios["activo"])
+            )
+        
+        if eliminadas is None:
+            # Sin la lista anterior no se puede diferenciar: reemplazo completo
+            await tx.run(
+                "MATCH (c:Candidato {id: $email})-[r:DOMINA]->(:Skill) DELETE r",
+                email=email
+            )
+        else:
+            # Tocar solo las relaciones que cambiaron
+            await desvincular_skills(tx, "candidato", email, eliminadas)
+        await escribir_skills(tx, "candidato", email, agregadas)
+    
+    async with neo4j_driver_async.session() as session:
+        await session.execute_write(actualizar)
+    
+    # El caché de matching deriva del grafo: se invalida recién después del commit
+    await invalidar_matching(skills_afectadas)
+
+
+async def reflejar_candidato(email: str):
+    """
+    Copia el perfil de MongoDB al nodo :Candidato (nombre, seniority, activo y skills DOMINA),
+    que es lo que lee el motor Cypher de matching. Idempotente: deja el nodo igual al perfil.
+    """
+    perfil = await mongo_db_async.perfiles.find_one({"email": email}, PROYECCION_PERFIL)
+    if not perfil:
+        return
+    skills = list(dict.fromkeys(normalizar_lista_skills(perfil.get("skills"))))
+    
+    async def reflejar(tx):
+        result = await tx.run(
+            """
+            MERGE (c:Candidato {id: $email})
+            SET c.nombre = $nombre, c.seniority = $seniority, c.activo = $activo
+            WITH c
+            OPTIONAL MATCH (c)-[:DOMINA]->(s:Skill)
+            RETURN collect(s.nombre) AS skills
+            """,
+            email=email,
+            nombre=perfil.get("nombre"),
+            seniority=perfil.get("seniority") or SENIORITY_POR_DEFECTO,
+            activo=bool(perfil.get("activo", True))
+        )
+        anteriores = (await result.single())["skills"]
+        agregadas, eliminadas = diferencia_skills(anteriores, skills)
+        await desvincular_skills(tx, "candidato", email, eliminadas)
+        await escribir_skills(tx, "candidato", email, agregadas)
+        return anteriores
+    
+    async with neo4j_driver_async.session() as session:
+        anteriores = await session.execute_write(reflejar)
+    
+    # Pudo cambiar seniority o nombre: afecta cualquier búsqueda con sus skills de antes o de ahora
+    await invalidar_matching(list(dict.fromkeys(anteriores + skills)))
+
+
+# Campos que aparecen en (o filtran) los resultados de matching
+_CAMPOS_MATCHING = {"activo", "seniority", "nombre"}
+
+
+def _skills_afectadas_matching(cambios: dict, agregadas: List[str], eliminadas: Optional[List[str]],
+                               skills_actuales: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    Qué búsquedas de matching pueden cambiar: un skill agregado/eliminado solo afecta
+    búsquedas con ese skill; activo/seniority/nombre afectan cualquier búsqueda donde
+    el candidato pudo aparecer (todos sus skills). None = no se sabe, afecta a todas.
+    """
+    if eliminadas is None:
+        return None
+    if _CAMPOS_MATCHING & set(cambios):
+        return None if skills_actuales is None else skills_actuales + eliminadas
+    return agregadas + eliminadas
+
+
+async def _redis_publicar_actualizacion(email: str, evento: dict):
+    await invalidar_claves([f"perfil:{email}", f"recomendaciones:{email}"])
+    await emitir_cambio("candidato_actualizado", **evento)
+
+
+async def sincronizar_candidato_actualizado(email: str, cambios: dict,
+                                            skills_anteriores: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """
+    Cuando se actualiza un candidato en MongoDB, propaga cambios.
+    Si se conocen los skills anteriores, solo se agregan/eliminan las relaciones
+    que difieren y se emite un evento 'candidato_actualizado' con ese diff.
+    """
+    agregadas, eliminadas = [], []
+    if "skills" in cambios:
+        if skills_anteriores is None:
+            agregadas, eliminadas = list(cambios["skills"]), None
+        else:
+            agregadas, eliminadas = diferencia_skills(skills_anteriores, cambios["skills"])
     
-    # Crear relación en Neo4j: (Candidato)-[:POSTULA_A]->(Rol)
-    with neo4j_driver.session() as session:
-        session.run(
+    operaciones = {}
+    
+    skills_actuales = cambios.get("skills", skills_anteriores)
+    
+    # 1. Actualizar Neo4j si cambió nombre, seniority, activo o algún skill
+    skills_afectadas = _skills_afectadas_matching(cambios, agregadas, eliminadas, skills_actuales)
+    if skills_afectadas is None or skills_afectadas or _CAMPOS_MATCHING & set(cambios):
+        operaciones["neo4j"] = _neo4j_actualizar_candidato(
+            email, cambios, agregadas, eliminadas, skills_afectadas
+        )
+    
+    # 2. Invalidar caché y avisar a los suscriptores (cachés de matching, índices)
+    operaciones["redis"] = _redis_publicar_actualizacion(email, {
+        "email": email,
+        "skills_agregados": agregadas,
+        "skills_eliminados": eliminadas,  # None = reemplazo completo
+        "skills": skills_actuales,
+        "seniority": cambios.get("seniority"),
+        "campos": sorted(cambios.keys())
+    })
+    
+    resultado = await sincronizar_en_paralelo(operaciones)
+    
+    if all(r["ok"] for r in resultado.values()):
+        print(f"✅ Candidato {email} actualizado y caché invalidado")
+    return resultado
+
+
+async def _neo4j_registrar_proceso(candidato_id: str, puesto: str, estado: str):
+    async with neo4j_driver_async.session() as session:
+        await session.run(
             """
             MERGE (r:Rol {nombre: $puesto})
             WITH r
@@ -126,58 +289,203 @@ async def sincronizar_proceso_creado(proceso: dict):
             candidato_id=candidato_id,
             estado=estado
         )
+
+
+async def sincronizar_proceso_creado(proceso: dict) -> Dict[str, Dict]:
+    """
+    Cuando se crea un proceso en PostgreSQL, actualiza Neo4j
+    """
+    candidato_id = proceso["candidato_id"]
+    puesto = proceso["puesto"]
+    estado = proceso["estado"]
     
-    # Invalidar caché del candidato
-    redis_client.delete(f"perfil:{candidato_id}")
+    resultado = await sincronizar_en_paralelo({
+        # Crear relación en Neo4j: (Candidato)-[:POSTULA_A]->(Rol)
+        "neo4j": _neo4j_registrar_proceso(candidato_id, puesto, estado),
+        # Invalidar caché del candidato
+        "redis": invalidar_claves([f"perfil:{candidato_id}"]),
+    })
     
-    print(f"✅ Proceso para {candidato_id} en rol {puesto} registrado en Neo4j")
+    if resultado["neo4j"]["ok"]:
+        print(f"✅ Proceso para {candidato_id} en rol {puesto} registrado en Neo4j")
+    return resultado
 
 
-async def matching_automatico(puesto: str, skills_requeridos: List[str]) -> List[Dict]:
+async def sincronizar_oferta_publicada(oferta: dict):
     """
-    Busca candidatos que matcheen con un puesto (usando Neo4j)
+    Cuando se publica una oferta en MongoDB, crea el nodo en Neo4j
+    y lo conecta con la empresa y los skills requeridos
     """
-    with neo4j_driver.session() as session:
-        result = session.run(
+    async def publicar(tx):
+        # Crear nodo de oferta (MERGE para que reintentar sea idempotente)
+        await tx.run(
             """
-            MATCH (c:Candidato)-[:DOMINA]->(s:Skill)
-            WHERE s.nombre IN $skills AND c.activo = true
-            WITH c, COUNT(s) AS match_count
-            WHERE match_count >= $min_match
-            RETURN c.id AS email, c.nombre AS nombre, c.seniority AS seniority, 
-                   match_count
-            ORDER BY match_count DESC
-            LIMIT 10
+            MERGE (of:Oferta {id: $oferta_id})
+            SET of.titulo = $titulo, of.modalidad = $modalidad, of.ubicacion = $ubicacion
             """,
-            skills=skills_requeridos,
-            min_match=len(skills_requeridos) // 2  # Al menos 50% de match
+            oferta_id=oferta["oferta_id"],
+            titulo=oferta["titulo"],
+            modalidad=oferta["modalidad"],
+            ubicacion=oferta.get("ubicacion") or "No especificado"
         )
         
-        candidatos = [
-            {
-                "email": record["email"],
-                "nombre": record["nombre"],
-                "seniority": record["seniority"],
-                "match_skills": record["match_count"],
-                "match_percentage": (record["match_count"] / len(skills_requeridos)) * 100
-            }
-            for record in result
-        ]
-        
-        # Cachear resultado del matching
-        cache_key = f"matching:{puesto}:{'-'.join(sorted(skills_requeridos))}"
-        redis_client.setex(cache_key, 600, json.dumps(candidatos))
+        # Conectar con empresa
+        await tx.run(
+            """
+            MATCH (e:Usuario {email: $empresa_email})
+            MATCH (of:Oferta {id: $oferta_id})
+            MERGE (e)-[:PUBLICA]->(of)
+            """,
+            empresa_email=oferta["empresa"],
+            oferta_id=oferta["oferta_id"]
+        )
         
+        # Conectar con skills requeridos (un solo UNWIND)
+        await escribir_skills(tx, "oferta", oferta["oferta_id"], oferta.get("skills_requeridos", []))
+    
+    async with neo4j_driver_async.session() as session:
+        await session.execute_write(publicar)
+    
+    print(f"✅ Oferta {oferta['oferta_id']} sincronizada en Neo4j")
+
+
+async def _mongo_registrar_aplicacion(aplicacion: dict):
+    # Upsert por aplicacion_id: reintentar el evento no duplica la auditoría
+    await mongo_db_async.historial_cambios.update_one(
+        {"tipo": "aplicacion_creada", "aplicacion_id": aplicacion["aplicacion_id"]},
+        {"$setOnInsert": {
+            "candidato_email": aplicacion["candidato_email"],
+            "oferta_id": aplicacion["oferta_id"],
+            "timestamp": datetime.utcnow()
+        }},
+        upsert=True
+    )
+
+
+async def _neo4j_registrar_aplicacion(aplicacion: dict):
+    async with neo4j_driver_async.session() as session:
+        await session.run(
+            """
+            MERGE (c:Candidato {email: $candidato_email})
+            ON CREATE SET c.email = $candidato_email
+            WITH c
+            MERGE (of:Oferta {id: $oferta_id})
+            ON CREATE SET of.id = $oferta_id
+            MERGE (c)-[r:APLICA_A]->(of)
+            SET r.estado = 'Pendiente', r.fecha = datetime()
+            """,
+            candidato_email=aplicacion["candidato_email"],
+            oferta_id=aplicacion["oferta_id"]
+        )
+
+
+async def sincronizar_aplicacion_creada(aplicacion: dict) -> Dict[str, Dict]:
+    """
+    Cuando se crea una aplicación en PostgreSQL, registra la auditoría
+    en MongoDB y la relación APLICA_A en Neo4j
+    """
+    return await sincronizar_en_paralelo({
+        "mongo": _mongo_registrar_aplicacion(aplicacion),
+        "neo4j": _neo4j_registrar_aplicacion(aplicacion),
+    })
+
+
+async def sincronizar_solicitud_aceptada(solicitud: dict):
+    """
+    Cuando se acepta una solicitud de conexión, crea la relación CONECTADO_CON en Neo4j
+    """
+    async with neo4j_driver_async.session() as session:
+        await session.run(
+            """
+            MERGE (u1:Usuario {email: $email1})
+            ON CREATE SET u1.email = $email1
+            MERGE (u2:Usuario {email: $email2})
+            ON CREATE SET u2.email = $email2
+            MERGE (u1)-[:CONECTADO_CON]-(u2)
+            """,
+            email1=solicitud["remitente_email"],
+            email2=solicitud["destinatario_email"]
+        )
+
+
+def _formatear_match(candidato: Dict) -> Dict:
+    return {
+        "email": candidato["email"],
+        "nombre": candidato["nombre"],
+        "seniority": candidato["seniority"],
+        "match_skills": candidato["match_count"],
+        "match_percentage": round(candidato["cobertura"] * 100, 1),
+        "score": candidato["score"]
+    }
+
+
+async def _calcular_matching(skills: List[str], seniority_minimo: Optional[str],
+                             pesos: Optional[Dict[str, float]]) -> List[Dict]:
+    return [
+        _formatear_match(c)
+        for c in await puntuar(
+            skills, 10,
+            pesos=pesos,
+            seniority_minimo=seniority_minimo,
+            solo_activos=True,
+            min_exactos=max(1, len(skills) // 2)  # Al menos 50% de los skills pedidos
+        )
+    ]
+
+
+async def matching_automatico(puesto: str, skills_requeridos: List[str],
+                              seniority_minimo: Optional[str] = None,
+                              pesos: Optional[Dict[str, float]] = None) -> List[Dict]:
+    """
+    Busca candidatos que matcheen con un puesto (Neo4j o índice en memoria según MATCHING_ENGINE;
+    los dos dan el mismo resultado, ver src/matching.py).
+    Solo entran candidatos activos que tengan al menos la mitad de los skills pedidos (mínimo 1)
+    y que cumplan el seniority mínimo.
+    - match_skills: skills pedidos que el candidato tiene (sin distinguir mayúsculas).
+    - match_percentage: cobertura ponderada de los skills pedidos, de 0 a 100: cada skill
+      aporta su peso (1 por defecto) si el candidato lo tiene, o MATCHING_CREDITO_PARCIAL
+      de su peso si solo tiene uno relacionado, sobre la suma de los pesos.
+    - score: el ranking; la cobertura con bonus por seniority por encima del mínimo.
+    Con Cypher es read-through sobre Redis: requests idénticos concurrentes disparan una sola
+    consulta, y el resultado se invalida cuando cambian skills/activo de un candidato relevante.
+    """
+    skills = sorted(skills_normalizados(skills_requeridos))
+    if not skills:
+        return []
+    
+    if usar_indice():
+        # Motor en memoria: más rápido que una lectura de Redis, no necesita caché
+        return await _calcular_matching(skills, seniority_minimo, pesos)
+    
+    # El resultado depende de los skills, el seniority y los pesos: el puesto no forma parte de la clave
+    cache_key = f"matching:{'-'.join(skills)}"
+    niveles = niveles_desde(seniority_minimo)
+    if niveles:
+        cache_key += f":seniority:{niveles[0]}"
+    pesos_normalizados = {s.strip().lower(): float(p) for s, p in (pesos or {}).items()}
+    if pesos_normalizados:
+        firma = json.dumps(pesos_normalizados, sort_keys=True)
+        cache_key += f":pesos:{hashlib.sha1(firma.encode()).hexdigest()[:12]}"
+    
+    candidatos, desde_cache = await leer_o_calcular(
+        cache_key,
+        MATCHING_CACHE_TTL,
+        lambda: _calcular_matching(skills, seniority_minimo, pesos_normalizados),
+        # Un candidato con un skill relacionado también cambia el resultado
+        tags=["matching", *_tags_matching(skills_con_relacionados(skills))]
+    )
+    
+    if not desde_cache:
         print(f"✅ Matching para {puesto}: {len(candidatos)} candidatos encontrados")
-        return candidatos
+    return candidatos
 
 
 async def registrar_interaccion_mentor(candidato_id: str, mentor_id: str, tipo: str):
     """
     Registra interacciones de mentoring en Neo4j
     """
-    with neo4j_driver.session() as session:
-        session.run(
+    async with neo4j_driver_async.session() as session:
+        await session.run(
             """
             MATCH (c:Candidato {id: $candidato_id})
             MERGE (m:Mentor {id: $mentor_id})
@@ -189,4 +497,54 @@ async def registrar_interaccion_mentor(candidato_id: str, mentor_id: str, tipo:
             tipo=tipo
         )
     
-    print(f"✅ Interacción de mentoring registrada: {candidato_id} <- {mentor_id}")
\ No newline at end of file
+    print(f"✅ Interacción de mentoring registrada: {candidato_id} <- {mentor_id}")
+
+
+# ==================== MANEJADORES DEL OUTBOX ====================
+# El worker de src/outbox.py los invoca con at-least-once: todos deben ser idempotentes
+# y lanzar una excepción si algún store falló, para que el evento se reintente.
+
+def _exigir_sincronizacion(resultado: Dict[str, Dict]):
+    errores = {store: r["error"] for store, r in resultado.items() if not r["ok"]}
+    if errores:
+        raise RuntimeError(f"Sincronización incompleta: {errores}")
+
+
+@registrar_manejador("candidato_creado")
+async def _manejar_candidato_creado(payload: dict):
+    _exigir_sincronizacion(await sincronizar_candidato_creado(payload))
+
+
+@registrar_manejador("proceso_creado")
+async def _manejar_proceso_creado(payload: dict):
+    _exigir_sincronizacion(await sincronizar_proceso_creado(payload))
+
+
+@registrar_manejador("oferta_publicada")
+async def _manejar_oferta_publicada(payload: dict):
+    await sincronizar_oferta_publicada(payload)
+
+
+@registrar_manejador("aplicacion_creada")
+async def _manejar_aplicacion_creada(payload: dict):
+    _exigir_sincronizacion(await sincronizar_aplicacion_creada(payload))
+
+
+@registrar_manejador("solicitud_aceptada")
+async def _manejar_solicitud_aceptada(payload: dict):
+    await sincronizar_solicitud_aceptada(payload)
+
+
+@registrar_manejador("grafo_candidato")
+async def _manejar_grafo_candidato(payload: dict):
+    await reflejar_candidato(payload["email"])
+
+
+@registrar_manejador("matches_oferta")
+async def _manejar_matches_oferta(payload: dict):
+    await recalcular_matches_oferta(payload["oferta_id"])
+
+
+@registrar_manejador("matches_candidato")
+async def _manejar_matches_candidato(payload: dict):
+    await actualizar_matches_candidato(payload["email"])
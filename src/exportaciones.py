@@ -0,0 +1,83 @@
+import os
+import io
+import csv
+import json
+from datetime import datetime
+from typing import AsyncIterator, Iterable, List
+from fastapi.responses import StreamingResponse
+from src.database_async import get_postgres_conn_async, mongo_db_async
+
+# Filas que se piden por vez al cursor de PostgreSQL / documentos por batch de MongoDB
+EXPORT_LOTE = int(os.getenv("EXPORT_LOTE", "1000"))
+# Bytes acumulados antes de enviar un chunk al cliente
+EXPORT_CHUNK = int(os.getenv("EXPORT_CHUNK", "65536"))
+
+FORMATOS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+async def filas_postgres(sql: str, *params) -> AsyncIterator[dict]:
+    """
+    Recorre una consulta con un cursor del lado del servidor (dentro de una transacción
+    de solo lectura): en memoria solo hay EXPORT_LOTE filas a la vez.
+    La conexión queda tomada del pool mientras dure la exportación.
+    """
+    async with get_postgres_conn_async() as conn:
+        async with conn.transaction(readonly=True):
+            async for fila in conn.cursor(sql, *params, prefetch=EXPORT_LOTE):
+                yield dict(fila)
+
+
+async def documentos_mongo(coleccion: str, filtro: dict, proyeccion: dict) -> AsyncIterator[dict]:
+    """Recorre una colección con un cursor de MongoDB que trae EXPORT_LOTE documentos por batch"""
+    async for documento in mongo_db_async[coleccion].find(filtro, proyeccion, batch_size=EXPORT_LOTE):
+        yield documento
+
+
+def _valor_csv(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, (list, tuple)):
+        return ", ".join(str(v) for v in valor)
+    if isinstance(valor, dict):
+        return json.dumps(valor, default=str, ensure_ascii=False)
+    return valor
+
+
+def _json_default(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else str(valor)
+
+
+async def _serializar(filas: AsyncIterator[dict], formato: str, columnas: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    escritor = None
+    if formato == "csv":
+        escritor = csv.DictWriter(buffer, fieldnames=columnas, extrasaction="ignore")
+        escritor.writeheader()
+        # El encabezado sale enseguida, antes de la primera fila
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    async for fila in filas:
+        if escritor:
+            escritor.writerow({c: _valor_csv(fila.get(c)) for c in columnas})
+        else:
+            buffer.write(json.dumps({c: fila.get(c) for c in columnas}, default=_json_default, ensure_ascii=False))
+            buffer.write("\n")
+        if buffer.tell() >= EXPORT_CHUNK:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def respuesta_exportacion(filas: AsyncIterator[dict], formato: str, columnas: Iterable[str],
+                          nombre: str) -> StreamingResponse:
+    """StreamingResponse NDJSON o CSV con las columnas indicadas, como archivo adjunto"""
+    columnas = list(columnas)
+    return StreamingResponse(
+        _serializar(filas, formato, columnas),
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}.{formato}"'}
+    )
@@ -0,0 +1,79 @@
+from typing import List, Iterable
+from src.database_async import neo4j_driver_async
+
+# Nodo dueño de los skills -> (label, propiedad clave, relación hacia :Skill, se crea si no existe).
+# Los labels y relaciones no se pueden parametrizar en Cypher: solo se interpolan estas constantes.
+_DUENOS_SKILL = {
+    "candidato": ("Candidato", "id", "DOMINA", False),
+    "oferta": ("Oferta", "id", "REQUIERE", False),
+    "usuario": ("Usuario", "email", "TIENE_SKILL", True),
+}
+
+
+def _normalizar_skills(skills: Iterable[str]) -> List[str]:
+    """Quita vacíos y duplicados conservando el orden"""
+    vistos = set()
+    resultado = []
+    for skill in skills:
+        if skill and skill not in vistos:
+            vistos.add(skill)
+            resultado.append(skill)
+    return resultado
+
+
+async def escribir_skills(tx, dueno: str, id: str, skills: Iterable[str]):
+    """
+    Vincula una lista completa de skills en un único statement UNWIND.
+    Se ejecuta dentro de la transacción `tx` del llamador.
+    """
+    label, clave, relacion, crear = _DUENOS_SKILL[dueno]
+    skills = _normalizar_skills(skills)
+    if not skills:
+        return
+    await tx.run(
+        f"""
+        {"MERGE" if crear else "MATCH"} (n:{label} {{{clave}: $id}})
+        WITH n
+        UNWIND $skills AS skill
+        MERGE (s:Skill {{nombre: skill}})
+        MERGE (n)-[:{relacion}]->(s)
+        """,
+        id=id,
+        skills=skills
+    )
+
+
+async def desvincular_skills(tx, dueno: str, id: str, skills: Iterable[str]):
+    """Elimina solo las relaciones con los skills indicados, en un único statement UNWIND"""
+    label, clave, relacion, _ = _DUENOS_SKILL[dueno]
+    skills = _normalizar_skills(skills)
+    if not skills:
+        return
+    await tx.run(
+        f"""
+        MATCH (n:{label} {{{clave}: $id}})-[r:{relacion}]->(s:Skill)
+        WHERE s.nombre IN $skills
+        DELETE r
+        """,
+        id=id,
+        skills=skills
+    )
+
+
+def diferencia_skills(anteriores: Iterable[str], nuevas: Iterable[str]):
+    """Devuelve (agregadas, eliminadas) entre dos listas de skills, conservando el orden"""
+    anteriores = _normalizar_skills(anteriores)
+    nuevas = _normalizar_skills(nuevas)
+    set_anteriores, set_nuevas = set(anteriores), set(nuevas)
+    agregadas = [s for s in nuevas if s not in set_anteriores]
+    eliminadas = [s for s in anteriores if s not in set_nuevas]
+    return agregadas, eliminadas
+
+
+async def vincular_skills(dueno: str, id: str, skills: Iterable[str]):
+    """Vincula skills a un nodo en una transacción administrada (un solo round trip Bolt)"""
+    skills = _normalizar_skills(skills)
+    if not skills:
+        return
+    async with neo4j_driver_async.session() as session:
+        await session.execute_write(escribir_skills, dueno, id, skills)
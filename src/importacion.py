@@ -0,0 +1,310 @@
+import os
+import sys
+import csv
+import json
+import time
+import codecs
+import asyncio
+import argparse
+from typing import AsyncIterable, AsyncIterator, List, Optional, Tuple
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from src.models import Candidato
+from src.database_async import mongo_db_async, neo4j_driver_async, get_postgres_conn_async, close_async_clients
+from src.events import sincronizar_en_paralelo, invalidar_matching
+from src.outbox import encolar_eventos, eventos_embebidos, CAMPO_EVENTOS
+from src.cache import invalidar_claves
+from src.cambios import emitir_cambio
+from src.matching import normalizar_lista_skills, skills_normalizados, SENIORITY_POR_DEFECTO
+from src.matches_ofertas import ofertas_con_skills
+
+# Filas que se validan y escriben juntas en cada base
+IMPORT_LOTE = int(os.getenv("IMPORT_LOTE", "1000"))
+# Errores por fila que se incluyen en el reporte (el conteo total siempre es exacto)
+IMPORT_MAX_ERRORES = int(os.getenv("IMPORT_MAX_ERRORES", "1000"))
+
+# (número de fila, datos crudos o None, error de parseo o None)
+Fila = Tuple[int, Optional[dict], Optional[str]]
+
+
+async def lineas(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Parte un stream de bytes UTF-8 en líneas sin cargarlo completo en memoria"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    resto = ""
+    async for chunk in chunks:
+        resto += decoder.decode(chunk)
+        *completas, resto = resto.split("\n")
+        for linea in completas:
+            yield linea.rstrip("\r")
+    resto += decoder.decode(b"", final=True)
+    if resto.strip():
+        yield resto.rstrip("\r")
+
+
+async def filas_ndjson(texto: AsyncIterable[str]) -> AsyncIterator[Fila]:
+    numero = 0
+    async for linea in texto:
+        numero += 1
+        if not linea.strip():
+            continue
+        try:
+            datos = json.loads(linea)
+        except ValueError as e:
+            yield numero, None, f"JSON inválido: {e}"
+            continue
+        if not isinstance(datos, dict):
+            yield numero, None, "Se esperaba un objeto JSON por línea"
+            continue
+        yield numero, datos, None
+
+
+async def filas_csv(texto: AsyncIterable[str]) -> AsyncIterator[Fila]:
+    """
+    CSV con encabezado (nombre, email, seniority, skills). Los skills van en una sola columna
+    separados por ";" o ",". Cada registro debe ocupar una línea.
+    """
+    columnas = None
+    numero = 0
+    async for linea in texto:
+        numero += 1
+        if not linea.strip():
+            continue
+        valores = next(csv.reader([linea]))
+        if columnas is None:
+            columnas = [c.strip().lower() for c in valores]
+            continue
+        if len(valores) != len(columnas):
+            yield numero, None, f"Se esperaban {len(columnas)} columnas y hay {len(valores)}"
+            continue
+        datos = {c: v.strip() for c, v in zip(columnas, valores) if v.strip()}
+        if "skills" in datos:
+            datos["skills"] = normalizar_lista_skills(datos["skills"].replace(";", ","))
+        yield numero, datos, None
+
+
+LECTORES = {"ndjson": filas_ndjson, "csv": filas_csv}
+
+
+class _Reporte:
+    def __init__(self):
+        self.procesadas = 0
+        self.importadas = 0
+        self.cantidad_errores = 0
+        self.errores: List[dict] = []
+        self.pendientes_sincronizacion = 0
+        self.skills: set = set()
+
+    def error(self, fila: int, email: Optional[str], mensaje: str):
+        self.cantidad_errores += 1
+        if len(self.errores) < IMPORT_MAX_ERRORES:
+            self.errores.append({"fila": fila, "email": email, "error": mensaje})
+
+
+def _mensaje_validacion(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or 'fila'}: {e['msg']}" for e in error.errors()
+    )
+
+
+async def _neo4j_crear_candidatos(candidatos: List[dict]):
+    async def crear(tx):
+        # Nodos y relaciones de todo el lote en un solo statement UNWIND
+        await tx.run(
+            """
+            UNWIND $candidatos AS c
+            MERGE (n:Candidato {id: c.email})
+            SET n.nombre = c.nombre, n.seniority = c.seniority, n.activo = true
+            WITH n, c
+            UNWIND c.skills AS skill
+            MERGE (s:Skill {nombre: skill})
+            MERGE (n)-[:DOMINA]->(s)
+            """,
+            candidatos=candidatos
+        )
+
+    async with neo4j_driver_async.session() as session:
+        await session.execute_write(crear)
+    await invalidar_matching(sorted({s for c in candidatos for s in c["skills"]}))
+
+
+async def _postgres_upsert_candidatos(candidatos: List[dict]):
+    # Un solo INSERT con arrays (unnest): equivalente a execute_values en asyncpg
+    async with get_postgres_conn_async() as conn:
+        await conn.execute(
+            """
+            INSERT INTO candidatos (nombre, email, seniority)
+            SELECT * FROM unnest($1::text[], $2::text[], $3::text[])
+            ON CONFLICT (email) DO UPDATE
+            SET nombre = EXCLUDED.nombre, seniority = EXCLUDED.seniority
+            """,
+            [c["nombre"] for c in candidatos],
+            [c["email"] for c in candidatos],
+            [c["seniority"] for c in candidatos]
+        )
+
+
+async def _redis_invalidar_candidatos(candidatos: List[dict]):
+    emails = [c["email"] for c in candidatos]
+    await invalidar_claves([f"perfil:{email}" for email in emails])
+    await emitir_cambio("candidatos_importados", emails=emails)
+
+
+def _evento_creado(documento: dict) -> dict:
+    return {
+        "email": documento["email"],
+        "nombre": documento["nombre"],
+        "seniority": documento.get("seniority") or SENIORITY_POR_DEFECTO,
+        "skills": list(dict.fromkeys(s for s in documento["skills"] if s)),
+    }
+
+
+async def _quitar_eventos(ids: list):
+    """Quita de los perfiles recién insertados los eventos de alta ya sincronizados o encolados"""
+    perfiles = mongo_db_async.perfiles
+    await perfiles.update_many(
+        {"_id": {"$in": ids}},
+        {"$pull": {CAMPO_EVENTOS: {"tipo": {"$in": ["candidato_creado", "matches_candidato"]}}}}
+    )
+    await perfiles.update_many({"_id": {"$in": ids}, CAMPO_EVENTOS: {"$size": 0}},
+                               {"$unset": {CAMPO_EVENTOS: ""}})
+
+
+async def _importar_lote(filas: List[Fila], reporte: _Reporte):
+    documentos, origen = [], []
+    vistos = set()
+    for numero, datos, error in filas:
+        reporte.procesadas += 1
+        if error:
+            reporte.error(numero, None, error)
+            continue
+        try:
+            candidato = Candidato(**datos)
+        except ValidationError as e:
+            reporte.error(numero, datos.get("email"), _mensaje_validacion(e))
+            continue
+        if candidato.email in vistos:
+            reporte.error(numero, candidato.email, "Email repetido en el lote")
+            continue
+        vistos.add(candidato.email)
+        documento = candidato.dict()
+        documento["skills_lower"] = skills_normalizados(candidato.skills)
+        # Igual que el alta individual: los eventos viajan en la misma escritura que el perfil,
+        # así una caída antes de sincronizar no pierde candidatos (los releva relevar_pendientes)
+        documento[CAMPO_EVENTOS] = eventos_embebidos(
+            ("candidato_creado", _evento_creado(documento)),
+            ("matches_candidato", {"email": candidato.email})
+        )
+        documentos.append(documento)
+        origen.append(numero)
+    if not documentos:
+        return
+
+    # 1. MongoDB: insert_many sin orden; las filas que fallan (ej: email existente) se reportan
+    fallidas = {}
+    try:
+        await mongo_db_async.perfiles.insert_many(documentos, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            fallidas[error["index"]] = "El email ya existe" if error.get("code") == 11000 else error.get("errmsg")
+    for indice, mensaje in fallidas.items():
+        reporte.error(origen[indice], documentos[indice]["email"], mensaje)
+
+    insertados = [d for i, d in enumerate(documentos) if i not in fallidas]
+    if not insertados:
+        return
+    candidatos = [d[CAMPO_EVENTOS][0]["payload"] for d in insertados]
+    ids = [d["_id"] for d in insertados]
+    reporte.importadas += len(candidatos)
+    reporte.skills.update(s for c in candidatos for s in skills_normalizados(c["skills"]))
+
+    # 2. Neo4j, PostgreSQL y Redis en paralelo, una operación por base para todo el lote
+    resultado = await sincronizar_en_paralelo({
+        "neo4j": _neo4j_crear_candidatos(candidatos),
+        "postgres": _postgres_upsert_candidatos(candidatos),
+        "redis": _redis_invalidar_candidatos(candidatos),
+    })
+    try:
+        if not all(r["ok"] for r in resultado.values()):
+            # El worker del outbox reintenta candidato por candidato (los manejadores son idempotentes);
+            # los matches se recalculan por oferta al final de la importación
+            reporte.pendientes_sincronizacion += len(candidatos)
+            await asyncio.to_thread(encolar_eventos, [("candidato_creado", c) for c in candidatos])
+        await _quitar_eventos(ids)
+    except Exception as e:
+        print(f"⚠️ Outbox no disponible, los eventos quedan en los perfiles para reintentar: {e}")
+
+
+async def importar_candidatos(filas: AsyncIterable[Fila]) -> dict:
+    """
+    Importa candidatos en lotes de IMPORT_LOTE: valida con el modelo Candidato, insert_many en
+    `perfiles` y sincroniza cada lote con un UNWIND en Neo4j, un upsert en `candidatos` y un
+    pipeline en Redis. Al final encola el recálculo de las ofertas afectadas.
+    Devuelve un reporte con los errores por fila.
+    """
+    reporte = _Reporte()
+    inicio = time.monotonic()
+    lote: List[Fila] = []
+    async for fila in filas:
+        lote.append(fila)
+        if len(lote) >= IMPORT_LOTE:
+            await _importar_lote(lote, reporte)
+            lote = []
+    if lote:
+        await _importar_lote(lote, reporte)
+
+    # Matches materializados: una vez por oferta afectada en vez de una vez por candidato
+    ofertas = []
+    if reporte.skills:
+        try:
+            ofertas = await ofertas_con_skills(sorted(reporte.skills))
+            await asyncio.to_thread(encolar_eventos, [("matches_oferta", {"oferta_id": o}) for o in ofertas])
+        except Exception as e:
+            print(f"⚠️ Error al encolar recálculo de matches tras la importación: {e}")
+
+    segundos = time.monotonic() - inicio
+    return {
+        "procesadas": reporte.procesadas,
+        "importadas": reporte.importadas,
+        "con_error": reporte.cantidad_errores,
+        "pendientes_sincronizacion": reporte.pendientes_sincronizacion,
+        "ofertas_a_recalcular": len(ofertas),
+        "segundos": round(segundos, 3),
+        "filas_por_segundo": round(reporte.procesadas / segundos) if segundos else None,
+        "errores": reporte.errores,
+    }
+
+
+async def _leer_archivo(archivo) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await asyncio.to_thread(archivo.read, 1 << 20)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _formato_por_extension(ruta: str) -> str:
+    return "csv" if ruta.lower().endswith(".csv") else "ndjson"
+
+
+async def _main(ruta: str, formato: Optional[str]):
+    formato = formato or _formato_por_extension(ruta)
+    archivo = sys.stdin.buffer if ruta == "-" else open(ruta, "rb")
+    try:
+        reporte = await importar_candidatos(LECTORES[formato](lineas(_leer_archivo(archivo))))
+    finally:
+        if archivo is not sys.stdin.buffer:
+            archivo.close()
+        await close_async_clients()
+    print(json.dumps(reporte, ensure_ascii=False, indent=2))
+    print(f"✅ {reporte['importadas']}/{reporte['procesadas']} candidatos importados "
+          f"({reporte['filas_por_segundo']} filas/s)")
+    if reporte["con_error"]:
+        print(f"⚠️ {reporte['con_error']} filas con error")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importación masiva de candidatos desde NDJSON o CSV")
+    parser.add_argument("archivo", help="Ruta del archivo, o - para leer de stdin")
+    parser.add_argument("--formato", choices=sorted(LECTORES), help="Por defecto según la extensión")
+    args = parser.parse_args()
+    asyncio.run(_main(args.archivo, args.formato))
@@ -1,22 +1,68 @@
-from fastapi import FastAPI, HTTPException, Body, Depends, status
+from fastapi import FastAPI, HTTPException, Body, Depends, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
 from src.models import Candidato, Proceso, Curso, Inscripcion, Empresa, OfertaLaboral, Entrevista, EvaluacionTecnica, SolicitudConexion, ExperienciaLaboral
-from src.database import mongo_db, postgres_conn, neo4j_driver, redis_client
+from src.database import mongo_db, get_postgres_conn, neo4j_driver, redis_client
+from src.database_async import (
+    mongo_db_async,
+    redis_client_async,
+    neo4j_driver_async,
+    get_postgres_conn_async,
+    init_async_clients,
+    close_async_clients
+)
 from src.events import (
-    sincronizar_candidato_creado, 
     sincronizar_candidato_actualizado,
-    sincronizar_proceso_creado,
     matching_automatico,
     registrar_interaccion_mentor
 )
-from src.auth import hash_password, verificar_password, generar_token_jwt, get_current_user, require_admin
-from typing import List, Optional
+from src.outbox import (
+    encolar_evento, encolar_eventos, outbox_worker, relevar_pendientes, relevar_eventos, eventos_embebidos, CAMPO_EVENTOS
+)
+from src.graph_writer import vincular_skills
+from src.cambios import escuchar_cambios, emitir_cambio
+from src.cache import leer_o_calcular, cacheado, invalidar_claves, invalidar_tags
+from src.usuarios import obtener_usuario, obtener_usuarios, invalidar_usuarios
+from src.importacion import importar_candidatos, lineas, LECTORES as LECTORES_IMPORTACION
+from src.exportaciones import filas_postgres, documentos_mongo, respuesta_exportacion
+from src.migraciones import migrar, RECALCULAR_SKILLS_LOWER
+from src.matching import buscar_por_skills, mantener_indice, skills_normalizados, SENIORITY_POR_DEFECTO
+from src.matches_ofertas import leer_matches_oferta, recalcular_matches_oferta, calcular_matches_oferta
+from src.auth import hash_password, verificar_password, generar_token_jwt, get_current_user, require_admin, require_recruiter
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+import os
+import uuid
+import base64
+import asyncio
+import hashlib
+import re
+from typing import Dict, List, Optional
 from datetime import datetime
 import json
 from bson import ObjectId
-
-app = FastAPI(title="Talentum+")
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicializa los clientes asíncronos y las tareas de fondo; los cierra al apagar"""
+    await init_async_clients()
+    await migrar()
+    detener = asyncio.Event()
+    tareas = [
+        asyncio.create_task(outbox_worker(detener)),
+        asyncio.create_task(relevar_pendientes(detener)),
+        asyncio.create_task(escuchar_cambios(detener)),
+        asyncio.create_task(mantener_indice(detener)),
+    ]
+    yield
+    detener.set()
+    await asyncio.gather(*tareas)
+    await close_async_clients()
+
+app = FastAPI(title="Talentum+", lifespan=lifespan)
 
 # Agregar CORS para el frontend
 app.add_middleware(
@@ -25,6 +71,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 @app.get("/", response_class=HTMLResponse)
@@ -101,26 +148,39 @@ async def dashboard():
 @app.post("/candidatos", status_code=201)
 async def crear_candidato(candidato: Candidato):
     try:
-        # 1. Guardar en MongoDB
+        evento = {
+            "email": candidato.email,
+            "nombre": candidato.nombre,
+            "skills": candidato.skills,
+            "seniority": candidato.seniority or SENIORITY_POR_DEFECTO
+        }
+        
+        # 1. Guardar en MongoDB junto con los eventos de sincronización (misma escritura atómica)
         candidato_dict = candidato.dict()
-        result = mongo_db.perfiles.insert_one(candidato_dict)
-        candidato_dict["_id"] = str(result.inserted_id)
+        candidato_dict["skills_lower"] = skills_normalizados(candidato.skills)
+        candidato_dict[CAMPO_EVENTOS] = eventos_embebidos(
+            ("candidato_creado", evento),
+            ("matches_candidato", {"email": candidato.email})
+        )
+        result = await mongo_db_async.perfiles.insert_one(candidato_dict)
+        
+        # Descartar un posible 404 cacheado para este email
+        try:
+            await cargar_perfil.invalidar(candidato.email)
+        except Exception as e:
+            print(f"⚠️ Error al invalidar caché del perfil: {e}")
         
-        # 2. SINCRONIZAR con otras BDs
+        # 2. Pasar los eventos al outbox (el worker los propaga y reintenta); si falla,
+        #    quedan en el perfil y los releva la barrida periódica
         try:
-            await sincronizar_candidato_creado(candidato_dict)
-            sincronizado = True
-            mensaje = "Candidato creado y sincronizado correctamente"
-        except Exception as sync_error:
-            # Si falla la sincronización, log pero NO fallar el request
-            print(f"⚠️ Error en sincronización: {sync_error}")
-            sincronizado = False
-            mensaje = "Candidato creado pero con errores en sincronización"
+            await relevar_eventos("perfiles", {"_id": result.inserted_id})
+        except Exception as e:
+            print(f"⚠️ Outbox no disponible, los eventos quedan en el perfil para reintentar: {e}")
         
         return {
             "id": str(result.inserted_id), 
-            "sincronizado": sincronizado,
-            "mensaje": mensaje,
+            "sincronizacion": "pendiente",
+            "mensaje": "Candidato creado; la sincronización se completará en segundo plano",
             "email": candidato.email,
             "nombre": candidato.nombre
         }
@@ -128,10 +188,89 @@ async def crear_candidato(candidato: Candidato):
         print(f"❌ Error al crear candidato: {e}")
         raise HTTPException(status_code=500, detail=f"Error al crear candidato: {str(e)}")
 
+@app.post("/candidatos/importar")
+async def importar_candidatos_masivo(
+    request: Request,
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    _: dict = Depends(require_recruiter)
+):
+    """
+    Importación masiva de candidatos: el cuerpo (NDJSON o CSV) se procesa como stream, por lotes.
+    Devuelve cuántas filas se importaron y el error de cada fila rechazada.
+    También disponible por línea de comandos: python -m src.importacion archivo.csv
+    """
+    return await importar_candidatos(LECTORES_IMPORTACION[formato](lineas(request.stream())))
+
+# --- Búsqueda de candidatos por skills (debe estar ANTES de /candidatos/{email}) ---
+
+@app.get("/candidatos/buscar-por-skills")
+async def buscar_candidatos_por_skills(skills: str):
+    """
+    Busca candidatos que tengan los skills especificados.
+    Parámetro skills: string con skills separados por comas (ej: "Python,React,Docker")
+    """
+    if not skills:
+        raise HTTPException(status_code=400, detail="Debes especificar al menos un skill")
+    
+    # Convertir string a lista
+    skills_list = [s.strip() for s in skills.split(",") if s.strip()]
+    
+    if not skills_list:
+        raise HTTPException(status_code=400, detail="Debes especificar al menos un skill válido")
+    
+    # Mismo resultado con los dos motores: candidatos (perfiles) y skills sin distinguir mayúsculas
+    buscados = skills_normalizados(skills_list)
+    try:
+        candidatos = [
+            {
+                "email": c["email"],
+                "nombre": c["nombre"],
+                "skills_matched": c["skills_matched"],
+                "match_count": c["match_count"],
+                "match_percentage": round(c["match_count"] * 100.0 / len(buscados), 1)
+            }
+            for c in await buscar_por_skills(buscados, 50)
+        ]
+        return {
+            "skills_buscados": skills_list,
+            "candidatos_encontrados": len(candidatos),
+            "candidatos": candidatos
+        }
+    except Exception as e:
+        # Si Neo4j falla, buscar en PostgreSQL (sin matching de skills)
+        print(f"⚠️ Error en Neo4j, buscando en PostgreSQL: {e}")
+        async with get_postgres_conn_async() as conn:
+            resultados = await conn.fetch(
+                """
+                SELECT email, nombre, rol 
+                FROM usuarios 
+                WHERE rol = 'candidato'
+                LIMIT 50
+                """
+            )
+        
+        candidatos = [
+            {
+                "email": row["email"],
+                "nombre": row["nombre"],
+                "skills_matched": [],
+                "match_count": 0,
+                "match_percentage": 0
+            }
+            for row in resultados
+        ]
+        
+        return {
+            "skills_buscados": skills_list,
+            "candidatos_encontrados": len(candidatos),
+            "candidatos": candidatos,
+            "nota": "Búsqueda básica (Neo4j no disponible)"
+        }
+
 # --- Endpoints de Historial Laboral (deben estar ANTES de /candidatos/{email}) ---
 
 @app.get("/candidatos/{email}/historial-laboral")
-async def obtener_historial_laboral(email: str):
+def obtener_historial_laboral(email: str):
     """
     Obtiene el historial laboral completo del candidato desde MongoDB
     """
@@ -172,15 +311,12 @@ async def agregar_experiencia_laboral(email: str, experiencia: dict = Body(...))
         raise HTTPException(status_code=400, detail="Fecha de inicio es obligatoria")
     
     # Verificar que el usuario existe en PostgreSQL y es candidato
-    cursor = postgres_conn.cursor()
-    cursor.execute("SELECT nombre, rol FROM usuarios WHERE email = %s", (email,))
-    usuario = cursor.fetchone()
-    cursor.close()
+    usuario = await obtener_usuario(email)
     
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    if usuario[1] != 'candidato':
+    if usuario["rol"] != 'candidato':
         raise HTTPException(status_code=403, detail="Solo los candidatos pueden agregar experiencia laboral")
     
     try:
@@ -202,13 +338,14 @@ async def agregar_experiencia_laboral(email: str, experiencia: dict = Body(...))
             experiencia_normalizada["fecha_fin"] = None
         
         # Agregar en MongoDB usando $push
-        result = mongo_db.perfiles.update_one(
+        result = await mongo_db_async.perfiles.update_one(
             {"email": email},
             {
                 "$push": {"historial_laboral": experiencia_normalizada},
                 "$setOnInsert": {
-                    "nombre": usuario[0],
+                    "nombre": usuario["nombre"],
                     "skills": [],
+                    "skills_lower": [],
                     "experiencia": "",
                     "educacion": "",
                     "created_at": datetime.utcnow()
@@ -218,7 +355,7 @@ async def agregar_experiencia_laboral(email: str, experiencia: dict = Body(...))
         )
         
         # Invalidar cache
-        redis_client.delete(f"perfil:{email}")
+        await cargar_perfil.invalidar(email)
         
         return {
             "success": True,
@@ -235,7 +372,7 @@ async def actualizar_experiencia_laboral(email: str, index: int, experiencia: di
     Actualiza una experiencia laboral específica del historial (por índice)
     """
     try:
-        perfil = mongo_db.perfiles.find_one({"email": email})
+        perfil = await mongo_db_async.perfiles.find_one({"email": email})
         
         if not perfil:
             raise HTTPException(status_code=404, detail="Perfil no encontrado")
@@ -268,13 +405,13 @@ async def actualizar_experiencia_laboral(email: str, index: int, experiencia: di
         historial[index] = experiencia_actualizada
         
         # Actualizar en MongoDB
-        mongo_db.perfiles.update_one(
+        await mongo_db_async.perfiles.update_one(
             {"email": email},
             {"$set": {"historial_laboral": historial}}
         )
         
         # Invalidar cache
-        redis_client.delete(f"perfil:{email}")
+        await cargar_perfil.invalidar(email)
         
         return {
             "success": True,
@@ -293,7 +430,7 @@ async def eliminar_experiencia_laboral(email: str, index: int):
     Elimina una experiencia laboral específica del historial (por índice)
     """
     try:
-        perfil = mongo_db.perfiles.find_one({"email": email})
+        perfil = await mongo_db_async.perfiles.find_one({"email": email})
         
         if not perfil:
             raise HTTPException(status_code=404, detail="Perfil no encontrado")
@@ -310,13 +447,13 @@ async def eliminar_experiencia_laboral(email: str, index: int):
         historial.pop(index)
         
         # Actualizar en MongoDB
-        mongo_db.perfiles.update_one(
+        await mongo_db_async.perfiles.update_one(
             {"email": email},
             {"$set": {"historial_laboral": historial}}
         )
         
         # Invalidar cache
-        redis_client.delete(f"perfil:{email}")
+        await cargar_perfil.invalidar(email)
         
         return {
             "success": True,
@@ -329,61 +466,95 @@ async def eliminar_experiencia_laboral(email: str, index: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al eliminar experiencia laboral: {str(e)}")
 
+@cacheado("perfil:{email}", ttl=3600, stale=300, ttl_ausente=30)
+async def cargar_perfil(email: str) -> Optional[dict]:
+    candidato = await mongo_db_async.perfiles.find_one({"email": email}, {CAMPO_EVENTOS: 0})
+    if candidato:
+        candidato["_id"] = str(candidato["_id"])
+    return candidato
+
 @app.get("/candidatos/{email}")
 async def obtener_candidato(email: str):
-    # Intentar desde caché primero
-    cached = redis_client.get(f"perfil:{email}")
-    if cached:
-        return {"source": "cache", **json.loads(cached)}
-    
-    # Si no está en caché, buscar en MongoDB
-    candidato = mongo_db.perfiles.find_one({"email": email})
+    candidato, desde_cache = await cargar_perfil.leer(email)
     if not candidato:
         raise HTTPException(status_code=404, detail="Candidato no encontrado")
     
-    candidato["_id"] = str(candidato["_id"])
-    return {"source": "mongodb", **candidato}
+    return {"source": "cache" if desde_cache else "mongodb", **candidato}
 
 @app.put("/candidatos/{email}")
 async def actualizar_candidato(email: str, cambios: dict):
     """
     Actualiza un candidato y sincroniza cambios en todas las BDs
     """
-    result = mongo_db.perfiles.update_one(
+    # Devuelve los skills previos para propagar solo el diff
+    anterior = await mongo_db_async.perfiles.find_one_and_update(
         {"email": email},
-        {"$set": cambios}
+        {"$set": cambios},
+        projection={"_id": 0, "skills": 1},
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.matched_count == 0:
+    if anterior is None:
         raise HTTPException(status_code=404, detail="Candidato no encontrado")
     
-    await sincronizar_candidato_actualizado(email, cambios)
+    skills_anteriores = anterior.get("skills", [])
+    if isinstance(skills_anteriores, str):
+        skills_anteriores = [s.strip() for s in skills_anteriores.split(",") if s.strip()]
+    
+    if "skills" in cambios:
+        await recalcular_skills_lower(email)
+    
+    sincronizacion = await sincronizar_candidato_actualizado(email, cambios, skills_anteriores)
     
-    return {"updated": True, "sincronizado": True}
+    if cambios.keys() & {"skills", "seniority", "activo", "nombre"}:
+        try:
+            await asyncio.to_thread(encolar_evento, "matches_candidato", {"email": email})
+        except Exception as e:
+            print(f"⚠️ Error al encolar actualización de matches: {e}")
+    
+    return {
+        "updated": True,
+        "sincronizado": all(r["ok"] for r in sincronizacion.values()),
+        "sincronizacion": sincronizacion
+    }
 
 # ==================== GESTIÓN DE SKILLS (CANDIDATOS) ====================
 
+async def notificar_perfil_modificado(email: str):
+    """
+    Avisa a los suscriptores (ej: índice de matching) que cambió un perfil y encola la copia
+    del perfil al nodo :Candidato (motor Cypher) y la actualización de los matches
+    materializados de las ofertas; no falla el request
+    """
+    try:
+        await emitir_cambio("perfil_modificado", email=email)
+    except Exception as e:
+        print(f"⚠️ Error al notificar cambio de perfil: {e}")
+    try:
+        await asyncio.to_thread(
+            encolar_eventos, [("grafo_candidato", {"email": email}), ("matches_candidato", {"email": email})]
+        )
+    except Exception as e:
+        print(f"⚠️ Error al encolar actualización de matches: {e}")
+
 @app.get("/candidatos/{email}/perfil")
 async def obtener_perfil_candidato(email: str):
     """
     Obtiene el perfil completo del candidato desde MongoDB
     """
     try:
-        perfil = mongo_db.perfiles.find_one({"email": email}, {"_id": 0})
+        perfil = await mongo_db_async.perfiles.find_one({"email": email}, {"_id": 0, CAMPO_EVENTOS: 0})
         if not perfil:
             # Si no existe, buscar en PostgreSQL para verificar que es candidato
-            cursor = postgres_conn.cursor()
-            cursor.execute("SELECT nombre, rol FROM usuarios WHERE email = %s", (email,))
-            usuario = cursor.fetchone()
-            cursor.close()
+            usuario = await obtener_usuario(email)
             
-            if not usuario or usuario[1] != 'candidato':
+            if not usuario or usuario["rol"] != 'candidato':
                 raise HTTPException(status_code=404, detail="Candidato no encontrado")
             
             # Retornar perfil básico
             return {
                 "email": email,
-                "nombre": usuario[0],
+                "nombre": usuario["nombre"],
                 "seniority": None,
                 "skills": [],
                 "experiencia": "",
@@ -402,7 +573,7 @@ async def obtener_perfil_candidato(email: str):
         raise HTTPException(status_code=500, detail=f"Error al obtener perfil: {str(e)}")
 
 @app.get("/candidatos/{email}/skills")
-async def obtener_skills_candidato(email: str):
+def obtener_skills_candidato(email: str):
     """
     Obtiene todas las skills de un candidato desde MongoDB (array en perfil)
     """
@@ -433,7 +604,7 @@ async def obtener_skills_candidato(email: str):
             # Actualizar a formato array
             mongo_db.perfiles.update_one(
                 {"email": email},
-                {"$set": {"skills": skills}}
+                {"$set": {"skills": skills, "skills_lower": skills_normalizados(skills)}}
             )
         
         return {"email": email, "skills": skills, "total": len(skills)}
@@ -453,21 +624,18 @@ async def agregar_skill_candidato(email: str, skill: str = Body(..., embed=True)
         raise HTTPException(status_code=400, detail="La skill no puede estar vacía")
     
     # Verificar que el usuario existe en PostgreSQL y es candidato
-    cursor = postgres_conn.cursor()
-    cursor.execute("SELECT nombre, rol FROM usuarios WHERE email = %s", (email,))
-    usuario = cursor.fetchone()
-    cursor.close()
+    usuario = await obtener_usuario(email)
     
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    if usuario[1] != 'candidato':
+    if usuario["rol"] != 'candidato':
         raise HTTPException(status_code=403, detail="Solo los candidatos pueden gestionar skills")
     
     try:
         # Agregar en Neo4j
-        with neo4j_driver.session() as session:
-            session.run(
+        async with neo4j_driver_async.session() as session:
+            await session.run(
                 """
                 MERGE (c:Usuario {email: $email})
                 MERGE (s:Skill {nombre: $skill})
@@ -478,12 +646,12 @@ async def agregar_skill_candidato(email: str, skill: str = Body(..., embed=True)
             )
         
         # Agregar en MongoDB usando $addToSet (evita duplicados automáticamente)
-        result = mongo_db.perfiles.update_one(
+        result = await mongo_db_async.perfiles.update_one(
             {"email": email},
             {
-                "$addToSet": {"skills": skill},
+                "$addToSet": {"skills": skill, "skills_lower": skill.lower()},
                 "$setOnInsert": {
-                    "nombre": usuario[0],
+                    "nombre": usuario["nombre"],
                     "experiencia": "",
                     "educacion": "",
                     "created_at": datetime.utcnow()
@@ -493,7 +661,8 @@ async def agregar_skill_candidato(email: str, skill: str = Body(..., embed=True)
         )
         
         # Invalidar cache
-        redis_client.delete(f"perfil:{email}")
+        await cargar_perfil.invalidar(email)
+        await notificar_perfil_modificado(email)
         
         return {
             "success": True,
@@ -515,8 +684,8 @@ async def eliminar_skill_candidato(email: str, skill: str):
     
     try:
         # Eliminar en Neo4j
-        with neo4j_driver.session() as session:
-            result = session.run(
+        async with neo4j_driver_async.session() as session:
+            result = await session.run(
                 """
                 MATCH (c:Usuario {email: $email})-[r:TIENE_SKILL]->(s:Skill {nombre: $skill})
                 DELETE r
@@ -525,19 +694,23 @@ async def eliminar_skill_candidato(email: str, skill: str):
                 email=email,
                 skill=skill
             )
-            deleted = result.single()["deleted"]
+            deleted = (await result.single())["deleted"]
         
         # Eliminar en MongoDB usando $pull
-        mongo_result = mongo_db.perfiles.update_one(
+        mongo_result = await mongo_db_async.perfiles.update_one(
             {"email": email},
             {"$pull": {"skills": skill}}
         )
         
         if deleted == 0 and mongo_result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Skill no encontrada en el perfil")
+        if mongo_result.modified_count:
+            # Puede quedar la misma skill con otras mayúsculas: se recalcula en vez de hacer $pull
+            await recalcular_skills_lower(email)
         
         # Invalidar cache
-        redis_client.delete(f"perfil:{email}")
+        await cargar_perfil.invalidar(email)
+        await notificar_perfil_modificado(email)
         
         return {"success": True, "skill": skill, "mensaje": f"Skill '{skill}' eliminada exitosamente"}
     
@@ -562,38 +735,40 @@ async def actualizar_seniority(email: str, seniority: str = Body(..., embed=True
         )
     
     # Verificar que el usuario existe en PostgreSQL y es candidato
-    cursor = postgres_conn.cursor()
-    cursor.execute("SELECT nombre, rol FROM usuarios WHERE email = %s", (email,))
-    usuario = cursor.fetchone()
-    cursor.close()
+    usuario = await obtener_usuario(email)
     
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    if usuario[1] != 'candidato':
+    if usuario["rol"] != 'candidato':
         raise HTTPException(status_code=403, detail="Solo los candidatos pueden actualizar su seniority")
     
     try:
         # Actualizar en MongoDB (crear perfil si no existe)
-        candidato = mongo_db.perfiles.find_one({"email": email})
+        candidato = await mongo_db_async.perfiles.find_one({"email": email})
         
         if not candidato:
             # Crear perfil básico si no existe
-            mongo_db.perfiles.insert_one({
+            await mongo_db_async.perfiles.insert_one({
                 "email": email,
-                "nombre": usuario[0],
+                "nombre": usuario["nombre"],
                 "seniority": seniority,
                 "skills": "",
+                "skills_lower": [],
                 "experiencia": "",
                 "educacion": "",
                 "created_at": datetime.utcnow()
             })
         else:
             # Actualizar seniority existente
-            mongo_db.perfiles.update_one(
+            await mongo_db_async.perfiles.update_one(
                 {"email": email},
                 {"$set": {"seniority": seniority}}
             )
+
+        # Invalidar cache (también un posible 404 cacheado si el perfil se acaba de crear)
+        await cargar_perfil.invalidar(email)
+        await notificar_perfil_modificado(email)
         
         return {
             "success": True, 
@@ -607,29 +782,67 @@ async def actualizar_seniority(email: str, seniority: str = Body(..., embed=True
 
 # ==================== FIN SENIORITY ====================
 
+# Campos que muestra el listado (el perfil completo se pide por email)
+PROYECCION_LISTADO = {"_id": 0, "email": 1, "nombre": 1, "seniority": 1, "skills": 1}
+# Hasta cuántos documentos se cuentan con filtro antes de informar el total como aproximado
+CANDIDATOS_CONTEO_MAX = int(os.getenv("CANDIDATOS_CONTEO_MAX", "10000"))
+
+async def recalcular_skills_lower(email: str):
+    await mongo_db_async.perfiles.update_one({"email": email}, RECALCULAR_SKILLS_LOWER)
+
+async def _contar_candidatos(filtro: dict):
+    """(total, exacto): sin filtro usa la metadata de la colección; con filtro cuenta hasta un tope"""
+    if not filtro:
+        return await mongo_db_async.perfiles.estimated_document_count(), False
+    total = await mongo_db_async.perfiles.count_documents(filtro, limit=CANDIDATOS_CONTEO_MAX)
+    return total, total < CANDIDATOS_CONTEO_MAX
+
 @app.get("/candidatos")
-async def listar_candidatos(skill: str = None, seniority: str = None):
+async def listar_candidatos(
+    skill: str = None,
+    seniority: str = None,
+    prefijo: bool = False,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None
+):
     """
-    Lista candidatos con filtros opcionales
+    Lista candidatos ordenados por email, paginados por cursor.
+    `skill` filtra sin distinguir mayúsculas sobre `skills_lower`: coincidencia exacta, o por
+    prefijo con `prefijo=true` (regex anclada, usa el índice). El total solo viene en la primera página.
     """
     filtro = {}
-    if skill:
-        # Búsqueda case-insensitive usando regex
-        filtro["skills"] = {"$regex": skill, "$options": "i"}
+    if skill and skill.strip():
+        skill = skill.strip().lower()
+        filtro["skills_lower"] = {"$regex": f"^{re.escape(skill)}"} if prefijo else skill
     if seniority:
         filtro["seniority"] = seniority
     
-    candidatos = list(mongo_db.perfiles.find(filtro, {"_id": 0}).limit(50))
-    return {"total": len(candidatos), "candidatos": candidatos}
+    consulta = dict(filtro)
+    if cursor:
+        consulta["email"] = {"$gt": _decodificar_cursor(cursor, 1)[0]}
+    candidatos = await mongo_db_async.perfiles.find(consulta, PROYECCION_LISTADO).sort(
+        "email", 1
+    ).limit(limit + 1).to_list(length=limit + 1)
+    
+    hay_mas = len(candidatos) > limit
+    candidatos = candidatos[:limit]
+    total, total_exacto = (None, None) if cursor else await _contar_candidatos(filtro)
+    
+    return {
+        "total": total,
+        "total_exacto": total_exacto,
+        "candidatos": candidatos,
+        "siguiente_cursor": _codificar_cursor(candidatos[-1]["email"]) if hay_mas else None
+    }
 
 # --- PostgreSQL: Procesos ---
 @app.post("/procesos", status_code=201)
-async def crear_proceso(proceso: Proceso):
+def crear_proceso(proceso: Proceso):
     """
     Crear proceso
     TODO: Descomentar require_recruiter cuando frontend implemente login
     """
-    with postgres_conn.cursor() as cursor:
+    with get_postgres_conn() as conn, conn.cursor() as cursor:
         cursor.execute(
             """
             INSERT INTO procesos (candidato_id, puesto, estado, feedback, notas_confidenciales) 
@@ -639,80 +852,134 @@ async def crear_proceso(proceso: Proceso):
             (proceso.candidato_id, proceso.puesto, proceso.estado, proceso.feedback, proceso.notas_confidenciales)
         )
         proceso_id = cursor.fetchone()[0]
-        postgres_conn.commit()
-    
-    # SINCRONIZAR
-    await sincronizar_proceso_creado(proceso.dict())
+        
+        # SINCRONIZAR: el evento se confirma en la misma transacción que el proceso
+        encolar_evento(
+            "proceso_creado",
+            {"candidato_id": proceso.candidato_id, "puesto": proceso.puesto, "estado": proceso.estado},
+            cursor=cursor
+        )
+        conn.commit()
     
-    return {"id": str(proceso_id), "sincronizado": True}
+    return {"id": str(proceso_id), "sincronizacion": "pendiente"}
 
-@app.get("/procesos/{candidato_id}")
-async def obtener_procesos(candidato_id: str):
+# Hasta cuántos procesos (los más recientes) se cuentan antes de informar el total como aproximado
+PROCESOS_CONTEO_MAX = int(os.getenv("PROCESOS_CONTEO_MAX", "10000"))
+
+async def _listar_procesos(filtros: Dict[str, Optional[str]], limit: int, cursor: Optional[str]) -> dict:
     """
-    Obtiene todos los procesos de un candidato desde PostgreSQL
-    TODO: Las notas confidenciales deberían filtrarse según rol cuando se implemente login
+    Procesos más recientes primero, paginados por keyset sobre (updated_at, id).
+    `filtros` admite candidato_id y estado (igualdad) y puesto (contiene, sin distinguir mayúsculas).
+    El total y la cantidad de candidatos distintos solo se calculan en la primera página (sin cursor),
+    sobre los PROCESOS_CONTEO_MAX procesos más recientes: si se llega al tope, total_exacto es False.
     """
-    with postgres_conn.cursor() as cursor:
-        cursor.execute(
-            """
-            SELECT id, puesto, estado, feedback, updated_at
+    condiciones, params = [], []
+    for campo, valor in filtros.items():
+        if valor is None:
+            continue
+        params.append(_patron_ilike(valor) if campo == "puesto" else valor)
+        condiciones.append(f"{campo} {'ILIKE' if campo == 'puesto' else '='} ${len(params)}")
+    filtro_sql = " AND ".join(condiciones) or "TRUE"
+    
+    keyset = ""
+    if cursor:
+        fecha, proceso_id = _decodificar_cursor(cursor, 2)
+        try:
+            params += [datetime.fromisoformat(fecha), uuid.UUID(proceso_id)]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        keyset = f"AND (updated_at, id) < (${len(params) - 1}, ${len(params)})"
+    
+    async with get_postgres_conn_async() as conn:
+        rows = await conn.fetch(
+            f"""
+            SELECT id, candidato_id, puesto, estado, feedback, updated_at
             FROM procesos
-            WHERE candidato_id = %s
-            ORDER BY updated_at DESC
+            WHERE {filtro_sql} {keyset}
+            ORDER BY updated_at DESC, id DESC
+            LIMIT {limit + 1}
             """,
-            (candidato_id,)
+            *params
         )
-        procesos = cursor.fetchall()
+        total = candidatos_unicos = total_exacto = None
+        if not cursor:
+            # Lectura acotada por el mismo índice del listado, no un recorrido de toda la tabla
+            total, candidatos_unicos = await conn.fetchrow(
+                f"""
+                SELECT COUNT(*), COUNT(DISTINCT candidato_id)
+                FROM (
+                    SELECT candidato_id FROM procesos
+                    WHERE {filtro_sql}
+                    ORDER BY updated_at DESC, id DESC
+                    LIMIT {PROCESOS_CONTEO_MAX}
+                ) recientes
+                """,
+                *params
+            )
+            total_exacto = total < PROCESOS_CONTEO_MAX
+    
+    hay_mas = len(rows) > limit
+    rows = rows[:limit]
+    siguiente = None
+    if hay_mas:
+        siguiente = _codificar_cursor(rows[-1]["updated_at"].isoformat(), rows[-1]["id"])
     
     return {
-        "candidato_id": candidato_id,
+        "total": total,
+        "total_exacto": total_exacto,
+        "candidatos_unicos": candidatos_unicos,
         "procesos": [
             {
-                "id": str(p[0]),
-                "puesto": p[1],
-                "estado": p[2],
-                "feedback": p[3],
-                "fecha": p[4].isoformat()
+                "id": str(row["id"]),
+                "candidato_id": row["candidato_id"],
+                "puesto": row["puesto"],
+                "estado": row["estado"],
+                "feedback": row["feedback"],
+                "fecha": row["updated_at"].isoformat()
             }
-            for p in procesos
-        ]
+            for row in rows
+        ],
+        "siguiente_cursor": siguiente
     }
 
+@app.get("/procesos/{candidato_id}")
+async def obtener_procesos(
+    candidato_id: str,
+    estado: Optional[str] = None,
+    puesto: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None
+):
+    """
+    Obtiene los procesos de un candidato desde PostgreSQL, paginados por cursor
+    TODO: Las notas confidenciales deberían filtrarse según rol cuando se implemente login
+    """
+    pagina = await _listar_procesos(
+        {"candidato_id": candidato_id, "estado": estado, "puesto": puesto}, limit, cursor
+    )
+    for proceso in pagina["procesos"]:
+        del proceso["candidato_id"]
+    return {"candidato_id": candidato_id, **pagina}
+
 @app.get("/procesos")
-async def obtener_todos_los_procesos():
+async def obtener_todos_los_procesos(
+    estado: Optional[str] = None,
+    puesto: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None
+):
     """
-    Obtiene todos los procesos desde PostgreSQL
+    Obtiene los procesos desde PostgreSQL, más recientes primero y paginados por cursor
     """
-    with postgres_conn.cursor() as cursor:
-        cursor.execute(
-            """
-            SELECT id, candidato_id, puesto, estado, feedback, updated_at
-            FROM procesos
-            ORDER BY updated_at DESC
-            """
-        )
-        procesos = cursor.fetchall()
-    
-    return {
-        "total": len(procesos),
-        "procesos": [
-            {
-                "id": str(p[0]),
-                "candidato_id": p[1],
-                "puesto": p[2],
-                "estado": p[3],
-                "feedback": p[4],
-                "fecha": p[5].isoformat()
-            }
-            for p in procesos
-        ]
-    }
+    return await _listar_procesos({"estado": estado, "puesto": puesto}, limit, cursor)
 
 # --- Neo4j: Matching y Recomendaciones ---
 @app.post("/matching")
 async def buscar_candidatos_matching(
     puesto: str = Body(...),
-    skills: List[str] = Body(...)
+    skills: List[str] = Body(...),
+    seniority_minimo: Optional[str] = Body(None),
+    pesos: Optional[Dict[str, float]] = Body(None)
 ):
     """
     Busca candidatos que matcheen con un puesto usando Neo4j
@@ -720,26 +987,24 @@ async def buscar_candidatos_matching(
     Body JSON esperado:
     {
         "puesto": "Backend Developer",
-        "skills": ["python", "algorithms", "debugging"]
+        "skills": ["python", "algorithms", "debugging"],
+        "seniority_minimo": "Semi-Senior",       (opcional)
+        "pesos": {"python": 3, "debugging": 0.5}  (opcional, peso por defecto 1)
     }
     """
-    candidatos = await matching_automatico(puesto, skills)
+    candidatos = await matching_automatico(puesto, skills, seniority_minimo, pesos)
     return {
         "puesto": puesto,
         "skills_requeridos": skills,
+        "seniority_minimo": seniority_minimo,
         "candidatos_encontrados": len(candidatos),
         "candidatos": candidatos
     }
 
-@app.get("/recomendaciones/{candidato_id}")
-async def recomendar_roles(candidato_id: str):
-    # Intentar desde caché
-    cached = redis_client.get(f"recomendaciones:{candidato_id}")
-    if cached:
-        return {"source": "cache", "recomendaciones": json.loads(cached)}
-    
-    with neo4j_driver.session() as session:
-        result = session.run(
+@cacheado("recomendaciones:{candidato_id}", ttl=600, stale=300)
+async def cargar_recomendaciones(candidato_id: str) -> List[dict]:
+    async with neo4j_driver_async.session() as session:
+        result = await session.run(
             """
             MATCH (c:Candidato {id: $id})-[:DOMINA]->(s:Skill)<-[:REQUIERE]-(r:Rol)
             RETURN r.nombre AS rol, COUNT(s) AS match_count
@@ -748,18 +1013,15 @@ async def recomendar_roles(candidato_id: str):
             """,
             id=candidato_id
         )
-        recomendaciones = [
-            {"rol": record["rol"], "match": record["match_count"]} 
-            for record in result
+        return [
+            {"rol": record["rol"], "match": record["match_count"]}
+            async for record in result
         ]
-        
-        redis_client.setex(
-            f"recomendaciones:{candidato_id}",
-            600,
-            json.dumps(recomendaciones)
-        )
-        
-        return {"source": "neo4j", "recomendaciones": recomendaciones}
+
+@app.get("/recomendaciones/{candidato_id}")
+async def recomendar_roles(candidato_id: str):
+    recomendaciones, desde_cache = await cargar_recomendaciones.leer(candidato_id)
+    return {"source": "cache" if desde_cache else "neo4j", "recomendaciones": recomendaciones}
 
 @app.post("/mentoring/{candidato_id}/{mentor_id}")
 async def asignar_mentor(candidato_id: str, mentor_id: str, tipo: str = "técnico"):
@@ -769,144 +1031,195 @@ async def asignar_mentor(candidato_id: str, mentor_id: str, tipo: str = "técnic
     await registrar_interaccion_mentor(candidato_id, mentor_id, tipo)
     return {"success": True, "candidato": candidato_id, "mentor": mentor_id}
 
+RED_CACHE_TTL = int(os.getenv("RED_CACHE_TTL", "300"))
+
+async def _adyacencia_red(email: str) -> List[dict]:
+    """
+    Contactos confirmados del usuario que existen en el directorio de usuarios, ordenados por
+    fecha de conexión (más reciente primero) y email. El filtro va acá (no al armar la página)
+    para que el total y la paginación cuenten solo los contactos que se muestran.
+    """
+    cursor = mongo_db_async.solicitudes_conexion.find(
+        {
+            "$or": [
+                {"remitente_email": email, "estado": "aceptada"},
+                {"destinatario_email": email, "estado": "aceptada"}
+            ]
+        },
+        {"_id": 0, "remitente_email": 1, "destinatario_email": 1, "fecha_solicitud": 1}
+    )
+    contactos = {}
+    async for sol in cursor:
+        # El contacto es el que no es el usuario actual
+        email_contacto = sol["destinatario_email"] if sol["remitente_email"] == email else sol["remitente_email"]
+        fecha = sol.get("fecha_solicitud")
+        contactos[email_contacto] = fecha.isoformat() if isinstance(fecha, datetime) else fecha
+    
+    existentes = await obtener_usuarios(contactos)
+    adyacencia = [{"email": e, "fecha_conexion": f} for e, f in sorted(contactos.items()) if e in existentes]
+    adyacencia.sort(key=lambda c: c["fecha_conexion"] or "", reverse=True)
+    return adyacencia
+
+async def invalidar_red(*emails: str):
+    """Borra la lista de adyacencia cacheada de los usuarios indicados"""
+    try:
+        await invalidar_claves([f"red:{email}" for email in emails])
+    except Exception as e:
+        print(f"⚠️ Error al invalidar caché de red: {e}")
+
 @app.get("/red/{email}")
-async def obtener_red(email: str):
+async def obtener_red(
+    email: str,
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0)
+):
     """
-    Obtiene la red de contactos confirmados de un usuario (solo conexiones aceptadas)
+    Obtiene la red de contactos confirmados de un usuario (solo conexiones aceptadas), paginada.
+    La lista de contactos se cachea por usuario; los datos de cada contacto salen del
+    directorio de usuarios, en un solo lote para la página pedida.
     """
-    # Obtener todas las conexiones aceptadas del usuario
-    solicitudes_aceptadas = list(mongo_db.solicitudes_conexion.find({
-        "$or": [
-            {"remitente_email": email, "estado": "aceptada"},
-            {"destinatario_email": email, "estado": "aceptada"}
-        ]
-    }))
+    try:
+        adyacencia, _ = await leer_o_calcular(f"red:{email}", RED_CACHE_TTL, lambda: _adyacencia_red(email))
+    except Exception as e:
+        print(f"⚠️ Error en caché de red, se consulta MongoDB: {e}")
+        adyacencia = await _adyacencia_red(email)
     
-    red = []
-    for sol in solicitudes_aceptadas:
-        # Determinar quién es el contacto (el que no es el usuario actual)
-        email_contacto = sol["destinatario_email"] if sol["remitente_email"] == email else sol["remitente_email"]
-        
-        # Buscar datos del contacto en PostgreSQL
-        cursor = postgres_conn.cursor()
-        cursor.execute(
-            "SELECT nombre, rol FROM usuarios WHERE email = %s",
-            (email_contacto,)
-        )
-        contacto = cursor.fetchone()
-        cursor.close()
-        
-        if contacto:
-            red.append({
-                "email": email_contacto,
-                "nombre": contacto[0],
-                "rol": contacto[1],
-                "relacion": "CONECTADO_CON",
-                "fecha_conexion": sol.get("fecha_solicitud")
-            })
+    pagina = adyacencia[offset:offset + limit]
+    usuarios = await obtener_usuarios(c["email"] for c in pagina)
     
-    return {"email": email, "red": red, "total": len(red)}
+    red = [
+        {
+            "email": c["email"],
+            "nombre": usuarios[c["email"]]["nombre"],
+            "rol": usuarios[c["email"]]["rol"],
+            "relacion": "CONECTADO_CON",
+            "fecha_conexion": c["fecha_conexion"]
+        }
+        for c in pagina
+        if c["email"] in usuarios
+    ]
+    
+    return {
+        "email": email,
+        "red": red,
+        "total": len(adyacencia),
+        "limit": limit,
+        "offset": offset,
+        "siguiente_offset": offset + limit if offset + limit < len(adyacencia) else None
+    }
 
 # ==================== SOLICITUDES DE CONEXIÓN ====================
 
+# Estados que ocupan el par de usuarios (una solicitud rechazada permite volver a enviar)
+ESTADOS_VIGENTES = ["pendiente", "aceptada"]
+
+def par_conexion(email_a: str, email_b: str) -> str:
+    """Clave canónica del par de usuarios, independiente de quién envió la solicitud"""
+    return "|".join(sorted((email_a, email_b)))
+
 @app.post("/solicitudes", status_code=201)
-async def enviar_solicitud(solicitud: SolicitudConexion):
+def enviar_solicitud(solicitud: SolicitudConexion):
     """Envía una solicitud de conexión a otro usuario"""
     # Verificar que no sea auto-solicitud
     if solicitud.remitente_email == solicitud.destinatario_email:
         raise HTTPException(status_code=400, detail="No puedes enviarte una solicitud a ti mismo")
     
-    # Verificar que no exista ya una solicitud pendiente
-    solicitud_existente = mongo_db.solicitudes_conexion.find_one({
-        "$or": [
-            {"remitente_email": solicitud.remitente_email, "destinatario_email": solicitud.destinatario_email, "estado": "pendiente"},
-            {"remitente_email": solicitud.destinatario_email, "destinatario_email": solicitud.remitente_email, "estado": "pendiente"}
-        ]
-    })
+    solicitud_dict = solicitud.dict()
+    solicitud_dict["estado"] = "pendiente"
+    solicitud_dict["par"] = par_conexion(solicitud.remitente_email, solicitud.destinatario_email)
     
-    if solicitud_existente:
+    # El índice único parcial sobre `par` rechaza una segunda solicitud pendiente o aceptada
+    # para el mismo par de usuarios, incluso si llegan dos requests a la vez
+    try:
+        result = mongo_db.solicitudes_conexion.insert_one(solicitud_dict)
+    except DuplicateKeyError:
+        existente = mongo_db.solicitudes_conexion.find_one(
+            {"par": solicitud_dict["par"], "estado": {"$in": ESTADOS_VIGENTES}},
+            {"estado": 1}
+        )
+        if existente and existente["estado"] == "aceptada":
+            raise HTTPException(status_code=400, detail="Ya estás conectado con este usuario")
         raise HTTPException(status_code=400, detail="Ya existe una solicitud pendiente con este usuario")
     
-    # Verificar que no estén ya conectados
-    conexion_existente = mongo_db.solicitudes_conexion.find_one({
-        "$or": [
-            {"remitente_email": solicitud.remitente_email, "destinatario_email": solicitud.destinatario_email, "estado": "aceptada"},
-            {"remitente_email": solicitud.destinatario_email, "destinatario_email": solicitud.remitente_email, "estado": "aceptada"}
-        ]
-    })
+    return {"id": str(result.inserted_id), "mensaje": "Solicitud enviada exitosamente"}
+
+def responder_con_etag(request: Request, contenido: dict) -> Response:
+    """Responde con ETag del contenido; si el cliente ya tiene esa versión devuelve 304 sin cuerpo"""
+    cuerpo = jsonable_encoder(contenido)
+    etag = '"' + hashlib.sha1(json.dumps(cuerpo, sort_keys=True).encode()).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
     
-    if conexion_existente:
-        raise HTTPException(status_code=400, detail="Ya estás conectado con este usuario")
+    vistos = [v.strip().removeprefix("W/") for v in request.headers.get("if-none-match", "").split(",")]
+    if etag in vistos or "*" in vistos:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(cuerpo, headers=headers)
+
+async def _listar_solicitudes_pendientes(campo_usuario: str, campo_contacto: str, email: str,
+                                         limit: int, cursor: Optional[str]) -> dict:
+    """
+    Solicitudes pendientes paginadas por cursor (_id descendente, las más nuevas primero).
+    Los datos de todos los contactos de la página se resuelven en un solo lote del directorio de usuarios.
+    """
+    filtro = {campo_usuario: email, "estado": "pendiente"}
+    if cursor:
+        if not ObjectId.is_valid(cursor):
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        filtro["_id"] = {"$lt": ObjectId(cursor)}
     
-    solicitud_dict = solicitud.dict()
-    result = mongo_db.solicitudes_conexion.insert_one(solicitud_dict)
+    solicitudes_raw = await mongo_db_async.solicitudes_conexion.find(
+        filtro,
+        {campo_contacto: 1, "mensaje": 1, "fecha_solicitud": 1}
+    ).sort("_id", -1).limit(limit + 1).to_list(length=limit + 1)
     
-    return {"id": str(result.inserted_id), "mensaje": "Solicitud enviada exitosamente"}
-
-@app.get("/solicitudes/recibidas/{email}")
-async def obtener_solicitudes_recibidas(email: str):
-    """Obtiene las solicitudes de conexión recibidas por un usuario"""
-    solicitudes_raw = list(mongo_db.solicitudes_conexion.find({
-        "destinatario_email": email,
-        "estado": "pendiente"
-    }))
+    hay_mas = len(solicitudes_raw) > limit
+    solicitudes_raw = solicitudes_raw[:limit]
     
+    usuarios = await obtener_usuarios(sol[campo_contacto] for sol in solicitudes_raw)
+    
+    prefijo = campo_contacto.removesuffix("_email")
     solicitudes = []
     for sol in solicitudes_raw:
-        # Buscar datos del remitente en PostgreSQL
-        cursor = postgres_conn.cursor()
-        cursor.execute(
-            "SELECT nombre, rol FROM usuarios WHERE email = %s",
-            (sol["remitente_email"],)
-        )
-        remitente = cursor.fetchone()
-        cursor.close()
-        
+        contacto = usuarios.get(sol[campo_contacto])
         solicitudes.append({
             "_id": str(sol["_id"]),
-            "remitente_email": sol["remitente_email"],
-            "remitente_nombre": remitente[0] if remitente else "Usuario",
-            "remitente_rol": remitente[1] if remitente else "candidato",
+            campo_contacto: sol[campo_contacto],
+            f"{prefijo}_nombre": contacto["nombre"] if contacto else "Usuario",
+            f"{prefijo}_rol": contacto["rol"] if contacto else "candidato",
             "mensaje": sol.get("mensaje"),
             "fecha_solicitud": sol.get("fecha_solicitud")
         })
     
-    return {"solicitudes": solicitudes}
+    return {
+        "solicitudes": solicitudes,
+        "siguiente_cursor": solicitudes[-1]["_id"] if hay_mas else None
+    }
+
+@app.get("/solicitudes/recibidas/{email}")
+async def obtener_solicitudes_recibidas(
+    email: str,
+    request: Request,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    """Obtiene las solicitudes de conexión recibidas por un usuario (paginado por cursor, con ETag)"""
+    contenido = await _listar_solicitudes_pendientes("destinatario_email", "remitente_email", email, limit, cursor)
+    return responder_con_etag(request, contenido)
 
 @app.get("/solicitudes/enviadas/{email}")
-async def obtener_solicitudes_enviadas(email: str):
-    """Obtiene las solicitudes de conexión enviadas por un usuario"""
-    solicitudes_raw = list(mongo_db.solicitudes_conexion.find({
-        "remitente_email": email,
-        "estado": "pendiente"
-    }))
-    
-    solicitudes = []
-    for sol in solicitudes_raw:
-        # Buscar datos del destinatario en PostgreSQL
-        cursor = postgres_conn.cursor()
-        cursor.execute(
-            "SELECT nombre, rol FROM usuarios WHERE email = %s",
-            (sol["destinatario_email"],)
-        )
-        destinatario = cursor.fetchone()
-        cursor.close()
-        
-        solicitudes.append({
-            "_id": str(sol["_id"]),
-            "destinatario_email": sol["destinatario_email"],
-            "destinatario_nombre": destinatario[0] if destinatario else "Usuario",
-            "destinatario_rol": destinatario[1] if destinatario else "candidato",
-            "mensaje": sol.get("mensaje"),
-            "fecha_solicitud": sol.get("fecha_solicitud")
-        })
-    
-    return {"solicitudes": solicitudes}
+async def obtener_solicitudes_enviadas(
+    email: str,
+    request: Request,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    """Obtiene las solicitudes de conexión enviadas por un usuario (paginado por cursor, con ETag)"""
+    contenido = await _listar_solicitudes_pendientes("remitente_email", "destinatario_email", email, limit, cursor)
+    return responder_con_etag(request, contenido)
 
 @app.put("/solicitudes/{solicitud_id}/aceptar")
 async def aceptar_solicitud(solicitud_id: str):
     """Acepta una solicitud de conexión"""
-    solicitud = mongo_db.solicitudes_conexion.find_one({"_id": ObjectId(solicitud_id)})
+    solicitud = await mongo_db_async.solicitudes_conexion.find_one({"_id": ObjectId(solicitud_id)})
     
     if not solicitud:
         raise HTTPException(status_code=404, detail="Solicitud no encontrada")
@@ -914,34 +1227,29 @@ async def aceptar_solicitud(solicitud_id: str):
     if solicitud["estado"] != "pendiente":
         raise HTTPException(status_code=400, detail="Esta solicitud ya fue procesada")
     
-    # Actualizar estado a aceptada
-    mongo_db.solicitudes_conexion.update_one(
+    # Actualizar estado a aceptada; el evento para Neo4j viaja en la misma escritura
+    await mongo_db_async.solicitudes_conexion.update_one(
         {"_id": ObjectId(solicitud_id)},
-        {"$set": {"estado": "aceptada"}}
+        {
+            "$set": {"estado": "aceptada"},
+            "$push": {CAMPO_EVENTOS: {"$each": eventos_embebidos(("solicitud_aceptada", {
+                "remitente_email": solicitud["remitente_email"],
+                "destinatario_email": solicitud["destinatario_email"]
+            }))}}
+        }
     )
+    await invalidar_red(solicitud["remitente_email"], solicitud["destinatario_email"])
     
-    # Intentar crear relación en Neo4j (no bloquear si falla)
+    # Crear relación en Neo4j vía outbox; si falla, la barrida periódica lo reintenta
     try:
-        with neo4j_driver.session() as session:
-            session.run(
-                """
-                MERGE (u1:Usuario {email: $email1})
-                ON CREATE SET u1.email = $email1
-                MERGE (u2:Usuario {email: $email2})
-                ON CREATE SET u2.email = $email2
-                MERGE (u1)-[:CONECTADO_CON]-(u2)
-                """,
-                email1=solicitud["remitente_email"],
-                email2=solicitud["destinatario_email"]
-            )
+        await relevar_eventos("solicitudes_conexion", {"_id": ObjectId(solicitud_id)})
     except Exception as e:
-        # Log del error pero no fallar la operación
-        print(f"⚠️ Error al crear relación en Neo4j: {e}")
+        print(f"⚠️ Outbox no disponible, el evento queda en la solicitud para reintentar: {e}")
     
     return {"mensaje": "Solicitud aceptada exitosamente"}
 
 @app.put("/solicitudes/{solicitud_id}/rechazar")
-async def rechazar_solicitud(solicitud_id: str):
+def rechazar_solicitud(solicitud_id: str):
     """Rechaza una solicitud de conexión"""
     solicitud = mongo_db.solicitudes_conexion.find_one({"_id": ObjectId(solicitud_id)})
     
@@ -959,80 +1267,61 @@ async def rechazar_solicitud(solicitud_id: str):
     
     return {"mensaje": "Solicitud rechazada"}
 
+def _patron_ilike(texto: str) -> str:
+    """Patrón de subcadena para ILIKE, escapando los comodines que escriba el usuario"""
+    return "%" + texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
 @app.get("/usuarios/buscar")
-async def buscar_usuarios(q: str, email_actual: str):
-    """Busca usuarios por nombre o email (excluye el usuario actual, conexiones existentes y solicitudes pendientes)"""
-    if not q or len(q) < 2:
+async def buscar_usuarios(q: str, email_actual: str, limit: int = Query(20, ge=1, le=50)):
+    """
+    Busca usuarios por nombre o email, ordenados por similitud (índices trigram en PostgreSQL).
+    Excluye en la misma consulta al usuario actual, sus conexiones y solicitudes pendientes.
+    """
+    q = (q or "").strip()
+    if len(q) < 2:
         return {"usuarios": []}
     
-    # Buscar usuarios en PostgreSQL que coincidan con la búsqueda
-    cursor = postgres_conn.cursor()
-    cursor.execute(
-        """
-        SELECT email, nombre, rol 
-        FROM usuarios 
-        WHERE email != %s 
-        AND (nombre ILIKE %s OR email ILIKE %s)
-        LIMIT 20
-        """,
-        (email_actual, f"%{q}%", f"%{q}%")
-    )
-    usuarios_raw = cursor.fetchall()
-    cursor.close()
-    
-    # Obtener IDs de usuarios ya conectados
-    solicitudes_aceptadas = list(mongo_db.solicitudes_conexion.find({
-        "$or": [
-            {"remitente_email": email_actual, "estado": "aceptada"},
-            {"destinatario_email": email_actual, "estado": "aceptada"}
-        ]
-    }))
-    
-    emails_conectados = set()
-    for sol in solicitudes_aceptadas:
-        if sol["remitente_email"] == email_actual:
-            emails_conectados.add(sol["destinatario_email"])
-        else:
-            emails_conectados.add(sol["remitente_email"])
-    
-    # Obtener solicitudes pendientes
-    solicitudes_pendientes = list(mongo_db.solicitudes_conexion.find({
-        "$or": [
-            {"remitente_email": email_actual, "estado": "pendiente"},
-            {"destinatario_email": email_actual, "estado": "pendiente"}
-        ]
-    }))
-    
-    emails_pendientes = set()
-    for sol in solicitudes_pendientes:
-        if sol["remitente_email"] == email_actual:
-            emails_pendientes.add(sol["destinatario_email"])
-        else:
-            emails_pendientes.add(sol["remitente_email"])
-    
-    # Filtrar usuarios
-    usuarios = []
-    for user in usuarios_raw:
-        email = user[0]
-        if email not in emails_conectados and email not in emails_pendientes:
-            usuarios.append({
-                "email": email,
-                "nombre": user[1],
-                "rol": user[2]
-            })
+    # Contactos con solicitud pendiente o aceptada (índices (email, estado) en MongoDB)
+    excluidos = [email_actual]
+    async for sol in mongo_db_async.solicitudes_conexion.find(
+        {
+            "$or": [
+                {"remitente_email": email_actual, "estado": {"$in": ESTADOS_VIGENTES}},
+                {"destinatario_email": email_actual, "estado": {"$in": ESTADOS_VIGENTES}}
+            ]
+        },
+        {"_id": 0, "remitente_email": 1, "destinatario_email": 1}
+    ):
+        excluidos.append(sol["destinatario_email"] if sol["remitente_email"] == email_actual else sol["remitente_email"])
+    
+    async with get_postgres_conn_async() as conn:
+        filas = await conn.fetch(
+            """
+            SELECT email, nombre, rol
+            FROM usuarios
+            WHERE (nombre ILIKE $1 OR email ILIKE $1)
+              AND email <> ALL($2::text[])
+            ORDER BY GREATEST(similarity(nombre, $3), similarity(email, $3)) DESC, nombre, email
+            LIMIT $4
+            """,
+            _patron_ilike(q),
+            excluidos,
+            q,
+            limit
+        )
     
-    return {"usuarios": usuarios}
+    return {"usuarios": [{"email": f["email"], "nombre": f["nombre"], "rol": f["rol"]} for f in filas]}
 
 # --- Redis: Cache ---
 @app.get("/cache/{key}")
-async def get_cache(key: str):
+def get_cache(key: str):
     value = redis_client.get(key)
     if not value:
         raise HTTPException(status_code=404, detail="Cache miss")
     return {"value": value.decode()}
 
 @app.post("/cache/{key}")
-async def set_cache(key: str, value: str, ttl: int = 300):
+def set_cache(key: str, value: str, ttl: int = 300):
     redis_client.setex(key, ttl, value)
     return {"status": "cached"}
 
@@ -1042,78 +1331,54 @@ async def set_cache(key: str, value: str, ttl: int = 300):
 async def crear_curso(curso: Curso, _: dict = Depends(require_admin)):
     """Crea un nuevo curso en MongoDB (solo admins)"""
     # Verificar si ya existe un curso con ese código
-    if mongo_db.cursos.find_one({"codigo": curso.codigo}):
+    if await mongo_db_async.cursos.find_one({"codigo": curso.codigo}):
         raise HTTPException(
             status_code=400, 
             detail=f"Ya existe un curso con el código '{curso.codigo}'. Por favor usa un código diferente."
         )
     
     curso_dict = curso.dict()
-    result = mongo_db.cursos.insert_one(curso_dict)
-    
-    # Preparar datos para caché (sin ObjectId)
-    curso_cache = {
-        "codigo": curso.codigo,
-        "nombre": curso.nombre,
-        "descripcion": curso.descripcion,
-        "duracion_horas": curso.duracion_horas,
-        "categoria": curso.categoria,
-        "nivel": curso.nivel,
-        "recursos": curso.recursos,
-        "instructor": curso.instructor
-    }
+    result = await mongo_db_async.cursos.insert_one(curso_dict)
     
-    # Cachear el curso específico
-    redis_client.setex(
-        f"curso:{curso.codigo}",
-        3600,  # 1 hora
-        json.dumps(curso_cache)
-    )
+    # Reemplazar el curso en caché (puede haber un 404 cacheado para ese código)
+    await cargar_curso.invalidar(curso.codigo)
     
-    # IMPORTANTE: Invalidar cachés de listas de cursos
-    # Para que el frontend obtenga la lista actualizada
-    for key in redis_client.scan_iter("cursos:*"):
-        redis_client.delete(key)
+    # IMPORTANTE: Invalidar cachés de listas de cursos (Redis y memoria de cada worker)
+    # Para que el frontend obtenga la lista actualizada; O(listados cacheados), sin recorrer el keyspace
+    await invalidar_tags(["cursos"])
     
     return {"codigo": curso.codigo, "id": str(result.inserted_id)}
 
-@app.get("/cursos")
-async def listar_cursos(categoria: str = None, nivel: str = None):
-    """Lista cursos con filtros opcionales"""
-    # Intentar desde caché
-    cache_key = f"cursos:cat={categoria or 'all'}:nivel={nivel or 'all'}"
-    cached = redis_client.get(cache_key)
-    
-    if cached:
-        return {"source": "cache", "cursos": json.loads(cached)}
-    
-    # Consultar MongoDB
+@cacheado(
+    lambda categoria=None, nivel=None: f"cursos:cat={categoria or 'all'}:nivel={nivel or 'all'}",
+    ttl=3600, stale=300, ttl_local=30, tags=["cursos"]
+)
+async def cargar_cursos(categoria: Optional[str] = None, nivel: Optional[str] = None) -> List[dict]:
     filtro = {}
     if categoria:
         filtro["categoria"] = categoria
     if nivel:
         filtro["nivel"] = nivel
-    
-    cursos = list(mongo_db.cursos.find(filtro, {"_id": 0}))
-    
-    # Cachear resultado
-    redis_client.setex(cache_key, 3600, json.dumps(cursos))
-    
-    return {"source": "mongodb", "total": len(cursos), "cursos": cursos}
+    return await mongo_db_async.cursos.find(filtro, {"_id": 0}).to_list(length=None)
+
+@app.get("/cursos")
+async def listar_cursos(categoria: str = None, nivel: str = None):
+    """Lista cursos con filtros opcionales"""
+    cursos, desde_cache = await cargar_cursos.leer(categoria, nivel)
+    return {"source": "cache" if desde_cache else "mongodb", "total": len(cursos), "cursos": cursos}
+
+@cacheado("curso:{codigo}", ttl=3600, stale=300, ttl_ausente=60, ttl_local=60)
+async def cargar_curso(codigo: str) -> Optional[dict]:
+    return await mongo_db_async.cursos.find_one({"codigo": codigo}, {"_id": 0})
 
 @app.get("/cursos/{codigo}")
 async def obtener_curso(codigo: str):
     """Obtiene un curso específico"""
-    # Intentar desde caché
-    cached = redis_client.get(f"curso:{codigo}")
-    if cached:
-        return {"source": "cache", **json.loads(cached)}
-    
-    curso = mongo_db.cursos.find_one({"codigo": codigo}, {"_id": 0})
+    curso, desde_cache = await cargar_curso.leer(codigo)
     if not curso:
         raise HTTPException(status_code=404, detail="Curso no encontrado")
     
-    return {"source": "mongodb", **curso}
+    return {"source": "cache" if desde_cache else "mongodb", **curso}
 
 # ==================== INSCRIPCIONES ====================
 
@@ -1121,12 +1386,12 @@ async def obtener_curso(codigo: str):
 async def inscribir_candidato(inscripcion: Inscripcion):
     """Inscribe un candidato a un curso"""
     # Verificar que el curso existe
-    curso = mongo_db.cursos.find_one({"codigo": inscripcion.curso_codigo})
+    curso = await mongo_db_async.cursos.find_one({"codigo": inscripcion.curso_codigo})
     if not curso:
         raise HTTPException(status_code=404, detail="Curso no encontrado")
     
     # Verificar si ya está inscrito
-    inscripcion_existente = mongo_db.inscripciones.find_one({
+    inscripcion_existente = await mongo_db_async.inscripciones.find_one({
         "candidato_email": inscripcion.candidato_email,
         "curso_codigo": inscripcion.curso_codigo
     })
@@ -1139,15 +1404,15 @@ async def inscribir_candidato(inscripcion: Inscripcion):
     insc_dict["fecha_inscripcion"] = insc_dict["fecha_inscripcion"].isoformat()
     
     try:
-        result = mongo_db.inscripciones.insert_one(insc_dict)
+        result = await mongo_db_async.inscripciones.insert_one(insc_dict)
     except Exception as e:
         if "duplicate key" in str(e):
             raise HTTPException(status_code=400, detail="Ya inscrito en este curso")
         raise
     
     # Sincronizar con Neo4j
-    with neo4j_driver.session() as session:
-        session.run(
+    async with neo4j_driver_async.session() as session:
+        await session.run(
             """
             MERGE (cu:Curso {codigo: $curso_codigo, nombre: $curso_nombre})
             WITH cu
@@ -1161,12 +1426,12 @@ async def inscribir_candidato(inscripcion: Inscripcion):
         )
     
     # Invalidar caché del candidato
-    redis_client.delete(f"perfil:{inscripcion.candidato_email}")
+    await cargar_perfil.invalidar(inscripcion.candidato_email)
     
     return {"id": str(result.inserted_id), "inscrito": True}
 
 @app.put("/inscripciones/{inscripcion_id}/progreso")
-async def actualizar_progreso(inscripcion_id: str, progreso: float):
+def actualizar_progreso(inscripcion_id: str, progreso: float):
     """Actualiza el progreso de una inscripción (0.0 a 1.0)"""
     if not 0 <= progreso <= 1:
         raise HTTPException(status_code=400, detail="Progreso debe estar entre 0 y 1")
@@ -1223,7 +1488,7 @@ async def rendir_examen(inscripcion_id: str):
     
     # Verificar que la inscripción existe
     try:
-        inscripcion = mongo_db.inscripciones.find_one({"_id": ObjectId(inscripcion_id)})
+        inscripcion = await mongo_db_async.inscripciones.find_one({"_id": ObjectId(inscripcion_id)})
     except:
         raise HTTPException(status_code=400, detail="ID de inscripción inválido")
     
@@ -1248,7 +1513,7 @@ async def rendir_examen(inscripcion_id: str):
     estado_examen = "Aprobado" if aprobado else "Reprobado"
     
     # Actualizar en MongoDB
-    result = mongo_db.inscripciones.update_one(
+    result = await mongo_db_async.inscripciones.update_one(
         {"_id": ObjectId(inscripcion_id)},
         {
             "$set": {
@@ -1262,7 +1527,7 @@ async def rendir_examen(inscripcion_id: str):
     # Si aprobó, agregar las skills del curso al candidato
     if aprobado:
         # Obtener el curso para ver qué skills otorga
-        curso = mongo_db.cursos.find_one({"codigo": inscripcion["curso_codigo"]})
+        curso = await mongo_db_async.cursos.find_one({"codigo": inscripcion["curso_codigo"]})
         
         if curso and "skills" in curso:
             candidato_email = inscripcion["candidato_email"]
@@ -1270,10 +1535,13 @@ async def rendir_examen(inscripcion_id: str):
             
             # Agregar skills al perfil del candidato usando $addToSet (evita duplicados)
             if skills_curso:
-                mongo_db.perfiles.update_one(
+                await mongo_db_async.perfiles.update_one(
                     {"email": candidato_email},
                     {
-                        "$addToSet": {"skills": {"$each": skills_curso}},
+                        "$addToSet": {
+                            "skills": {"$each": skills_curso},
+                            "skills_lower": {"$each": skills_normalizados(skills_curso)}
+                        },
                         "$setOnInsert": {
                             "created_at": datetime.utcnow()
                         }
@@ -1281,21 +1549,12 @@ async def rendir_examen(inscripcion_id: str):
                     upsert=True
                 )
                 
-                # También agregar en Neo4j
-                with neo4j_driver.session() as session:
-                    for skill_nombre in skills_curso:
-                        session.run(
-                            """
-                            MERGE (c:Usuario {email: $email})
-                            MERGE (s:Skill {nombre: $skill})
-                            MERGE (c)-[:TIENE_SKILL]->(s)
-                            """,
-                            email=candidato_email,
-                            skill=skill_nombre
-                        )
+                # También agregar en Neo4j (un solo UNWIND para todos los skills)
+                await vincular_skills("usuario", candidato_email, skills_curso)
                 
                 # Invalidar cache del perfil
-                redis_client.delete(f"perfil:{candidato_email}")
+                await cargar_perfil.invalidar(candidato_email)
+                await notificar_perfil_modificado(candidato_email)
                 
                 mensaje_skills = f" ¡Ganaste {len(skills_curso)} nueva(s) skill(s): {', '.join(skills_curso)}!"
             else:
@@ -1317,7 +1576,7 @@ async def rendir_examen(inscripcion_id: str):
     }
 
 @app.put("/inscripciones/{inscripcion_id}/calificar")
-async def calificar_inscripcion(inscripcion_id: str, calificacion: float):
+def calificar_inscripcion(inscripcion_id: str, calificacion: float):
     """Asigna una calificación final (0-100)"""
     if not 0 <= calificacion <= 100:
         raise HTTPException(status_code=400, detail="Calificación debe estar entre 0 y 100")
@@ -1347,7 +1606,7 @@ async def calificar_inscripcion(inscripcion_id: str, calificacion: float):
     return {"calificacion": calificacion, "completado": True}
 
 @app.delete("/inscripciones/{inscripcion_id}")
-async def abandonar_curso(inscripcion_id: str):
+def abandonar_curso(inscripcion_id: str):
     """Elimina una inscripción (desinscribirse de un curso)"""
     # Obtener datos antes de eliminar
     insc = mongo_db.inscripciones.find_one({"_id": ObjectId(inscripcion_id)})
@@ -1375,15 +1634,29 @@ async def abandonar_curso(inscripcion_id: str):
     return {"message": "Inscripción eliminada exitosamente"}
 
 @app.get("/candidatos/{email}/cursos")
-async def obtener_cursos_candidato(email: str):
-    """Ver todos los cursos de un candidato con progreso"""
-    inscripciones_raw = list(mongo_db.inscripciones.find(
-        {"candidato_email": email}
-    ))
+async def obtener_cursos_candidato(email: str, completado: Optional[bool] = None):
+    """
+    Ver todos los cursos de un candidato con progreso (opcional: filtrar por completado).
+    Los datos de cada curso se unen con $lookup en la misma agregación (una sola consulta).
+    """
+    filtro = {"candidato_email": email}
+    if completado is not None:
+        filtro["completado"] = True if completado else {"$ne": True}
+    
+    pipeline = [
+        {"$match": filtro},
+        {"$lookup": {
+            "from": "cursos",
+            "localField": "curso_codigo",
+            "foreignField": "codigo",
+            "pipeline": [{"$project": {"_id": 0, "nombre": 1, "duracion_horas": 1, "categoria": 1, "nivel": 1}}],
+            "as": "curso"
+        }},
+        {"$unwind": {"path": "$curso", "preserveNullAndEmptyArrays": True}}
+    ]
     
-    # Convertir ObjectId a string y enriquecer con datos del curso
     inscripciones = []
-    for insc in inscripciones_raw:
+    async for insc in mongo_db_async.inscripciones.aggregate(pipeline):
         insc_dict = {
             "_id": str(insc["_id"]),
             "candidato_email": insc["candidato_email"],
@@ -1396,10 +1669,7 @@ async def obtener_cursos_candidato(email: str):
             "fecha_examen": insc.get("fecha_examen")
         }
         
-        curso = mongo_db.cursos.find_one(
-            {"codigo": insc["curso_codigo"]},
-            {"_id": 0, "nombre": 1, "duracion_horas": 1, "categoria": 1, "nivel": 1}
-        )
+        curso = insc.get("curso")
         if curso:
             insc_dict["curso_nombre"] = curso.get("nombre", "Curso sin nombre")
             insc_dict["curso"] = curso
@@ -1415,7 +1685,7 @@ async def obtener_cursos_candidato(email: str):
 # ==================== EMPRESAS ====================
 
 @app.post("/empresas", status_code=201)
-async def crear_empresa(empresa: Empresa):
+def crear_empresa(empresa: Empresa):
     """Registra una nueva empresa"""
     empresa_dict = empresa.dict()
     
@@ -1442,96 +1712,11 @@ async def crear_empresa(empresa: Empresa):
     return {"id": str(result.inserted_id), "cuit": empresa.cuit}
 
 @app.get("/empresas")
-async def listar_empresas():
+def listar_empresas():
     """Lista todas las empresas"""
     empresas = list(mongo_db.empresas.find({}, {"_id": 0}))
     return {"total": len(empresas), "empresas": empresas}
 
-# ==================== BÚSQUEDA DE CANDIDATOS POR SKILLS ====================
-
-@app.get("/candidatos/buscar-por-skills")
-async def buscar_candidatos_por_skills(skills: str):
-    """
-    Busca candidatos que tengan los skills especificados.
-    Parámetro skills: string con skills separados por comas (ej: "Python,React,Docker")
-    """
-    if not skills:
-        raise HTTPException(status_code=400, detail="Debes especificar al menos un skill")
-    
-    # Convertir string a lista
-    skills_list = [s.strip() for s in skills.split(",") if s.strip()]
-    
-    if not skills_list:
-        raise HTTPException(status_code=400, detail="Debes especificar al menos un skill válido")
-    
-    try:
-        # Buscar en Neo4j candidatos que tienen los skills
-        with neo4j_driver.session() as session:
-            result = session.run(
-                """
-                MATCH (c:Usuario)-[:TIENE_SKILL]->(s:Skill)
-                WHERE s.nombre IN $skills AND c.rol = 'candidato'
-                WITH c, COLLECT(s.nombre) AS skills_matched, COUNT(s) AS match_count
-                RETURN c.email AS email, 
-                       c.nombre AS nombre, 
-                       skills_matched,
-                       match_count,
-                       (match_count * 100.0 / $total_skills) AS match_percentage
-                ORDER BY match_count DESC
-                LIMIT 50
-                """,
-                skills=skills_list,
-                total_skills=len(skills_list)
-            )
-            
-            candidatos = []
-            for record in result:
-                candidatos.append({
-                    "email": record["email"],
-                    "nombre": record["nombre"],
-                    "skills_matched": record["skills_matched"],
-                    "match_count": record["match_count"],
-                    "match_percentage": round(record["match_percentage"], 1)
-                })
-            
-            return {
-                "skills_buscados": skills_list,
-                "candidatos_encontrados": len(candidatos),
-                "candidatos": candidatos
-            }
-    except Exception as e:
-        # Si Neo4j falla, buscar en PostgreSQL (sin matching de skills)
-        print(f"⚠️ Error en Neo4j, buscando en PostgreSQL: {e}")
-        cursor = postgres_conn.cursor()
-        cursor.execute(
-            """
-            SELECT email, nombre, rol 
-            FROM usuarios 
-            WHERE rol = 'candidato'
-            LIMIT 50
-            """
-        )
-        resultados = cursor.fetchall()
-        cursor.close()
-        
-        candidatos = [
-            {
-                "email": row[0],
-                "nombre": row[1],
-                "skills_matched": [],
-                "match_count": 0,
-                "match_percentage": 0
-            }
-            for row in resultados
-        ]
-        
-        return {
-            "skills_buscados": skills_list,
-            "candidatos_encontrados": len(candidatos),
-            "candidatos": candidatos,
-            "nota": "Búsqueda básica (Neo4j no disponible)"
-        }
-
 # ==================== OFERTAS LABORALES ====================
 
 @app.post("/ofertas", status_code=201)
@@ -1548,99 +1733,208 @@ async def publicar_oferta(oferta: OfertaLaboral):
     
     oferta_dict["fecha_publicacion"] = oferta_dict["fecha_publicacion"].isoformat()
     
-    result = mongo_db.ofertas.insert_one(oferta_dict)
-    oferta_id = str(result.inserted_id)
+    # El id se genera antes para que los eventos viajen en la misma inserción que la oferta
+    oferta_dict["_id"] = ObjectId()
+    oferta_id = str(oferta_dict["_id"])
+    oferta_dict[CAMPO_EVENTOS] = eventos_embebidos(
+        ("oferta_publicada", {
+            "oferta_id": oferta_id,
+            "titulo": oferta.titulo,
+            "empresa": oferta.empresa,
+            "modalidad": oferta.modalidad,
+            "ubicacion": oferta.ubicacion,
+            "skills_requeridos": oferta_dict["skills_requeridos"]
+        }),
+        ("matches_oferta", {"oferta_id": oferta_id})
+    )
+    await mongo_db_async.ofertas.insert_one(oferta_dict)
     
-    # Sincronizar con Neo4j (solo si está disponible)
+    # Sincronizar con Neo4j vía outbox (un solo INSERT para ambos eventos); si falla, la
+    # barrida periódica los reintenta
     try:
-        with neo4j_driver.session() as session:
-            # Crear nodo de oferta
-            session.run(
-                """
-                CREATE (of:Oferta {
-                    id: $oferta_id,
-                    titulo: $titulo,
-                    modalidad: $modalidad,
-                    ubicacion: $ubicacion
-                })
-                """,
-                oferta_id=oferta_id,
-                titulo=oferta.titulo,
-                modalidad=oferta.modalidad,
-                ubicacion=oferta.ubicacion or "No especificado"
-            )
-            
-            # Conectar con empresa
-            session.run(
-                """
-                MATCH (e:Usuario {email: $empresa_email})
-                MATCH (of:Oferta {id: $oferta_id})
-                MERGE (e)-[:PUBLICA]->(of)
-                """,
-                empresa_email=oferta.empresa,
-                oferta_id=oferta_id
-            )
-            
-            # Conectar con skills requeridos
-            for skill in oferta_dict["skills_requeridos"]:
-                session.run(
-                    """
-                    MERGE (s:Skill {nombre: $skill})
-                    WITH s
-                    MATCH (of:Oferta {id: $oferta_id})
-                    MERGE (of)-[:REQUIERE]->(s)
-                    """,
-                    skill=skill,
-                    oferta_id=oferta_id
-                )
+        await relevar_eventos("ofertas", {"_id": oferta_dict["_id"]})
     except Exception as e:
-        print(f"⚠️ Error al sincronizar con Neo4j: {e}")
-        # Continuar sin bloquear la creación de la oferta
+        print(f"⚠️ Outbox no disponible, los eventos quedan en la oferta para reintentar: {e}")
+    
+    await invalidar_ofertas()
     
     return {"id": oferta_id, "mensaje": "Oferta publicada exitosamente"}
 
-@app.get("/ofertas")
-async def listar_ofertas(modalidad: str = None, ubicacion: str = None, estado: str = None):
-    """Lista ofertas activas con filtros opcionales"""
-    filtro = {}
-    
+def _oferta_con_id(oferta: dict) -> dict:
+    oferta["id"] = str(oferta["_id"])
+    del oferta["_id"]
+    return oferta
+
+@cacheado(
+    lambda modalidad=None, ubicacion=None, estado=None:
+        f"ofertas:estado={estado or 'abierta'}:modalidad={modalidad or 'all'}:ubicacion={ubicacion or 'all'}",
+    ttl=300, stale=60, ttl_local=15, tags=["ofertas"]
+)
+async def cargar_ofertas(modalidad: Optional[str] = None, ubicacion: Optional[str] = None,
+                         estado: Optional[str] = None) -> List[dict]:
     # Si no se especifica estado, por defecto mostrar solo las abiertas
-    if estado is None:
-        filtro["estado"] = "abierta"
-    else:
-        filtro["estado"] = estado
-    
+    filtro = {"estado": estado or "abierta"}
     if modalidad:
         filtro["modalidad"] = modalidad
     if ubicacion:
         filtro["ubicacion"] = ubicacion
     
-    ofertas_raw = list(mongo_db.ofertas.find(filtro).limit(50))
+    ofertas_raw = await mongo_db_async.ofertas.find(filtro, {CAMPO_EVENTOS: 0}).limit(50).to_list(length=50)
+    return [_oferta_con_id(oferta) for oferta in ofertas_raw]
+
+@app.get("/ofertas")
+async def listar_ofertas(modalidad: str = None, ubicacion: str = None, estado: str = None):
+    """Lista ofertas activas con filtros opcionales"""
+    ofertas = await cargar_ofertas(modalidad, ubicacion, estado)
+    return {"total": len(ofertas), "ofertas": ofertas}
+
+@cacheado("oferta:{oferta_id}", ttl=300, stale=60, ttl_ausente=30, ttl_local=15)
+async def cargar_oferta(oferta_id: str) -> Optional[dict]:
+    oferta = await mongo_db_async.ofertas.find_one({"_id": ObjectId(oferta_id)}, {CAMPO_EVENTOS: 0})
+    return _oferta_con_id(oferta) if oferta else None
+
+async def invalidar_ofertas(oferta_id: Optional[str] = None):
+    """Descarta los listados de ofertas (y el detalle indicado) en Redis y en la memoria de cada worker"""
+    try:
+        await invalidar_tags(["ofertas"])
+        if oferta_id:
+            await cargar_oferta.invalidar(oferta_id)
+    except Exception as e:
+        print(f"⚠️ Error al invalidar caché de ofertas: {e}")
+
+# Conteos que devuelve la búsqueda de ofertas: nombre de la faceta -> campo del documento
+FACETAS_OFERTAS = {
+    "modalidad": "modalidad",
+    "tipo_contrato": "tipo_contrato",
+    "ubicacion": "ubicacion",
+    "seniority": "seniority_minimo",
+}
+OFERTAS_FACETAS_TTL = int(os.getenv("OFERTAS_FACETAS_TTL", "60"))
+
+def _filtro_busqueda_ofertas(q: Optional[str], estado: Optional[str], modalidad: Optional[str],
+                             tipo_contrato: Optional[str], ubicacion: Optional[str], seniority: Optional[str],
+                             salario_min: Optional[float], salario_max: Optional[float]) -> dict:
+    # El índice de texto tiene `estado` como prefijo: $text siempre va con igualdad sobre estado
+    filtro = {"estado": estado or "abierta"}
+    for campo, valor in (("modalidad", modalidad), ("tipo_contrato", tipo_contrato),
+                         ("ubicacion", ubicacion), ("seniority_minimo", seniority)):
+        if valor:
+            filtro[campo] = valor
+    rango = {}
+    if salario_min is not None:
+        rango["$gte"] = salario_min
+    if salario_max is not None:
+        rango["$lte"] = salario_max
+    if rango:
+        filtro["salario"] = rango
+    if q and q.strip():
+        filtro["$text"] = {"$search": q.strip()}
+    return filtro
+
+async def _facetas_ofertas(filtro: dict) -> dict:
+    """Total y conteo por valor de cada faceta, en una sola agregación $facet"""
+    etapas = {
+        nombre: [{"$match": {campo: {"$ne": None}}}, {"$sortByCount": f"${campo}"}, {"$limit": 50}]
+        for nombre, campo in FACETAS_OFERTAS.items()
+    }
+    etapas["total"] = [{"$count": "n"}]
+    resultado = await mongo_db_async.ofertas.aggregate([
+        {"$match": filtro},
+        {"$facet": etapas}
+    ]).to_list(length=1)
+    resultado = resultado[0] if resultado else {}
+    total = resultado.pop("total", [])
+    return {
+        "total": total[0]["n"] if total else 0,
+        "facetas": {
+            nombre: [{"valor": b["_id"], "total": b["count"]} for b in resultado.get(nombre, [])]
+            for nombre in FACETAS_OFERTAS
+        }
+    }
+
+@app.get("/ofertas/buscar")
+async def buscar_ofertas(
+    q: Optional[str] = None,
+    estado: Optional[str] = None,
+    modalidad: Optional[str] = None,
+    tipo_contrato: Optional[str] = None,
+    ubicacion: Optional[str] = None,
+    seniority: Optional[str] = None,
+    salario_min: Optional[float] = Query(None, ge=0),
+    salario_max: Optional[float] = Query(None, ge=0),
+    facetas: bool = True,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """
+    Búsqueda de ofertas: texto completo sobre titulo/descripcion/requisitos (ordenado por relevancia),
+    filtros exactos, rango de salario y paginación por cursor. Sin `q` se ordena por más recientes.
+    Las facetas y el total se calculan (y cachean) solo en la primera página.
+    """
+    filtro = _filtro_busqueda_ofertas(q, estado, modalidad, tipo_contrato, ubicacion, seniority,
+                                      salario_min, salario_max)
+    por_texto = "$text" in filtro
+    
+    pipeline = [{"$match": filtro}]
+    if por_texto:
+        pipeline.append({"$addFields": {"relevancia": {"$meta": "textScore"}}})
+    if cursor:
+        partes = _decodificar_cursor(cursor, 2 if por_texto else 1)
+        if not ObjectId.is_valid(partes[-1]):
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        ultimo_id = ObjectId(partes[-1])
+        if por_texto:
+            try:
+                relevancia = float(partes[0])
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Cursor inválido")
+            pipeline.append({"$match": {"$or": [
+                {"relevancia": {"$lt": relevancia}},
+                {"relevancia": relevancia, "_id": {"$lt": ultimo_id}}
+            ]}})
+        else:
+            pipeline[0] = {"$match": {**filtro, "_id": {"$lt": ultimo_id}}}
+    pipeline += [
+        {"$sort": {"relevancia": -1, "_id": -1} if por_texto else {"_id": -1}},
+        {"$limit": limit + 1},
+        {"$project": {CAMPO_EVENTOS: 0}}
+    ]
+    
+    pagina = mongo_db_async.ofertas.aggregate(pipeline).to_list(length=limit + 1)
+    if facetas and not cursor:
+        clave = "ofertas:facetas:" + hashlib.sha1(json.dumps(filtro, sort_keys=True, default=str).encode()).hexdigest()
+        ofertas_raw, (resumen, _) = await asyncio.gather(
+            pagina,
+            leer_o_calcular(clave, OFERTAS_FACETAS_TTL, lambda: _facetas_ofertas(filtro), tags=["ofertas"])
+        )
+    else:
+        ofertas_raw, resumen = await pagina, {}
     
-    # Convertir ObjectId a string para cada oferta
-    ofertas = []
-    for oferta in ofertas_raw:
-        oferta["id"] = str(oferta["_id"])
-        del oferta["_id"]
-        ofertas.append(oferta)
+    hay_mas = len(ofertas_raw) > limit
+    ofertas_raw = ofertas_raw[:limit]
+    siguiente = None
+    if hay_mas:
+        ultima = ofertas_raw[-1]
+        siguiente = (_codificar_cursor(repr(ultima["relevancia"]), ultima["_id"]) if por_texto
+                     else _codificar_cursor(ultima["_id"]))
     
-    return {"total": len(ofertas), "ofertas": ofertas}
+    return {
+        "ofertas": [_oferta_con_id(oferta) for oferta in ofertas_raw],
+        "total": resumen.get("total"),
+        "facetas": resumen.get("facetas"),
+        "siguiente_cursor": siguiente
+    }
 
 @app.get("/ofertas/{oferta_id}")
 async def obtener_oferta(oferta_id: str):
     """Detalle de una oferta específica"""
-    try:
-        oferta = mongo_db.ofertas.find_one({"_id": ObjectId(oferta_id)})
-    except:
+    if not ObjectId.is_valid(oferta_id):
         raise HTTPException(status_code=404, detail="ID de oferta inválido")
     
+    oferta = await cargar_oferta(oferta_id)
     if not oferta:
         raise HTTPException(status_code=404, detail="Oferta no encontrada")
     
-    # Convertir ObjectId a string
-    oferta["id"] = str(oferta["_id"])
-    del oferta["_id"]
-    
     return oferta
 
 @app.put("/ofertas/{oferta_id}")
@@ -1654,7 +1948,7 @@ async def editar_oferta(oferta_id: str, data: dict = Body(...), current_user: di
     
     # Verificar que la oferta existe
     try:
-        oferta = mongo_db.ofertas.find_one({"_id": ObjectId(oferta_id)})
+        oferta = await mongo_db_async.ofertas.find_one({"_id": ObjectId(oferta_id)})
     except:
         raise HTTPException(status_code=404, detail="ID de oferta inválido")
     
@@ -1683,20 +1977,28 @@ async def editar_oferta(oferta_id: str, data: dict = Body(...), current_user: di
         actualizacion["skills_requeridos"] = skills
     
     # Actualizar en MongoDB
-    mongo_db.ofertas.update_one(
+    await mongo_db_async.ofertas.update_one(
         {"_id": ObjectId(oferta_id)},
         {"$set": actualizacion}
     )
     
+    await invalidar_ofertas(oferta_id)
+    
+    # Recalcular los matches materializados (skills, estado o título pueden haber cambiado)
+    try:
+        await asyncio.to_thread(encolar_evento, "matches_oferta", {"oferta_id": oferta_id})
+    except Exception as e:
+        print(f"⚠️ Error al encolar actualización de matches: {e}")
+    
     # Obtener oferta actualizada
-    oferta_actualizada = mongo_db.ofertas.find_one({"_id": ObjectId(oferta_id)})
+    oferta_actualizada = await mongo_db_async.ofertas.find_one({"_id": ObjectId(oferta_id)}, {CAMPO_EVENTOS: 0})
     oferta_actualizada["id"] = str(oferta_actualizada["_id"])
     del oferta_actualizada["_id"]
     
     return {"success": True, "mensaje": "Oferta actualizada exitosamente", "oferta": oferta_actualizada}
 
 @app.post("/ofertas/{oferta_id}/aplicar")
-async def aplicar_a_oferta(oferta_id: str, data: dict = Body(...)):
+def aplicar_a_oferta(oferta_id: str, data: dict = Body(...)):
     """Candidato aplica a una oferta"""
     candidato_email = data.get("candidato_email")
     if not candidato_email:
@@ -1711,224 +2013,170 @@ async def aplicar_a_oferta(oferta_id: str, data: dict = Body(...)):
         raise HTTPException(status_code=400, detail=f"ID de oferta inválido: {str(e)}")
     
     # Verificar si ya aplicó a esta oferta
-    cursor = postgres_conn.cursor()
-    cursor.execute(
-        """
-        SELECT id FROM aplicaciones 
-        WHERE candidato_email = %s AND oferta_id = %s
-        """,
-        (candidato_email, oferta_id)
-    )
-    aplicacion_existente = cursor.fetchone()
-    cursor.close()
-    
-    if aplicacion_existente:
-        raise HTTPException(status_code=400, detail="Ya aplicaste a esta oferta")
-    
-    try:
-        # Crear aplicación en PostgreSQL
-        cursor = postgres_conn.cursor()
+    with get_postgres_conn() as conn, conn.cursor() as cursor:
         cursor.execute(
             """
-            INSERT INTO aplicaciones (candidato_email, oferta_id, estado)
-            VALUES (%s, %s, 'Pendiente')
-            RETURNING id
+            SELECT id FROM aplicaciones 
+            WHERE candidato_email = %s AND oferta_id = %s
             """,
             (candidato_email, oferta_id)
         )
-        aplicacion_id = cursor.fetchone()[0]
-        postgres_conn.commit()
-        cursor.close()
-        
-        # Registrar evento en MongoDB (auditoría)
-        try:
-            mongo_db.historial_cambios.insert_one({
-                "tipo": "aplicacion_creada",
-                "candidato_email": candidato_email,
-                "oferta_id": oferta_id,
-                "aplicacion_id": str(aplicacion_id),
-                "timestamp": datetime.utcnow()
-            })
-        except Exception as e:
-            print(f"⚠️ Error al registrar evento: {e}")
-        
-        # Crear relación en Neo4j (no bloquear si falla)
-        try:
-            with neo4j_driver.session() as session:
-                session.run(
-                    """
-                    MERGE (c:Candidato {email: $candidato_email})
-                    ON CREATE SET c.email = $candidato_email
-                    WITH c
-                    MERGE (of:Oferta {id: $oferta_id})
-                    ON CREATE SET of.id = $oferta_id
-                    MERGE (c)-[r:APLICA_A]->(of)
-                    SET r.estado = 'Pendiente', r.fecha = datetime()
-                    """,
-                    candidato_email=candidato_email,
-                    oferta_id=oferta_id
-                )
-        except Exception as e:
-            print(f"⚠️ Error al crear relación en Neo4j: {e}")
+        aplicacion_existente = cursor.fetchone()
+    
+    if aplicacion_existente:
+        raise HTTPException(status_code=400, detail="Ya aplicaste a esta oferta")
+    
+    try:
+        # Crear aplicación en PostgreSQL (el pool hace rollback si falla)
+        with get_postgres_conn() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO aplicaciones (candidato_email, oferta_id, estado)
+                VALUES (%s, %s, 'Pendiente')
+                RETURNING id
+                """,
+                (candidato_email, oferta_id)
+            )
+            aplicacion_id = cursor.fetchone()[0]
+            
+            # Auditoría en MongoDB y relación en Neo4j: vía outbox, en la misma transacción
+            encolar_evento(
+                "aplicacion_creada",
+                {"aplicacion_id": str(aplicacion_id), "candidato_email": candidato_email, "oferta_id": oferta_id},
+                cursor=cursor
+            )
+            conn.commit()
         
         return {"aplicacion_id": str(aplicacion_id), "estado": "Pendiente"}
     except Exception as e:
-        postgres_conn.rollback()
         raise HTTPException(status_code=500, detail=f"Error al crear aplicación: {str(e)}")
 
+def _codificar_cursor(*partes) -> str:
+    return base64.urlsafe_b64encode("|".join(str(p) for p in partes).encode()).decode()
+
+def _decodificar_cursor(cursor: str, cantidad: int) -> List[str]:
+    try:
+        partes = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    except ValueError:
+        partes = []
+    if len(partes) != cantidad:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return partes
+
 @app.get("/candidatos/{email}/aplicaciones")
-async def obtener_aplicaciones_candidato(email: str):
-    """Obtiene todas las aplicaciones de un candidato"""
-    cursor = postgres_conn.cursor()
-    cursor.execute(
-        """
-        SELECT id, oferta_id, estado, fecha_aplicacion 
-        FROM aplicaciones 
-        WHERE candidato_email = %s
-        ORDER BY fecha_aplicacion DESC
-        """,
-        (email,)
-    )
-    
-    aplicaciones = []
-    for row in cursor.fetchall():
-        app_id, oferta_id, estado, fecha = row
-        
-        # Obtener detalles de la oferta desde MongoDB
+async def obtener_aplicaciones_candidato(
+    email: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None
+):
+    """
+    Obtiene las aplicaciones de un candidato, más recientes primero.
+    Paginación keyset sobre (fecha_aplicacion, id); las ofertas de la página se traen
+    en una sola consulta $in, así la cantidad de round trips no depende del historial.
+    El total solo se calcula en la primera página (sin cursor).
+    """
+    condicion, params = "", [email, limit + 1]
+    if cursor:
+        fecha, app_id = _decodificar_cursor(cursor, 2)
         try:
-            oferta = mongo_db.ofertas.find_one({"_id": ObjectId(oferta_id)})
-            oferta_info = {
+            params += [datetime.fromisoformat(fecha), uuid.UUID(app_id)]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        condicion = "AND (fecha_aplicacion, id) < ($3, $4)"
+    
+    async with get_postgres_conn_async() as conn:
+        rows = await conn.fetch(
+            f"""
+            SELECT id, oferta_id, estado, fecha_aplicacion
+            FROM aplicaciones
+            WHERE candidato_email = $1 {condicion}
+            ORDER BY fecha_aplicacion DESC, id DESC
+            LIMIT $2
+            """,
+            *params
+        )
+        total = None
+        if not cursor:
+            total = await conn.fetchval("SELECT COUNT(*) FROM aplicaciones WHERE candidato_email = $1", email)
+    
+    hay_mas = len(rows) > limit
+    rows = rows[:limit]
+    
+    # Detalles de todas las ofertas de la página en una sola consulta
+    ids_validos = {row["oferta_id"] for row in rows if ObjectId.is_valid(row["oferta_id"])}
+    ofertas = {}
+    if ids_validos:
+        async for oferta in mongo_db_async.ofertas.find(
+            {"_id": {"$in": [ObjectId(i) for i in ids_validos]}},
+            {"titulo": 1, "empresa": 1, "empresa_id": 1, "ubicacion": 1, "modalidad": 1}
+        ):
+            ofertas[str(oferta["_id"])] = {
                 "titulo": oferta.get("titulo", "Oferta no encontrada"),
                 "empresa": oferta.get("empresa", ""),
+                "empresa_id": oferta.get("empresa_id", oferta.get("empresa", "")),
                 "ubicacion": oferta.get("ubicacion", ""),
                 "modalidad": oferta.get("modalidad", "")
-            } if oferta else {"titulo": "Oferta no encontrada"}
-        except:
-            oferta_info = {"titulo": "Oferta no encontrada"}
-        
-        aplicaciones.append({
-            "id": str(app_id),
-            "oferta_id": oferta_id,
-            "estado": estado,
-            "fecha_aplicacion": str(fecha),
-            "oferta": oferta_info
-        })
+            }
+    
+    aplicaciones = [
+        {
+            "id": str(row["id"]),
+            "oferta_id": row["oferta_id"],
+            "estado": row["estado"],
+            "fecha_aplicacion": str(row["fecha_aplicacion"]),
+            "fecha": row["fecha_aplicacion"].isoformat() if row["fecha_aplicacion"] else None,
+            "oferta": ofertas.get(row["oferta_id"], {"titulo": "Oferta no encontrada"})
+        }
+        for row in rows
+    ]
     
-    cursor.close()
-    return {"total": len(aplicaciones), "aplicaciones": aplicaciones}
+    siguiente = None
+    if hay_mas:
+        ultima = rows[-1]
+        siguiente = _codificar_cursor(ultima["fecha_aplicacion"].isoformat(), ultima["id"])
+    
+    return {
+        "candidato_email": email,
+        "total": total,
+        "aplicaciones": aplicaciones,
+        "siguiente_cursor": siguiente
+    }
 
 @app.get("/ofertas/{oferta_id}/matches")
 async def matching_oferta(oferta_id: str):
-    """Busca candidatos que matcheen con una oferta usando Neo4j"""
-    # Obtener skills requeridos de la oferta
-    try:
-        oferta = mongo_db.ofertas.find_one({"_id": ObjectId(oferta_id)})
-    except:
+    """Top de candidatos para una oferta: materializado en Redis y mantenido incrementalmente"""
+    if not ObjectId.is_valid(oferta_id):
         raise HTTPException(status_code=404, detail="ID de oferta inválido")
     
-    if not oferta:
-        raise HTTPException(status_code=404, detail="Oferta no encontrada")
-    
-    skills_requeridos = oferta.get("skills_requeridos", [])
-    
-    if not skills_requeridos:
-        return {
-            "oferta_id": oferta_id,
-            "titulo": oferta["titulo"],
-            "skills_requeridos": [],
-            "candidatos_encontrados": 0,
-            "candidatos": []
-        }
-    
-    # Query Neo4j usando TIENE_SKILL (case-insensitive)
     try:
-        with neo4j_driver.session() as session:
-            result = session.run(
-                """
-                MATCH (c:Usuario)-[:TIENE_SKILL]->(s:Skill)
-                WHERE ANY(skill IN $skills WHERE toLower(s.nombre) = toLower(skill))
-                WITH c, COLLECT(DISTINCT s.nombre) AS skills_matched, COUNT(DISTINCT s) AS match_count
-                WHERE match_count > 0
-                RETURN c.email AS email, 
-                       c.nombre AS nombre,
-                       skills_matched,
-                       match_count,
-                       (match_count * 100.0 / $total_skills) AS match_percentage
-                ORDER BY match_count DESC
-                LIMIT 20
-                """,
-                skills=skills_requeridos,
-                total_skills=len(skills_requeridos)
-            )
-            
-            candidatos = []
-            for record in result:
-                # Obtener info adicional del candidato desde MongoDB
-                candidato_mongo = mongo_db.perfiles.find_one({"email": record["email"]})
-                
-                candidatos.append({
-                    "email": record["email"],
-                    "nombre": record["nombre"],
-                    "seniority": candidato_mongo.get("seniority", "N/A") if candidato_mongo else "N/A",
-                    "skills_matched": record["skills_matched"],
-                    "match_skills": record["match_count"],
-                    "match_percentage": round(record["match_percentage"], 1)
-                })
+        matches = await leer_matches_oferta(oferta_id)
+        if matches is None:
+            # Primera lectura (u oferta no abierta cuyo top expiró): materializar ahora
+            matches = await recalcular_matches_oferta(oferta_id)
     except Exception as e:
-        print(f"⚠️ Error en Neo4j, fallback a búsqueda básica: {e}")
-        # Fallback: buscar candidatos en PostgreSQL
-        candidatos = []
+        print(f"⚠️ Error leyendo matches materializados, se calculan en línea: {e}")
+        matches = await calcular_matches_oferta(oferta_id)
+    
+    if matches is None:
+        raise HTTPException(status_code=404, detail="Oferta no encontrada")
     
     return {
         "oferta_id": oferta_id,
-        "titulo": oferta["titulo"],
-        "skills_requeridos": skills_requeridos,
-        "candidatos_encontrados": len(candidatos),
-        "candidatos": candidatos
+        "titulo": matches["titulo"],
+        "skills_requeridos": matches["skills_requeridos"],
+        "candidatos_encontrados": len(matches["candidatos"]),
+        "candidatos": matches["candidatos"]
     }
 
-
-@app.get("/candidatos/{email}/aplicaciones")
-async def obtener_aplicaciones_candidato(email: str):
-    """Ver todas las aplicaciones de un candidato"""
-    with postgres_conn.cursor() as cursor:
-        cursor.execute(
-            """
-            SELECT id, oferta_id, estado, fecha_aplicacion
-            FROM aplicaciones
-            WHERE candidato_email = %s
-            ORDER BY fecha_aplicacion DESC
-            """,
-            (email,)
-        )
-        aplicaciones = cursor.fetchall()
-    
-    # Enriquecer con datos de la oferta
-    result = []
-    for aplic in aplicaciones:
-        oferta = mongo_db.ofertas.find_one(
-            {"_id": ObjectId(aplic[1])},
-            {"_id": 0, "titulo": 1, "empresa_id": 1, "modalidad": 1}
-        )
-        result.append({
-            "id": str(aplic[0]),
-            "estado": aplic[2],
-            "fecha": aplic[3].isoformat(),
-            "oferta": oferta
-        })
-    
-    return {"candidato_email": email, "total_aplicaciones": len(result), "aplicaciones": result}
-
-
 # ==================== ENTREVISTAS ====================
 
 @app.post("/entrevistas", status_code=201)
-async def crear_entrevista(entrevista: Entrevista):
+def crear_entrevista(entrevista: Entrevista):
     """
     Crear una nueva entrevista programada
     TODO: Descomentar require_recruiter cuando frontend implemente login
     """
-    with postgres_conn.cursor() as cursor:
+    with get_postgres_conn() as conn, conn.cursor() as cursor:
         cursor.execute(
             """
             INSERT INTO entrevistas (
@@ -1950,7 +2198,7 @@ async def crear_entrevista(entrevista: Entrevista):
             )
         )
         id = cursor.fetchone()[0]
-        postgres_conn.commit()
+        conn.commit()
     
     return {
         "id": str(id),
@@ -1960,9 +2208,9 @@ async def crear_entrevista(entrevista: Entrevista):
 
 
 @app.get("/entrevistas/{entrevista_id}")
-async def obtener_entrevista(entrevista_id: str):
+def obtener_entrevista(entrevista_id: str):
     """Obtener detalles de una entrevista específica"""
-    with postgres_conn.cursor() as cursor:
+    with get_postgres_conn() as conn, conn.cursor() as cursor:
         cursor.execute(
             """
             SELECT id, proceso_id, tipo, fecha, entrevistador,
@@ -1991,9 +2239,9 @@ async def obtener_entrevista(entrevista_id: str):
 
 
 @app.get("/procesos/{proceso_id}/entrevistas")
-async def listar_entrevistas_proceso(proceso_id: str):
+def listar_entrevistas_proceso(proceso_id: str):
     """Ver todas las entrevistas de un proceso"""
-    with postgres_conn.cursor() as cursor:
+    with get_postgres_conn() as conn, conn.cursor() as cursor:
         cursor.execute(
             """
             SELECT id, tipo, fecha, entrevistador, duracion_minutos,
@@ -2026,14 +2274,14 @@ async def listar_entrevistas_proceso(proceso_id: str):
 
 
 @app.put("/entrevistas/{entrevista_id}")
-async def actualizar_entrevista(
+def actualizar_entrevista(
     entrevista_id: str,
     estado: str = Body(...),
     puntaje: Optional[int] = Body(None),
     notas: Optional[str] = Body(None)
 ):
     """Actualizar estado, puntaje o notas de una entrevista"""
-    with postgres_conn.cursor() as cursor:
+    with get_postgres_conn() as conn, conn.cursor() as cursor:
         # Construir query dinámicamente
         updates = ["estado = %s"]
         params = [estado]
@@ -2058,7 +2306,7 @@ async def actualizar_entrevista(
             params
         )
         result = cursor.fetchone()
-        postgres_conn.commit()
+        conn.commit()
     
     if not result:
         raise HTTPException(status_code=404, detail="Entrevista no encontrada")
@@ -2067,9 +2315,9 @@ async def actualizar_entrevista(
 
 
 @app.get("/candidatos/{email}/entrevistas")
-async def listar_entrevistas_candidato(email: str):
+def listar_entrevistas_candidato(email: str):
     """Ver todas las entrevistas de un candidato"""
-    with postgres_conn.cursor() as cursor:
+    with get_postgres_conn() as conn, conn.cursor() as cursor:
         # Buscar el candidato_id en PostgreSQL
         cursor.execute(
             "SELECT id FROM candidatos WHERE email = %s",
@@ -2118,12 +2366,12 @@ async def listar_entrevistas_candidato(email: str):
 # ==================== EVALUACIONES TÉCNICAS ====================
 
 @app.post("/evaluaciones", status_code=201)
-async def crear_evaluacion(evaluacion: EvaluacionTecnica):
+def crear_evaluacion(evaluacion: EvaluacionTecnica):
     """
     Crear una nueva evaluación técnica para un proceso
     TODO: Descomentar require_recruiter cuando frontend implemente login
     """
-    with postgres_conn.cursor() as cursor:
+    with get_postgres_conn() as conn, conn.cursor() as cursor:
         cursor.execute(
             """
             INSERT INTO evaluaciones (
@@ -2142,7 +2390,7 @@ async def crear_evaluacion(evaluacion: EvaluacionTecnica):
             )
         )
         id = cursor.fetchone()[0]
-        postgres_conn.commit()
+        conn.commit()
     
     return {
         "id": str(id),
@@ -2151,9 +2399,9 @@ async def crear_evaluacion(evaluacion: EvaluacionTecnica):
 
 
 @app.get("/evaluaciones/{evaluacion_id}")
-async def obtener_evaluacion(evaluacion_id: str):
+def obtener_evaluacion(evaluacion_id: str):
     """Obtener detalles de una evaluación específica"""
-    with postgres_conn.cursor() as cursor:
+    with get_postgres_conn() as conn, conn.cursor() as cursor:
         cursor.execute(
             """
             SELECT id, proceso_id, tipo, plataforma, resultado, puntaje, feedback
@@ -2179,9 +2427,9 @@ async def obtener_evaluacion(evaluacion_id: str):
 
 
 @app.get("/procesos/{proceso_id}/evaluaciones")
-async def listar_evaluaciones_proceso(proceso_id: str):
+def listar_evaluaciones_proceso(proceso_id: str):
     """Ver todas las evaluaciones de un proceso"""
-    with postgres_conn.cursor() as cursor:
+    with get_postgres_conn() as conn, conn.cursor() as cursor:
         cursor.execute(
             """
             SELECT id, tipo, plataforma, resultado, puntaje, feedback
@@ -2211,9 +2459,9 @@ async def listar_evaluaciones_proceso(proceso_id: str):
 
 
 @app.get("/candidatos/{email}/evaluaciones")
-async def listar_evaluaciones_candidato(email: str):
+def listar_evaluaciones_candidato(email: str):
     """Ver todas las evaluaciones técnicas de un candidato"""
-    with postgres_conn.cursor() as cursor:
+    with get_postgres_conn() as conn, conn.cursor() as cursor:
         # Buscar el candidato_id en PostgreSQL
         cursor.execute(
             "SELECT id FROM candidatos WHERE email = %s",
@@ -2263,14 +2511,14 @@ async def listar_evaluaciones_candidato(email: str):
 
 
 @app.put("/evaluaciones/{evaluacion_id}")
-async def actualizar_evaluacion(
+def actualizar_evaluacion(
     evaluacion_id: str,
     resultado: str = Body(...),
     puntaje: float = Body(...),
     feedback: str = Body(...)
 ):
     """Actualizar los resultados de una evaluación"""
-    with postgres_conn.cursor() as cursor:
+    with get_postgres_conn() as conn, conn.cursor() as cursor:
         cursor.execute(
             """
             UPDATE evaluaciones
@@ -2281,7 +2529,7 @@ async def actualizar_evaluacion(
             (resultado, puntaje, feedback, evaluacion_id)
         )
         result = cursor.fetchone()
-        postgres_conn.commit()
+        conn.commit()
     
     if not result:
         raise HTTPException(status_code=404, detail="Evaluación no encontrada")
@@ -2289,6 +2537,64 @@ async def actualizar_evaluacion(
     return {"id": str(result[0]), "mensaje": "Evaluación actualizada"}
 
 
+# ==================== EXPORTACIONES ====================
+
+FORMATO_EXPORTACION = Query("ndjson", pattern="^(ndjson|csv)$")
+
+@app.get("/exportar/procesos")
+async def exportar_procesos(
+    formato: str = FORMATO_EXPORTACION,
+    estado: Optional[str] = None,
+    _: dict = Depends(require_recruiter)
+):
+    """Exporta todos los procesos (sin notas confidenciales) en streaming, más recientes primero"""
+    filas = filas_postgres(
+        """
+        SELECT id, candidato_id, puesto, estado, feedback, updated_at
+        FROM procesos
+        WHERE ($1::text IS NULL OR estado = $1)
+        ORDER BY updated_at DESC, id DESC
+        """,
+        estado
+    )
+    return respuesta_exportacion(
+        filas, formato, ["id", "candidato_id", "puesto", "estado", "feedback", "updated_at"], "procesos"
+    )
+
+@app.get("/exportar/aplicaciones")
+async def exportar_aplicaciones(
+    formato: str = FORMATO_EXPORTACION,
+    oferta_id: Optional[str] = None,
+    _: dict = Depends(require_recruiter)
+):
+    """Exporta todas las aplicaciones a ofertas en streaming"""
+    filas = filas_postgres(
+        """
+        SELECT id, candidato_email, oferta_id, estado, fecha_aplicacion
+        FROM aplicaciones
+        WHERE ($1::text IS NULL OR oferta_id = $1)
+        ORDER BY fecha_aplicacion DESC, id DESC
+        """,
+        oferta_id
+    )
+    return respuesta_exportacion(
+        filas, formato, ["id", "candidato_email", "oferta_id", "estado", "fecha_aplicacion"], "aplicaciones"
+    )
+
+@app.get("/exportar/candidatos")
+async def exportar_candidatos(
+    formato: str = FORMATO_EXPORTACION,
+    seniority: Optional[str] = None,
+    _: dict = Depends(require_recruiter)
+):
+    """Exporta los perfiles de candidatos desde MongoDB en streaming"""
+    filtro = {"email": {"$exists": True}}
+    if seniority:
+        filtro["seniority"] = seniority
+    columnas = ["email", "nombre", "seniority", "skills", "activo"]
+    documentos = documentos_mongo("perfiles", filtro, {"_id": 0, **{c: 1 for c in columnas}})
+    return respuesta_exportacion(documentos, formato, columnas, "candidatos")
+
 # ==================== AUTENTICACIÓN ====================
 
 @app.post("/register", status_code=201)
@@ -2303,26 +2609,24 @@ async def registrar_usuario(
     if rol not in ["candidato", "empresa"]:
         raise HTTPException(status_code=400, detail="Rol inválido")
     
-    # Verificar que no exista el usuario
-    cursor = postgres_conn.cursor()
-    cursor.execute("SELECT email FROM usuarios WHERE email = %s", (email,))
-    if cursor.fetchone():
-        cursor.close()
-        raise HTTPException(status_code=400, detail="El email ya está registrado")
+    async with get_postgres_conn_async() as conn:
+        # Verificar que no exista el usuario
+        if await conn.fetchval("SELECT email FROM usuarios WHERE email = $1", email):
+            raise HTTPException(status_code=400, detail="El email ya está registrado")
+        
+        # Crear usuario (bcrypt es CPU puro: fuera del event loop)
+        password_hash = await run_in_threadpool(hash_password, password)
+        usuario = await conn.fetchrow(
+            """
+            INSERT INTO usuarios (email, password_hash, rol, nombre)
+            VALUES ($1, $2, $3, $4)
+            RETURNING id, email, rol, nombre
+            """,
+            email, password_hash, rol, nombre
+        )
     
-    # Crear usuario
-    password_hash = hash_password(password)
-    cursor.execute(
-        """
-        INSERT INTO usuarios (email, password_hash, rol, nombre)
-        VALUES (%s, %s, %s, %s)
-        RETURNING id, email, rol, nombre
-        """,
-        (email, password_hash, rol, nombre)
-    )
-    usuario = cursor.fetchone()
-    postgres_conn.commit()
-    cursor.close()
+    # Puede haber quedado cacheado como inexistente
+    await invalidar_usuarios(email)
     
     # Generar token
     token = generar_token_jwt(email, rol)
@@ -2341,13 +2645,11 @@ async def registrar_usuario(
 async def login(email: str = Body(...), password: str = Body(...)):
     """Iniciar sesión y obtener token JWT"""
     # Buscar usuario
-    cursor = postgres_conn.cursor()
-    cursor.execute(
-        "SELECT email, password_hash, rol, nombre FROM usuarios WHERE email = %s",
-        (email,)
-    )
-    usuario = cursor.fetchone()
-    cursor.close()
+    async with get_postgres_conn_async() as conn:
+        usuario = await conn.fetchrow(
+            "SELECT email, password_hash, rol, nombre FROM usuarios WHERE email = $1",
+            email
+        )
     
     if not usuario:
         raise HTTPException(
@@ -2355,20 +2657,20 @@ async def login(email: str = Body(...), password: str = Body(...)):
             detail="Email o contraseña incorrectos"
         )
     
-    # Verificar contraseña
-    if not verificar_password(password, usuario[1]):
+    # Verificar contraseña (bcrypt es CPU-bound: se ejecuta fuera del event loop)
+    if not await run_in_threadpool(verificar_password, password, usuario["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email o contraseña incorrectos"
         )
     
     # Generar token
-    token = generar_token_jwt(usuario[0], usuario[2])
+    token = generar_token_jwt(usuario["email"], usuario["rol"])
     
     return {
-        "email": usuario[0],
-        "rol": usuario[2],
-        "nombre": usuario[3],
+        "email": usuario["email"],
+        "rol": usuario["rol"],
+        "nombre": usuario["nombre"],
         "access_token": token,
         "token_type": "bearer"
     }
@@ -2377,20 +2679,14 @@ async def login(email: str = Body(...), password: str = Body(...)):
 @app.get("/me")
 async def obtener_usuario_actual(current_user: dict = Depends(get_current_user)):
     """Obtener información del usuario actual"""
-    cursor = postgres_conn.cursor()
-    cursor.execute(
-        "SELECT email, rol, nombre, created_at FROM usuarios WHERE email = %s",
-        (current_user["email"],)
-    )
-    usuario = cursor.fetchone()
-    cursor.close()
+    usuario = await obtener_usuario(current_user["email"])
     
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
     return {
-        "email": usuario[0],
-        "rol": usuario[1],
-        "nombre": usuario[2],
-        "created_at": usuario[3].isoformat()
+        "email": usuario["email"],
+        "rol": usuario["rol"],
+        "nombre": usuario["nombre"],
+        "created_at": usuario["created_at"]
     }
\ No newline at end of file
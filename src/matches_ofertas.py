@@ -0,0 +1,289 @@
+import os
+import json
+from typing import Dict, List, Optional
+from bson import ObjectId
+from src.database_async import mongo_db_async, redis_client_async
+from src.matching import usar_indice, puntuar_candidatos, perfil_indexado, PROYECCION_PERFIL
+from src.scoring import MatrizSkills, skills_con_relacionados
+
+# Matches que devuelve GET /ofertas/{id}/matches
+MATCHES_POR_OFERTA = int(os.getenv("MATCHES_POR_OFERTA", "20"))
+# Se guardan más de los que se muestran: si alguno sale del top no hace falta recalcular la oferta entera
+MATCHES_MARGEN = int(os.getenv("MATCHES_MARGEN", str(MATCHES_POR_OFERTA)))
+# Las ofertas no abiertas se materializan a demanda y no se mantienen: expiran
+MATCHES_TTL_NO_ABIERTAS = int(os.getenv("MATCHES_TTL_NO_ABIERTAS", "3600"))
+
+_CAPACIDAD = MATCHES_POR_OFERTA + MATCHES_MARGEN
+
+# Claves en Redis:
+#   matches:oferta:{id}          sorted set email -> score
+#   matches:oferta:{id}:detalle  hash email -> JSON con los datos para la respuesta
+#   matches:oferta:{id}:meta     hash con titulo, skills, pesos, seniority_minimo y umbral
+#   matches:skill:{skill}        set de ofertas abiertas afectadas por un skill (requerido o relacionado)
+#   matches:candidato:{email}    set de ofertas donde el candidato está materializado
+
+
+def _clave_oferta(oferta_id: str) -> str:
+    return f"matches:oferta:{oferta_id}"
+
+
+def _clave_skill(skill: str) -> str:
+    return f"matches:skill:{skill}"
+
+
+def _clave_candidato(email: str) -> str:
+    return f"matches:candidato:{email}"
+
+
+def _texto(valor) -> str:
+    return valor.decode() if isinstance(valor, bytes) else valor
+
+
+def _skills_afectados(skills: List[str]) -> List[str]:
+    """Skills (en minúsculas) cuyo cambio en un candidato puede alterar su score para la oferta"""
+    return skills_con_relacionados(skills)
+
+
+def _detalle(resultado: dict) -> str:
+    return json.dumps({
+        "nombre": resultado["nombre"],
+        "seniority": resultado["seniority"],
+        "skills_matched": resultado["skills_matched"],
+        "match_count": resultado["match_count"],
+        "cobertura": resultado["cobertura"],
+    })
+
+
+async def _perfiles_candidatos(skills: List[str]) -> List[dict]:
+    """Perfiles activos con algún skill afectado: `skills_lower` ya está en minúsculas y usa su índice"""
+    filtro = {"skills_lower": {"$in": _skills_afectados(skills)}, "activo": {"$ne": False}}
+    cursor = mongo_db_async.perfiles.find(filtro, PROYECCION_PERFIL)
+    return [perfil_indexado(perfil) async for perfil in cursor if perfil.get("email")]
+
+
+async def calcular_matches(oferta: dict, k: int) -> List[dict]:
+    """Scoring de todos los candidatos contra la oferta (índice en memoria si está activo, si no MongoDB)"""
+    skills = oferta.get("skills_requeridos") or []
+    opciones = {
+        "pesos": oferta.get("skills_pesos"),
+        "seniority_minimo": oferta.get("seniority_minimo"),
+        # Igual que /matching: un candidato inactivo no aparece en los matches de una oferta
+        "solo_activos": True,
+    }
+    if not skills:
+        return []
+    if usar_indice():
+        return await puntuar_candidatos(skills, k, **opciones)
+    return MatrizSkills(await _perfiles_candidatos(skills)).puntuar(skills, k, **opciones)
+
+
+async def calcular_matches_oferta(oferta_id: str) -> Optional[dict]:
+    """Como recalcular_matches_oferta pero sin materializar (fallback si Redis no está disponible)"""
+    oferta = await mongo_db_async.ofertas.find_one({"_id": ObjectId(oferta_id)})
+    if not oferta:
+        return None
+    return {
+        "titulo": oferta.get("titulo", ""),
+        "skills_requeridos": oferta.get("skills_requeridos") or [],
+        "candidatos": _formatear(await calcular_matches(oferta, MATCHES_POR_OFERTA))
+    }
+
+
+async def recalcular_matches_oferta(oferta_id: str) -> Optional[dict]:
+    """
+    Recalcula desde cero y materializa los matches de una oferta.
+    Devuelve el resultado en el formato de leer_matches_oferta, o None si la oferta no existe.
+    """
+    oferta = await mongo_db_async.ofertas.find_one({"_id": ObjectId(oferta_id)})
+    if not oferta:
+        await quitar_matches_oferta(oferta_id)
+        return None
+
+    resultados = await calcular_matches(oferta, _CAPACIDAD + 1)
+    # Ningún candidato fuera del set supera el umbral (0 si entraron todos)
+    umbral = resultados[_CAPACIDAD]["score"] if len(resultados) > _CAPACIDAD else 0
+    resultados = resultados[:_CAPACIDAD]
+    abierta = oferta.get("estado", "abierta") == "abierta"
+    skills = oferta.get("skills_requeridos") or []
+    claves_skill = _skills_afectados(skills) if abierta else []
+    meta = {
+        "titulo": oferta.get("titulo", ""),
+        "skills_requeridos": json.dumps(skills),
+        "skills_pesos": json.dumps(oferta.get("skills_pesos") or {}),
+        "seniority_minimo": oferta.get("seniority_minimo") or "",
+        "umbral": umbral,
+        "claves_skill": json.dumps(claves_skill),
+    }
+    clave = _clave_oferta(oferta_id)
+
+    async def reemplazar(pipe):
+        anteriores = await pipe.zrange(clave, 0, -1)
+        claves_anteriores = json.loads(await pipe.hget(f"{clave}:meta", "claves_skill") or "[]")
+        pipe.multi()
+        pipe.delete(clave, f"{clave}:detalle", f"{clave}:meta")
+        for email in anteriores:
+            pipe.srem(_clave_candidato(_texto(email)), oferta_id)
+        for skill in claves_anteriores:
+            pipe.srem(_clave_skill(skill), oferta_id)
+        if resultados:
+            pipe.zadd(clave, {r["email"]: r["score"] for r in resultados})
+            pipe.hset(f"{clave}:detalle", mapping={r["email"]: _detalle(r) for r in resultados})
+        pipe.hset(f"{clave}:meta", mapping=meta)
+        if abierta:
+            for r in resultados:
+                pipe.sadd(_clave_candidato(r["email"]), oferta_id)
+            for skill in claves_skill:
+                pipe.sadd(_clave_skill(skill), oferta_id)
+        else:
+            for sufijo in ("", ":detalle", ":meta"):
+                pipe.expire(f"{clave}{sufijo}", MATCHES_TTL_NO_ABIERTAS)
+
+    await redis_client_async.transaction(reemplazar, clave, f"{clave}:meta")
+    return {
+        "titulo": meta["titulo"],
+        "skills_requeridos": skills,
+        "candidatos": _formatear(resultados[:MATCHES_POR_OFERTA])
+    }
+
+
+async def quitar_matches_oferta(oferta_id: str):
+    """Borra la materialización de una oferta y sus registros en los sets de skills/candidatos"""
+    clave = _clave_oferta(oferta_id)
+
+    async def borrar(pipe):
+        emails = await pipe.zrange(clave, 0, -1)
+        claves_skill = json.loads(await pipe.hget(f"{clave}:meta", "claves_skill") or "[]")
+        pipe.multi()
+        for email in emails:
+            pipe.srem(_clave_candidato(_texto(email)), oferta_id)
+        for skill in claves_skill:
+            pipe.srem(_clave_skill(skill), oferta_id)
+        pipe.delete(clave, f"{clave}:detalle", f"{clave}:meta")
+
+    await redis_client_async.transaction(borrar, clave, f"{clave}:meta")
+
+
+async def _actualizar_candidato_en_oferta(oferta_id: str, email: str, perfil: Optional[dict]) -> bool:
+    """
+    Aplica el nuevo score de un candidato al top materializado de una oferta.
+    Devuelve True si el top quedó con menos candidatos de los que se muestran y hay que recalcularlo.
+    """
+    clave = _clave_oferta(oferta_id)
+
+    async def aplicar(pipe):
+        meta = {_texto(k): _texto(v) for k, v in (await pipe.hgetall(f"{clave}:meta")).items()}
+        if not meta:
+            # Registro huérfano (la oferta ya no está materializada)
+            pipe.multi()
+            pipe.srem(_clave_candidato(email), oferta_id)
+            return False
+
+        actuales = {_texto(e): s for e, s in await pipe.zrange(clave, 0, -1, withscores=True)}
+        umbral = float(meta["umbral"])
+        resultado = None
+        if perfil is not None:
+            puntuados = MatrizSkills([perfil]).puntuar(
+                json.loads(meta["skills_requeridos"]), 1,
+                pesos=json.loads(meta["skills_pesos"]),
+                seniority_minimo=meta["seniority_minimo"] or None,
+                solo_activos=True
+            )
+            resultado = puntuados[0] if puntuados else None
+
+        # Solo puede estar en el set si supera a todos los que quedaron afuera
+        entra = resultado is not None and resultado["score"] > umbral
+        salientes = []
+        if entra:
+            actuales[email] = resultado["score"]
+            if len(actuales) > _CAPACIDAD:
+                # El último en el orden de la respuesta: menor score y, entre empatados, mayor email
+                ultimo = max(actuales, key=lambda e: (-actuales[e], e))
+                umbral = max(umbral, actuales.pop(ultimo))
+                salientes.append(ultimo)
+        elif email in actuales:
+            del actuales[email]
+            salientes.append(email)
+
+        pipe.multi()
+        if entra and email in actuales:
+            pipe.zadd(clave, {email: resultado["score"]})
+            pipe.hset(f"{clave}:detalle", email, _detalle(resultado))
+            pipe.sadd(_clave_candidato(email), oferta_id)
+        elif not entra:
+            pipe.srem(_clave_candidato(email), oferta_id)
+        for saliente in salientes:
+            pipe.zrem(clave, saliente)
+            pipe.hdel(f"{clave}:detalle", saliente)
+            pipe.srem(_clave_candidato(saliente), oferta_id)
+        pipe.hset(f"{clave}:meta", "umbral", umbral)
+        return umbral > 0 and len(actuales) < MATCHES_POR_OFERTA
+
+    return await redis_client_async.transaction(aplicar, clave, f"{clave}:meta", value_from_callable=True)
+
+
+async def actualizar_matches_candidato(email: str):
+    """
+    Mantenimiento incremental: recalcula el score del candidato solo en las ofertas abiertas
+    afectadas (comparten algún skill o ya lo tenían en su top) y actualiza cada top materializado.
+    """
+    documento = await mongo_db_async.perfiles.find_one({"email": email}, PROYECCION_PERFIL)
+    perfil = perfil_indexado(documento) if documento else None
+
+    claves = [_clave_candidato(email)]
+    if perfil is not None:
+        claves += [_clave_skill(skill) for skill in perfil["skills_lower"]]
+    ofertas = {_texto(oferta_id) for oferta_id in await redis_client_async.sunion(claves)}
+
+    for oferta_id in sorted(ofertas):
+        if await _actualizar_candidato_en_oferta(oferta_id, email, perfil):
+            await recalcular_matches_oferta(oferta_id)
+
+
+async def ofertas_con_skills(skills: List[str]) -> List[str]:
+    """Ofertas materializadas que piden alguno de estos skills (ej: para recalcular tras una importación)"""
+    if not skills:
+        return []
+    return sorted({_texto(oferta_id) for oferta_id in await redis_client_async.sunion(
+        [_clave_skill(skill) for skill in skills]
+    )})
+
+
+def _formatear(resultados: List[dict]) -> List[dict]:
+    return [
+        {
+            "email": r["email"],
+            "nombre": r["nombre"],
+            "seniority": r["seniority"] or "N/A",
+            "skills_matched": r["skills_matched"],
+            "match_skills": r["match_count"],
+            "match_percentage": round(r["cobertura"] * 100, 1),
+            "score": r["score"]
+        }
+        for r in resultados
+    ]
+
+
+async def leer_matches_oferta(oferta_id: str) -> Optional[dict]:
+    """Lee el top materializado de una oferta en un solo round trip; None si no está materializado"""
+    clave = _clave_oferta(oferta_id)
+    async with redis_client_async.pipeline(transaction=True) as pipe:
+        pipe.hgetall(f"{clave}:meta")
+        pipe.zrange(clave, 0, -1, withscores=True)
+        pipe.hgetall(f"{clave}:detalle")
+        meta, puntajes, detalles = await pipe.execute()
+
+    if not meta:
+        return None
+    meta = {_texto(k): _texto(v) for k, v in meta.items()}
+    detalles = {_texto(e): json.loads(d) for e, d in detalles.items()}
+    ordenados = sorted(((_texto(e), s) for e, s in puntajes), key=lambda par: (-par[1], par[0]))
+    resultados = [
+        {"email": email, "score": score, **detalles[email]}
+        for email, score in ordenados[:MATCHES_POR_OFERTA]
+        if email in detalles
+    ]
+    return {
+        "titulo": meta["titulo"],
+        "skills_requeridos": json.loads(meta["skills_requeridos"]),
+        "candidatos": _formatear(resultados)
+    }
@@ -0,0 +1,384 @@
+import os
+import time
+import asyncio
+from typing import Dict, Iterable, List, Optional
+from src.database_async import mongo_db_async, neo4j_driver_async
+from src.cambios import al_cambiar
+from src.scoring import MatrizSkills, skills_con_relacionados
+
+# Motor de matching: "cypher" (consultas a Neo4j) o "indice" (índice invertido en memoria).
+# Los dos puntúan con el mismo código sobre la misma población (candidatos = documentos de
+# `perfiles`, reflejados en Neo4j como :Candidato-[:DOMINA]->:Skill) y comparan skills sin
+# distinguir mayúsculas; solo cambia de dónde salen los candidatos.
+MATCHING_ENGINE = os.getenv("MATCHING_ENGINE", "cypher").lower()
+# El índice se mantiene con los eventos de cambio. Cada MATCHING_INDEX_RECONCILE_INTERVAL segundos
+# se compara solo el conjunto de emails con `perfiles` (altas/bajas perdidas) y se refrescan las
+# diferencias; la reconstrucción completa (cara: CPU con el GIL tomado) queda como red de seguridad.
+MATCHING_INDEX_RECONCILE_INTERVAL = float(os.getenv("MATCHING_INDEX_RECONCILE_INTERVAL", "300"))
+MATCHING_INDEX_REBUILD_INTERVAL = float(os.getenv("MATCHING_INDEX_REBUILD_INTERVAL", "86400"))
+# Segundos mínimos entre reconstrucciones de la matriz de scoring cuando el índice cambia
+MATCHING_MATRIX_REFRESH = float(os.getenv("MATCHING_MATRIX_REFRESH", "2"))
+
+
+# Seniority de los candidatos que no lo cargaron (así se escribe en Neo4j y PostgreSQL)
+SENIORITY_POR_DEFECTO = "Junior"
+
+
+def normalizar_lista_skills(skills) -> List[str]:
+    """Los perfiles antiguos guardan skills como string separado por comas"""
+    if isinstance(skills, str):
+        return [s.strip() for s in skills.split(",") if s.strip()]
+    return [s for s in (skills or []) if s]
+
+
+def skills_normalizados(skills) -> List[str]:
+    """Skills en minúsculas y sin duplicados: es lo que se guarda en `skills_lower` de cada perfil (indexado)"""
+    return list(dict.fromkeys(s.lower() for s in normalizar_lista_skills(skills)))
+
+
+def perfil_indexado(perfil: dict) -> dict:
+    """Forma normalizada de un documento de `perfiles` que usan el índice y la matriz de scoring"""
+    skills = list(dict.fromkeys(normalizar_lista_skills(perfil.get("skills"))))
+    lower = {}
+    for skill in skills:
+        lower.setdefault(skill.lower(), skill)
+    return {
+        "email": perfil["email"],
+        "nombre": perfil.get("nombre"),
+        "seniority": perfil.get("seniority") or SENIORITY_POR_DEFECTO,
+        "skills": skills,
+        "skills_set": frozenset(skills),
+        "skills_lower": lower,
+        "activo": bool(perfil.get("activo", True)),
+    }
+
+
+def _bits(mascara: int):
+    """Itera las posiciones de los bits en 1 de un entero"""
+    while mascara:
+        bajo = mascara & -mascara
+        yield bajo.bit_length() - 1
+        mascara ^= bajo
+
+
+class IndiceSkills:
+    """
+    Índice invertido skill -> bitset de candidatos (un int de Python por skill).
+    Cada candidato ocupa un slot (posición de bit); el conteo de skills en común
+    se calcula con un sumador bit a bit sobre todos los candidatos a la vez.
+    """
+
+    def __init__(self):
+        self._slots: Dict[str, int] = {}
+        self._libres: List[int] = []
+        self._perfiles: List[Optional[dict]] = []
+        self._por_skill: Dict[str, int] = {}
+        self._por_skill_lower: Dict[str, int] = {}
+        self._activos = 0
+        # Se incrementa con cada cambio; la matriz de scoring lo usa para saber si quedó vieja
+        self.version = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _desindexar(self, slot: int):
+        perfil = self._perfiles[slot]
+        bit = 1 << slot
+        for indice, claves in ((self._por_skill, perfil["skills"]),
+                               (self._por_skill_lower, perfil["skills_lower"])):
+            for clave in claves:
+                restante = indice.get(clave, 0) & ~bit
+                if restante:
+                    indice[clave] = restante
+                else:
+                    indice.pop(clave, None)
+        self._activos &= ~bit
+
+    def upsert(self, perfil: dict):
+        """Agrega o reemplaza un candidato a partir de su documento de `perfiles`"""
+        email = perfil["email"]
+        slot = self._slots.get(email)
+        if slot is not None:
+            self._desindexar(slot)
+        elif self._libres:
+            slot = self._libres.pop()
+        else:
+            slot = len(self._perfiles)
+            self._perfiles.append(None)
+        self._slots[email] = slot
+        indexado = self._perfiles[slot] = perfil_indexado(perfil)
+
+        bit = 1 << slot
+        for skill in indexado["skills"]:
+            self._por_skill[skill] = self._por_skill.get(skill, 0) | bit
+        for clave in indexado["skills_lower"]:
+            self._por_skill_lower[clave] = self._por_skill_lower.get(clave, 0) | bit
+        if indexado["activo"]:
+            self._activos |= bit
+        self.version += 1
+
+    def eliminar(self, email: str):
+        slot = self._slots.pop(email, None)
+        if slot is None:
+            return
+        self._desindexar(slot)
+        self._perfiles[slot] = None
+        self._libres.append(slot)
+        self.version += 1
+
+    def emails(self) -> set:
+        return set(self._slots)
+
+    def perfiles(self) -> List[dict]:
+        """Snapshot de los perfiles indexados (los dicts no se mutan, se reemplazan en cada upsert)"""
+        return [p for p in self._perfiles if p is not None]
+
+    def top_k(self, skills: Iterable[str], k: int, min_match: int = 1,
+              solo_activos: bool = False, ignorar_mayusculas: bool = False) -> List[dict]:
+        """
+        Devuelve hasta k candidatos ordenados por cantidad de skills en común (desc) y email (asc).
+        Cada resultado: {email, nombre, seniority, skills_matched, match_count}.
+        """
+        if ignorar_mayusculas:
+            consulta = list(dict.fromkeys(s.lower() for s in skills))
+            indice = self._por_skill_lower
+        else:
+            consulta = list(dict.fromkeys(skills))
+            indice = self._por_skill
+        bitsets = [indice.get(skill, 0) for skill in consulta]
+
+        # Contador bit-sliced: planos[i] tiene el bit i del conteo de cada candidato
+        planos: List[int] = []
+        universo = 0
+        for acarreo in bitsets:
+            universo |= acarreo
+            i = 0
+            while acarreo:
+                if i == len(planos):
+                    planos.append(acarreo)
+                    break
+                planos[i], acarreo = planos[i] ^ acarreo, planos[i] & acarreo
+                i += 1
+        if solo_activos:
+            universo &= self._activos
+
+        resultados = []
+        for conteo in range(len(bitsets), max(min_match, 1) - 1, -1):
+            if conteo >> len(planos):
+                continue
+            mascara = universo
+            for i, plano in enumerate(planos):
+                mascara &= plano if (conteo >> i) & 1 else ~plano
+            if not mascara:
+                continue
+
+            empatados = sorted((self._perfiles[slot] for slot in _bits(mascara)), key=lambda p: p["email"])
+            for perfil in empatados[:k - len(resultados)]:
+                if ignorar_mayusculas:
+                    matched = [perfil["skills_lower"][s] for s in consulta if s in perfil["skills_lower"]]
+                else:
+                    matched = [s for s in consulta if s in perfil["skills_set"]]
+                resultados.append({
+                    "email": perfil["email"],
+                    "nombre": perfil["nombre"],
+                    "seniority": perfil["seniority"],
+                    "skills_matched": matched,
+                    "match_count": conteo,
+                })
+            if len(resultados) >= k:
+                break
+        return resultados
+
+
+indice_skills = IndiceSkills()
+_indice_listo = False
+# Emails refrescados mientras se arma un índice nuevo (None si no hay reconstrucción en curso)
+_cambiados_durante_reconstruccion: Optional[set] = None
+
+PROYECCION_PERFIL = {"_id": 0, "email": 1, "nombre": 1, "seniority": 1, "skills": 1, "activo": 1}
+
+
+_matriz: Optional[MatrizSkills] = None
+_matriz_origen = (None, -1)
+_matriz_construida = 0.0
+_matriz_lock = asyncio.Lock()
+
+
+def usar_indice() -> bool:
+    """True si está configurado el motor en memoria y el índice ya terminó de cargarse"""
+    return MATCHING_ENGINE == "indice" and _indice_listo
+
+
+async def _matriz_vigente() -> MatrizSkills:
+    """
+    Matriz de scoring del índice vigente. Si el índice cambió se reconstruye en un thread,
+    como mucho una vez cada MATCHING_MATRIX_REFRESH segundos (mientras tanto se usa la anterior).
+    """
+    global _matriz, _matriz_origen, _matriz_construida
+
+    def vigente():
+        return _matriz is not None and (
+            _matriz_origen == (indice_skills, indice_skills.version)
+            or time.monotonic() - _matriz_construida < MATCHING_MATRIX_REFRESH
+        )
+
+    if vigente():
+        return _matriz
+    async with _matriz_lock:
+        if not vigente():
+            origen = (indice_skills, indice_skills.version)
+            _matriz = await asyncio.to_thread(MatrizSkills, origen[0].perfiles())
+            _matriz_origen = origen
+            _matriz_construida = time.monotonic()
+    return _matriz
+
+
+async def puntuar_candidatos(skills: Iterable[str], k: int, **opciones) -> List[dict]:
+    """Scoring ponderado (pesos, seniority, skills relacionados) sobre todos los candidatos del índice"""
+    matriz = await _matriz_vigente()
+    return matriz.puntuar(skills, k, **opciones)
+
+
+async def perfiles_desde_grafo(skills: Iterable[str]) -> List[dict]:
+    """
+    Motor Cypher: candidatos de Neo4j con alguno de estos skills (sin distinguir mayúsculas),
+    con todos sus skills, en el formato de un documento de `perfiles`.
+    """
+    consulta = list(dict.fromkeys(s.strip().lower() for s in skills if s and s.strip()))
+    if not consulta:
+        return []
+    async with neo4j_driver_async.session() as session:
+        result = await session.run(
+            """
+            MATCH (c:Candidato)-[:DOMINA]->(s:Skill)
+            WHERE toLower(s.nombre) IN $skills
+            WITH DISTINCT c
+            MATCH (c)-[:DOMINA]->(t:Skill)
+            RETURN c.id AS email, c.nombre AS nombre, c.seniority AS seniority,
+                   coalesce(c.activo, true) AS activo, collect(t.nombre) AS skills
+            """,
+            skills=consulta
+        )
+        return [dict(record) async for record in result]
+
+
+def _indice_de(perfiles: Iterable[dict]) -> IndiceSkills:
+    indice = IndiceSkills()
+    for perfil in perfiles:
+        indice.upsert(perfil)
+    return indice
+
+
+async def buscar_por_skills(skills: List[str], k: int, **opciones) -> List[dict]:
+    """Top-k por cantidad de skills en común (sin distinguir mayúsculas) con el motor configurado"""
+    if usar_indice():
+        indice = indice_skills
+    else:
+        indice = _indice_de(await perfiles_desde_grafo(skills))
+    return indice.top_k(skills, k, ignorar_mayusculas=True, **opciones)
+
+
+async def puntuar(skills: List[str], k: int, **opciones) -> List[dict]:
+    """Scoring ponderado (ver MatrizSkills.puntuar) con el motor configurado"""
+    if usar_indice():
+        return await puntuar_candidatos(skills, k, **opciones)
+    # Neo4j trae a todos los que pueden sumar score (skills pedidos o relacionados)
+    perfiles = await perfiles_desde_grafo(skills_con_relacionados(skills))
+    return MatrizSkills([perfil_indexado(p) for p in perfiles]).puntuar(skills, k, **opciones)
+
+
+async def reconstruir_indice():
+    """
+    Construye un índice nuevo desde `perfiles` y lo reemplaza de forma atómica.
+    El armado de los bitsets (CPU puro) corre en un thread para no frenar el event loop;
+    los perfiles que cambian mientras tanto se vuelven a leer sobre el índice nuevo.
+    """
+    global indice_skills, _indice_listo, _cambiados_durante_reconstruccion
+    _cambiados_durante_reconstruccion = set()
+    try:
+        cursor = mongo_db_async.perfiles.find({"email": {"$exists": True}}, PROYECCION_PERFIL)
+        perfiles = await cursor.to_list(length=None)
+        nuevo = await asyncio.to_thread(_indice_de, perfiles)
+        indice_skills = nuevo
+        _indice_listo = True
+    finally:
+        cambiados, _cambiados_durante_reconstruccion = _cambiados_durante_reconstruccion, None
+    await refrescar_candidatos(sorted(cambiados))
+    print(f"✅ Índice de matching cargado: {len(nuevo)} candidatos")
+
+
+async def reconciliar_indice() -> int:
+    """
+    Compara los emails del índice con los de `perfiles` (consulta cubierta por el índice de email)
+    y refresca solo los que difieren. Devuelve cuántos candidatos se refrescaron.
+    """
+    cursor = mongo_db_async.perfiles.find({"email": {"$exists": True}}, {"_id": 0, "email": 1})
+    emails = {perfil["email"] async for perfil in cursor}
+    diferencia = sorted(emails ^ indice_skills.emails())
+    await refrescar_candidatos(diferencia)
+    return len(diferencia)
+
+
+async def refrescar_candidato(email: str):
+    """Relee un perfil desde MongoDB y actualiza (o elimina) su entrada en el índice"""
+    if MATCHING_ENGINE != "indice":
+        return
+    if _cambiados_durante_reconstruccion is not None:
+        _cambiados_durante_reconstruccion.add(email)
+    perfil = await mongo_db_async.perfiles.find_one({"email": email}, PROYECCION_PERFIL)
+    if perfil:
+        indice_skills.upsert(perfil)
+    else:
+        indice_skills.eliminar(email)
+
+
+async def refrescar_candidatos(emails: List[str]):
+    """Versión por lote de refrescar_candidato (ej: importación masiva): una sola consulta $in"""
+    if MATCHING_ENGINE != "indice" or not emails:
+        return
+    if _cambiados_durante_reconstruccion is not None:
+        _cambiados_durante_reconstruccion.update(emails)
+    encontrados = set()
+    async for perfil in mongo_db_async.perfiles.find({"email": {"$in": emails}}, PROYECCION_PERFIL):
+        indice_skills.upsert(perfil)
+        encontrados.add(perfil["email"])
+    for email in set(emails) - encontrados:
+        indice_skills.eliminar(email)
+
+
+@al_cambiar("candidatos_importados")
+async def _refrescar_lote_por_evento(evento: dict):
+    await refrescar_candidatos(evento["emails"])
+
+
+@al_cambiar("candidato_creado")
+@al_cambiar("candidato_actualizado")
+@al_cambiar("perfil_modificado")
+async def _refrescar_por_evento(evento: dict):
+    await refrescar_candidato(evento["email"])
+
+
+async def mantener_indice(detener: Optional[asyncio.Event] = None):
+    """
+    Tarea de fondo: carga el índice al arrancar, lo reconcilia periódicamente y
+    solo lo reconstruye completo cada MATCHING_INDEX_REBUILD_INTERVAL segundos
+    """
+    if MATCHING_ENGINE != "indice":
+        return
+    detener = detener or asyncio.Event()
+    ultima_reconstruccion = None
+    while not detener.is_set():
+        try:
+            if ultima_reconstruccion is None or time.monotonic() - ultima_reconstruccion >= MATCHING_INDEX_REBUILD_INTERVAL:
+                await reconstruir_indice()
+                ultima_reconstruccion = time.monotonic()
+            else:
+                refrescados = await reconciliar_indice()
+                if refrescados:
+                    print(f"✅ Índice de matching reconciliado: {refrescados} candidatos refrescados")
+        except Exception as e:
+            print(f"⚠️ Error manteniendo el índice de matching: {e}")
+        try:
+            await asyncio.wait_for(detener.wait(), timeout=MATCHING_INDEX_RECONCILE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,142 @@
+import asyncio
+from pymongo.errors import OperationFailure
+from src.database_async import mongo_db_async, get_postgres_conn_async, close_async_clients
+
+# deploy/mongo/init.js y deploy/postgres/init.sql solo corren con un volumen nuevo: estas
+# migraciones llevan a una base existente al mismo estado. Son idempotentes (solo tocan
+# documentos/filas pendientes y los índices se crean si no existen); se ejecutan en cada
+# arranque de la API o a mano con: python -m src.migraciones
+
+# Recalcula skills_lower desde skills en el servidor (acepta también el formato viejo "a, b")
+RECALCULAR_SKILLS_LOWER = [{"$set": {"skills_lower": {"$setDifference": [
+    {"$map": {
+        "input": {"$switch": {
+            "branches": [
+                {"case": {"$isArray": "$skills"}, "then": "$skills"},
+                {"case": {"$eq": [{"$type": "$skills"}, "string"]}, "then": {"$split": ["$skills", ","]}},
+            ],
+            "default": []
+        }},
+        "as": "s",
+        "in": {"$toLower": {"$trim": {"input": "$$s"}}}
+    }},
+    [""]
+]}}}]
+
+# Clave canónica del par de usuarios (emails ordenados), igual que main.par_conexion
+_CALCULAR_PAR = [{"$set": {"par": {"$cond": [
+    {"$lt": ["$remitente_email", "$destinatario_email"]},
+    {"$concat": ["$remitente_email", "|", "$destinatario_email"]},
+    {"$concat": ["$destinatario_email", "|", "$remitente_email"]}
+]}}}]
+
+
+async def _migrar_skills_lower():
+    # Perfiles anteriores al campo y los que guardan skills como string separado por comas
+    resultado = await mongo_db_async.perfiles.update_many(
+        {"$or": [{"skills_lower": {"$exists": False}}, {"skills": {"$type": "string"}}]},
+        RECALCULAR_SKILLS_LOWER
+    )
+    await mongo_db_async.perfiles.create_index([("skills_lower", 1), ("email", 1)])
+    await mongo_db_async.perfiles.create_index([("skills_lower", 1), ("seniority", 1), ("email", 1)])
+    await mongo_db_async.perfiles.create_index([("seniority", 1), ("email", 1)])
+    return resultado.modified_count
+
+
+async def _migrar_par_solicitudes():
+    resultado = await mongo_db_async.solicitudes_conexion.update_many(
+        {"par": {"$exists": False}},
+        _CALCULAR_PAR
+    )
+    try:
+        await mongo_db_async.solicitudes_conexion.create_index(
+            [("par", 1)],
+            unique=True,
+            partialFilterExpression={"estado": {"$in": ["pendiente", "aceptada"]}}
+        )
+    except OperationFailure as e:
+        # Hay pares duplicados previos al índice: hay que resolverlos a mano (rechazar uno de cada par)
+        if e.code != 11000:
+            raise
+        print(f"⚠️ No se pudo crear el índice único de solicitudes (pares duplicados): {e}")
+    # Bandejas de entrada/salida y red de contactos (paginadas por _id)
+    await mongo_db_async.solicitudes_conexion.create_index([("destinatario_email", 1), ("estado", 1), ("_id", -1)])
+    await mongo_db_async.solicitudes_conexion.create_index([("remitente_email", 1), ("estado", 1), ("_id", -1)])
+    return resultado.modified_count
+
+
+async def _migrar_indices_ofertas():
+    # Listado, filtros y facetas de /ofertas/buscar (siempre filtran por estado; el cursor recorre _id)
+    ofertas = mongo_db_async.ofertas
+    await ofertas.create_index([("estado", 1), ("_id", -1)])
+    await ofertas.create_index([("estado", 1), ("modalidad", 1), ("_id", -1)])
+    await ofertas.create_index([("estado", 1), ("ubicacion", 1), ("_id", -1)])
+    await ofertas.create_index([("estado", 1), ("tipo_contrato", 1), ("_id", -1)])
+    await ofertas.create_index([("estado", 1), ("salario", 1)])
+    # $text exige este índice (solo se admite uno de texto por colección)
+    await ofertas.create_index(
+        [("estado", 1), ("titulo", "text"), ("requisitos", "text"), ("descripcion", "text")],
+        name="ofertas_texto",
+        weights={"titulo": 10, "requisitos": 5, "descripcion": 1},
+        default_language="spanish"
+    )
+    return 0
+
+
+async def _migrar_procesos():
+    # updated_at forma parte del cursor del listado de procesos: no puede ser NULL
+    async with get_postgres_conn_async() as conn:
+        async with conn.transaction():
+            resultado = await conn.execute("UPDATE procesos SET updated_at = now() WHERE updated_at IS NULL")
+            await conn.execute("ALTER TABLE procesos ALTER COLUMN updated_at SET NOT NULL")
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_procesos_fecha ON procesos (updated_at DESC, id DESC)"
+        )
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_procesos_candidato_fecha ON procesos (candidato_id, updated_at DESC, id DESC)"
+        )
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_procesos_estado_fecha ON procesos (estado, updated_at DESC, id DESC)"
+        )
+    # asyncpg devuelve el status del comando: "UPDATE <filas>"
+    return int(resultado.split()[-1])
+
+
+async def _migrar_indices_outbox():
+    # Sin este índice la limpieza de eventos procesados recorre toda la tabla
+    async with get_postgres_conn_async() as conn:
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_outbox_procesados ON outbox (procesado_at) WHERE estado = 'procesado'"
+        )
+    return 0
+
+
+MIGRACIONES = {
+    "perfiles.skills_lower": _migrar_skills_lower,
+    "solicitudes_conexion.par": _migrar_par_solicitudes,
+    "ofertas.indices": _migrar_indices_ofertas,
+    "procesos.updated_at": _migrar_procesos,
+    "outbox.indices": _migrar_indices_outbox,
+}
+
+
+async def migrar():
+    """Aplica todas las migraciones; un error en una no impide las demás ni el arranque"""
+    for nombre, migracion in MIGRACIONES.items():
+        try:
+            modificados = await migracion()
+            if modificados:
+                print(f"✅ Migración {nombre}: {modificados} documentos actualizados")
+        except Exception as e:
+            print(f"⚠️ Error en la migración {nombre}: {e}")
+
+
+async def _main():
+    try:
+        await migrar()
+    finally:
+        await close_async_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class ExperienciaLaboral(BaseModel):
@@ -32,6 +32,7 @@ class MatchingRequest(BaseModel):
     puesto: str
     skills_requeridos: List[str]
     seniority_minimo: Optional[str] = None
+    pesos: Optional[Dict[str, float]] = None  # Peso por skill (default 1)
 
 class Curso(BaseModel):
     codigo: str
@@ -73,6 +74,7 @@ class OfertaLaboral(BaseModel):
     estado: str = "abierta"  # abierta, cerrada, pausada
     fecha_publicacion: datetime = datetime.now()
     seniority_minimo: Optional[str] = None  # junior, semi-senior, senior
+    skills_pesos: Optional[Dict[str, float]] = None  # Peso de cada skill en el matching (default 1)
 
 class Entrevista(BaseModel):
     proceso_id: str
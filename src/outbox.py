@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import asyncio
+from typing import Dict, Iterable, List, Callable, Awaitable, Optional, Tuple
+from psycopg2.extras import execute_values
+from src.database import get_postgres_conn
+from src.database_async import get_postgres_conn_async, mongo_db_async
+
+# Eventos por lote que reclama el worker en cada vuelta
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+# Segundos entre consultas cuando el outbox está vacío
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "0.5"))
+# Intentos antes de marcar un evento como 'fallido'
+OUTBOX_MAX_INTENTOS = int(os.getenv("OUTBOX_MAX_INTENTOS", "8"))
+# Backoff exponencial: base * 2^(intentos-1), con tope
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "1"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "300"))
+# Un evento 'procesando' más viejo que esto se considera abandonado (worker caído) y se reintenta.
+# El worker renueva el lease del resto del lote antes de cada evento, y cada manejador tiene
+# un deadline menor al lease: un lote lento nunca lo vence mientras el worker sigue vivo.
+OUTBOX_LOCK_TIMEOUT = float(os.getenv("OUTBOX_LOCK_TIMEOUT", "60"))
+OUTBOX_EVENTO_TIMEOUT = min(float(os.getenv("OUTBOX_EVENTO_TIMEOUT", "30")), OUTBOX_LOCK_TIMEOUT / 2)
+# Días que se conservan los eventos procesados (para auditoría) antes de borrarlos
+OUTBOX_RETENCION_DIAS = float(os.getenv("OUTBOX_RETENCION_DIAS", "7"))
+# Segundos entre limpiezas de eventos procesados, y filas que borra cada DELETE
+OUTBOX_LIMPIEZA_INTERVAL = float(os.getenv("OUTBOX_LIMPIEZA_INTERVAL", "3600"))
+OUTBOX_LIMPIEZA_LOTE = int(os.getenv("OUTBOX_LIMPIEZA_LOTE", "5000"))
+# Segundos entre barridas de eventos que quedaron embebidos en documentos de MongoDB
+OUTBOX_RELEVO_INTERVAL = float(os.getenv("OUTBOX_RELEVO_INTERVAL", "5"))
+
+# MongoDB no tiene transacciones con PostgreSQL (ni en un servidor standalone): las escrituras
+# principales en Mongo guardan sus eventos en este campo del mismo documento (una sola escritura
+# atómica) y después se relevan al outbox de PostgreSQL.
+CAMPO_EVENTOS = "_eventos"
+# Colecciones cuyos documentos pueden llevar eventos pendientes de relevo
+COLECCIONES_CON_EVENTOS = ("perfiles", "ofertas", "solicitudes_conexion")
+
+# tipo de evento -> coroutine que aplica los efectos secundarios (debe ser idempotente)
+_manejadores: Dict[str, Callable[[dict], Awaitable[None]]] = {}
+
+
+def registrar_manejador(tipo: str):
+    """Decorador para asociar un tipo de evento del outbox con su manejador"""
+    def decorador(func):
+        _manejadores[tipo] = func
+        return func
+    return decorador
+
+
+def encolar_evento(tipo: str, payload: dict, cursor=None):
+    """
+    Escribe un evento en el outbox.
+    Si se pasa el cursor de la escritura principal, el evento queda en la misma
+    transacción (se confirma o se descarta junto con ella); si no, usa su propia conexión.
+    """
+    query = "INSERT INTO outbox (tipo, payload) VALUES (%s, %s)"
+    params = (tipo, json.dumps(payload, default=str))
+
+    if cursor is not None:
+        cursor.execute(query, params)
+        return
+
+    with get_postgres_conn() as conn, conn.cursor() as own_cursor:
+        own_cursor.execute(query, params)
+        conn.commit()
+
+
+def encolar_eventos(eventos: Iterable[Tuple[str, dict]], cursor=None):
+    """Igual que encolar_evento pero para muchos eventos (tipo, payload) en un solo INSERT (execute_values)"""
+    valores = [(tipo, json.dumps(payload, default=str)) for tipo, payload in eventos]
+    if not valores:
+        return
+    query = "INSERT INTO outbox (tipo, payload) VALUES %s"
+
+    if cursor is not None:
+        execute_values(cursor, query, valores, page_size=1000)
+        return
+
+    with get_postgres_conn() as conn, conn.cursor() as own_cursor:
+        execute_values(own_cursor, query, valores, page_size=1000)
+        conn.commit()
+
+
+def eventos_embebidos(*eventos: Tuple[str, dict]) -> List[dict]:
+    """Eventos (tipo, payload) en el formato que se guarda en CAMPO_EVENTOS de un documento"""
+    return [{"tipo": tipo, "payload": payload} for tipo, payload in eventos]
+
+
+async def relevar_eventos(coleccion: str, filtro: dict) -> int:
+    """
+    Pasa al outbox de PostgreSQL los eventos embebidos en el documento y los quita de él.
+    Si algo falla los eventos siguen en el documento y la barrida periódica los reintenta
+    (entrega al menos una vez: los manejadores son idempotentes). Devuelve cuántos relevó.
+    """
+    documentos = mongo_db_async[coleccion]
+    documento = await documentos.find_one({**filtro, CAMPO_EVENTOS: {"$exists": True}}, {CAMPO_EVENTOS: 1})
+    if not documento:
+        return 0
+    eventos = documento[CAMPO_EVENTOS]
+    await asyncio.to_thread(encolar_eventos, [(e["tipo"], e["payload"]) for e in eventos])
+    # Solo se quitan los relevados: si mientras tanto se agregó otro evento, queda para la próxima
+    await documentos.update_one({"_id": documento["_id"]}, {"$pull": {CAMPO_EVENTOS: {"$in": eventos}}})
+    await documentos.update_one({"_id": documento["_id"], CAMPO_EVENTOS: {"$size": 0}},
+                                {"$unset": {CAMPO_EVENTOS: ""}})
+    return len(eventos)
+
+
+async def relevar_pendientes(detener: Optional[asyncio.Event] = None):
+    """Loop de fondo: releva los eventos que quedaron en documentos de Mongo (ej: Postgres estaba caído)"""
+    detener = detener or asyncio.Event()
+    while not detener.is_set():
+        for coleccion in COLECCIONES_CON_EVENTOS:
+            try:
+                async for documento in mongo_db_async[coleccion].find({CAMPO_EVENTOS: {"$exists": True}}, {"_id": 1}):
+                    await relevar_eventos(coleccion, {"_id": documento["_id"]})
+            except Exception as e:
+                print(f"⚠️ Outbox: error relevando eventos de {coleccion}: {e}")
+        try:
+            await asyncio.wait_for(detener.wait(), timeout=OUTBOX_RELEVO_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _reclamar_lote(conn) -> list:
+    """Marca como 'procesando' un lote de eventos listos; SKIP LOCKED permite varios workers"""
+    return await conn.fetch(
+        """
+        UPDATE outbox
+        SET estado = 'procesando', locked_at = now(), intentos = intentos + 1
+        WHERE id IN (
+            SELECT id FROM outbox
+            WHERE (estado = 'pendiente' AND proximo_intento <= now())
+               OR (estado = 'procesando' AND locked_at < now() - make_interval(secs => $2))
+            ORDER BY id
+            LIMIT $1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, tipo, payload, intentos
+        """,
+        OUTBOX_BATCH_SIZE,
+        OUTBOX_LOCK_TIMEOUT
+    )
+
+
+async def _renovar_lease(ids: List[int]):
+    """Extiende el lease de los eventos del lote que todavía no se procesaron"""
+    async with get_postgres_conn_async() as conn:
+        await conn.execute(
+            "UPDATE outbox SET locked_at = now() WHERE id = ANY($1::bigint[]) AND estado = 'procesando'",
+            ids
+        )
+
+
+def _backoff(intentos: int) -> float:
+    return min(OUTBOX_BACKOFF_BASE * (2 ** (intentos - 1)), OUTBOX_BACKOFF_MAX)
+
+
+async def procesar_lote() -> int:
+    """Procesa un lote del outbox. Devuelve cuántos eventos se reclamaron."""
+    async with get_postgres_conn_async() as conn:
+        eventos = await _reclamar_lote(conn)
+
+    if not eventos:
+        return 0
+
+    procesados = []
+    eventos = sorted(eventos, key=lambda e: e["id"])
+    for i, evento in enumerate(eventos):
+        manejador = _manejadores.get(evento["tipo"])
+        try:
+            if i:
+                await _renovar_lease([e["id"] for e in eventos[i:]])
+            if manejador is None:
+                raise RuntimeError(f"Sin manejador para el evento '{evento['tipo']}'")
+            await asyncio.wait_for(manejador(json.loads(evento["payload"])), timeout=OUTBOX_EVENTO_TIMEOUT)
+            procesados.append(evento["id"])
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                e = RuntimeError(f"timeout tras {OUTBOX_EVENTO_TIMEOUT}s")
+            fallido = evento["intentos"] >= OUTBOX_MAX_INTENTOS
+            print(f"⚠️ Outbox: evento {evento['id']} ({evento['tipo']}) falló "
+                  f"[intento {evento['intentos']}]: {e}")
+            async with get_postgres_conn_async() as conn:
+                await conn.execute(
+                    """
+                    UPDATE outbox
+                    SET estado = $2,
+                        ultimo_error = $3,
+                        locked_at = NULL,
+                        proximo_intento = now() + make_interval(secs => $4)
+                    WHERE id = $1
+                    """,
+                    evento["id"],
+                    "fallido" if fallido else "pendiente",
+                    str(e),
+                    _backoff(evento["intentos"])
+                )
+
+    if procesados:
+        async with get_postgres_conn_async() as conn:
+            await conn.execute(
+                """
+                UPDATE outbox
+                SET estado = 'procesado', procesado_at = now(), locked_at = NULL, ultimo_error = NULL
+                WHERE id = ANY($1::bigint[])
+                """,
+                procesados
+            )
+
+    return len(eventos)
+
+
+async def limpiar_procesados() -> int:
+    """Borra, por lotes, los eventos procesados hace más de OUTBOX_RETENCION_DIAS. Devuelve cuántos borró."""
+    borrados = 0
+    while True:
+        async with get_postgres_conn_async() as conn:
+            resultado = await conn.execute(
+                """
+                DELETE FROM outbox
+                WHERE id IN (
+                    SELECT id FROM outbox
+                    WHERE estado = 'procesado' AND procesado_at < now() - make_interval(days => $1)
+                    LIMIT $2
+                )
+                """,
+                OUTBOX_RETENCION_DIAS,
+                OUTBOX_LIMPIEZA_LOTE
+            )
+        # asyncpg devuelve el status del comando: "DELETE <filas>"
+        filas = int(resultado.split()[-1])
+        borrados += filas
+        if filas < OUTBOX_LIMPIEZA_LOTE:
+            return borrados
+
+
+async def outbox_worker(detener: Optional[asyncio.Event] = None):
+    """
+    Loop de fondo que drena el outbox hasta que se active `detener`.
+    Cada OUTBOX_LIMPIEZA_INTERVAL segundos borra los eventos procesados que superaron la retención.
+    Los errores de infraestructura (ej: Postgres caído) se registran y se reintenta.
+    """
+    detener = detener or asyncio.Event()
+    ultima_limpieza = 0.0
+    while not detener.is_set():
+        if time.monotonic() - ultima_limpieza >= OUTBOX_LIMPIEZA_INTERVAL:
+            ultima_limpieza = time.monotonic()
+            try:
+                borrados = await limpiar_procesados()
+                if borrados:
+                    print(f"✅ Outbox: {borrados} eventos procesados eliminados")
+            except Exception as e:
+                print(f"⚠️ Outbox: error limpiando eventos procesados: {e}")
+        try:
+            reclamados = await procesar_lote()
+        except Exception as e:
+            print(f"⚠️ Outbox worker: {e}")
+            reclamados = 0
+
+        # Si el lote vino lleno probablemente queden más: seguir sin esperar
+        if reclamados < OUTBOX_BATCH_SIZE:
+            try:
+                await asyncio.wait_for(detener.wait(), timeout=OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
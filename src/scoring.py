@@ -0,0 +1,170 @@
+import os
+import json
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+# Crédito que recibe un candidato por un skill relacionado (ej: TypeScript cuando se pide JavaScript)
+MATCHING_CREDITO_PARCIAL = float(os.getenv("MATCHING_CREDITO_PARCIAL", "0.5"))
+# Bonus multiplicativo por cada nivel de seniority por encima del mínimo pedido
+MATCHING_BOOST_SENIORITY = float(os.getenv("MATCHING_BOOST_SENIORITY", "0.05"))
+
+# Orden de los niveles (perfiles usan "Semi-Senior", las ofertas "semi-senior")
+NIVELES_SENIORITY = {"junior": 0, "semi-senior": 1, "senior": 2, "lead": 3}
+
+# Familias de skills relacionados entre sí; se puede reemplazar con MATCHING_SKILLS_RELACIONADAS (JSON: lista de listas)
+_GRUPOS_RELACIONADOS = [
+    ["javascript", "typescript", "node.js", "nodejs"],
+    ["react", "react native", "next.js", "vue", "angular"],
+    ["python", "django", "flask", "fastapi"],
+    ["java", "kotlin", "spring", "spring boot"],
+    ["postgresql", "mysql", "sql server", "sqlite", "sql"],
+    ["mongodb", "dynamodb", "couchdb"],
+    ["docker", "kubernetes", "podman"],
+    ["aws", "gcp", "azure"],
+]
+
+
+def _cargar_relacionados() -> Dict[str, List[str]]:
+    grupos = _GRUPOS_RELACIONADOS
+    configurado = os.getenv("MATCHING_SKILLS_RELACIONADAS")
+    if configurado:
+        try:
+            grupos = json.loads(configurado)
+        except ValueError as e:
+            print(f"⚠️ MATCHING_SKILLS_RELACIONADAS inválido, se usan los grupos por defecto: {e}")
+    relacionados: Dict[str, List[str]] = {}
+    for grupo in grupos:
+        grupo = [s.strip().lower() for s in grupo if s and s.strip()]
+        for skill in grupo:
+            relacionados.setdefault(skill, []).extend(s for s in grupo if s != skill)
+    return relacionados
+
+
+SKILLS_RELACIONADOS = _cargar_relacionados()
+
+
+def skills_con_relacionados(skills: Iterable[str]) -> List[str]:
+    """Skills pedidos (en minúsculas) más sus relacionados: los que pueden aportar score"""
+    resultado: Dict[str, bool] = {}
+    for skill in skills:
+        skill = skill.strip().lower()
+        if not skill:
+            continue
+        resultado[skill] = True
+        resultado.update(dict.fromkeys(SKILLS_RELACIONADOS.get(skill, ()), True))
+    return list(resultado)
+
+
+def nivel_seniority(seniority: Optional[str]) -> int:
+    """Nivel numérico del seniority (-1 si no se informó o no se reconoce)"""
+    if not seniority:
+        return -1
+    return NIVELES_SENIORITY.get(seniority.strip().lower().replace(" ", "-"), -1)
+
+
+def niveles_desde(seniority_minimo: Optional[str]) -> Optional[List[str]]:
+    """Nombres (en minúsculas) de los niveles que cumplen el mínimo; None si no hay mínimo"""
+    minimo = nivel_seniority(seniority_minimo)
+    if minimo < 0:
+        return None
+    return [nombre for nombre, nivel in NIVELES_SENIORITY.items() if nivel >= minimo]
+
+
+class MatrizSkills:
+    """
+    Matriz dispersa candidatos x skills en formato columnar (skill -> array de filas),
+    para puntuar a todos los candidatos de una vez con NumPy.
+    Las filas están ordenadas por email, así el índice de fila sirve de desempate.
+    Es inmutable: se reconstruye a partir de los perfiles del índice en memoria.
+    """
+
+    def __init__(self, perfiles: Iterable[dict]):
+        self._perfiles = sorted(perfiles, key=lambda p: p["email"])
+        self.niveles = np.array([nivel_seniority(p["seniority"]) for p in self._perfiles], dtype=np.int8)
+        self.activos = np.array([p["activo"] for p in self._perfiles], dtype=bool)
+
+        filas: Dict[str, List[int]] = {}
+        for fila, perfil in enumerate(self._perfiles):
+            for skill in perfil["skills_lower"]:
+                filas.setdefault(skill, []).append(fila)
+        self._columnas = {skill: np.array(f, dtype=np.int32) for skill, f in filas.items()}
+
+    def __len__(self):
+        return len(self._perfiles)
+
+    def puntuar(self, skills: Iterable[str], k: int, pesos: Optional[Dict[str, float]] = None,
+                seniority_minimo: Optional[str] = None, solo_activos: bool = False,
+                min_cobertura: float = 0.0, min_exactos: int = 0) -> List[dict]:
+        """
+        Score de cada candidato = suma ponderada del crédito por skill requerido / suma de pesos
+        (1 si tiene el skill, MATCHING_CREDITO_PARCIAL si solo tiene uno relacionado).
+        Con seniority_minimo se descarta a quien no llega y se bonifica a quien lo supera.
+        min_exactos exige esa cantidad de skills pedidos que el candidato tenga exactamente.
+        Devuelve los k mejores: {email, nombre, seniority, skills_matched, match_count, cobertura, score}.
+        """
+        pesos = {s.strip().lower(): float(p) for s, p in (pesos or {}).items()}
+        requeridos = list(dict.fromkeys(s.strip().lower() for s in skills if s and s.strip()))
+        n = len(self._perfiles)
+        if not requeridos or not n:
+            return []
+
+        puntaje = np.zeros(n, dtype=np.float32)
+        exactos = np.zeros(n, dtype=np.int16)
+        total = 0.0
+        for skill in requeridos:
+            peso = pesos.get(skill, 1.0)
+            if peso <= 0:
+                continue
+            total += peso
+            columna = self._columnas.get(skill)
+            relacionadas = [self._columnas[r] for r in SKILLS_RELACIONADOS.get(skill, ()) if r in self._columnas]
+            if relacionadas:
+                # Se asigna primero el crédito parcial y después el exacto: cada candidato suma el mayor
+                credito = np.zeros(n, dtype=np.float32)
+                for filas in relacionadas:
+                    credito[filas] = MATCHING_CREDITO_PARCIAL
+                if columna is not None:
+                    credito[columna] = 1.0
+                puntaje += peso * credito
+            elif columna is not None:
+                puntaje[columna] += peso
+            if columna is not None:
+                exactos[columna] += 1
+        if total <= 0:
+            return []
+
+        cobertura = puntaje / total
+        mascara = cobertura > 0
+        if min_cobertura > 0:
+            mascara &= cobertura >= np.float32(min_cobertura) - np.float32(1e-6)
+        if min_exactos > 0:
+            mascara &= exactos >= min_exactos
+        if solo_activos:
+            mascara &= self.activos
+
+        score = cobertura
+        minimo = nivel_seniority(seniority_minimo)
+        if minimo >= 0:
+            mascara &= self.niveles >= minimo
+            score = cobertura * (1 + MATCHING_BOOST_SENIORITY * np.clip(self.niveles - minimo, 0, None))
+
+        candidatos = np.flatnonzero(mascara)
+        if len(candidatos) > k:
+            # Umbral del k-ésimo mejor; se conservan todos los empatados para desempatar por email
+            umbral = np.partition(score[candidatos], len(candidatos) - k)[len(candidatos) - k]
+            candidatos = candidatos[score[candidatos] >= umbral]
+        orden = candidatos[np.lexsort((candidatos, -score[candidatos]))][:k]
+
+        resultados = []
+        for fila in orden.tolist():
+            perfil = self._perfiles[fila]
+            resultados.append({
+                "email": perfil["email"],
+                "nombre": perfil["nombre"],
+                "seniority": perfil["seniority"],
+                "skills_matched": [perfil["skills_lower"][s] for s in requeridos if s in perfil["skills_lower"]],
+                "match_count": int(exactos[fila]),
+                "cobertura": float(cobertura[fila]),
+                "score": round(float(score[fila]), 4),
+            })
+        return resultados
@@ -0,0 +1,49 @@
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from src.database_async import get_postgres_conn_async
+from src.cache import Politica, leer_o_calcular_muchos, invalidar_claves
+
+# Directorio de usuarios: nombre/rol/alta por email, cacheado en Redis y en memoria de cada worker
+USUARIOS_CACHE_TTL = int(os.getenv("USUARIOS_CACHE_TTL", "600"))
+_POLITICA = Politica(ttl=USUARIOS_CACHE_TTL, ttl_ausente=60, ttl_local=60)
+
+
+def _clave(email: str) -> str:
+    return f"usuario:{email}"
+
+
+async def _consultar(emails: list) -> Dict[str, dict]:
+    async with get_postgres_conn_async() as conn:
+        filas = await conn.fetch(
+            "SELECT email, nombre, rol, created_at FROM usuarios WHERE email = ANY($1::text[])",
+            emails
+        )
+    return {
+        fila["email"]: {
+            "email": fila["email"],
+            "nombre": fila["nombre"],
+            "rol": fila["rol"],
+            "created_at": fila["created_at"].isoformat() if isinstance(fila["created_at"], datetime) else None
+        }
+        for fila in filas
+    }
+
+
+async def obtener_usuarios(emails: Iterable[str]) -> Dict[str, dict]:
+    """
+    Resuelve muchos usuarios de una vez: {email: {email, nombre, rol, created_at}}.
+    Los emails inexistentes no aparecen en el resultado. A lo sumo un MGET y una consulta a PostgreSQL.
+    """
+    usuarios = await leer_o_calcular_muchos(emails, _clave, _POLITICA, _consultar)
+    return {email: usuario for email, usuario in usuarios.items() if usuario is not None}
+
+
+async def obtener_usuario(email: str) -> Optional[dict]:
+    """Un usuario del directorio, o None si no existe"""
+    return (await obtener_usuarios([email])).get(email)
+
+
+async def invalidar_usuarios(*emails: str):
+    """Llamar al registrar un usuario o modificar su nombre/rol"""
+    await invalidar_claves([_clave(email) for email in emails])
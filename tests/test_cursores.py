@@ -0,0 +1,36 @@
+"""
+Cursores de paginación keyset (main._codificar_cursor / _decodificar_cursor).
+Importar src.main no conecta a ninguna base: no hace falta tenerlas levantadas.
+"""
+import pytest
+from fastapi import HTTPException
+from src.main import _codificar_cursor, _decodificar_cursor
+
+
+@pytest.mark.parametrize("partes", [
+    ("ana@test.com",),
+    ("2024-05-01T10:00:00+00:00", 42),
+    ("0.75", "665f1c2e9b1e8a0012345678"),
+])
+def test_ida_y_vuelta(partes):
+    cursor = _codificar_cursor(*partes)
+    assert _decodificar_cursor(cursor, len(partes)) == [str(p) for p in partes]
+
+
+def test_es_seguro_en_urls():
+    # Emails y fechas generan "+" y "/" en base64 estándar
+    cursor = _codificar_cursor("ñandú+?>>@test.com", "2024-05-01T10:00:00+00:00")
+    assert not set(cursor) & {"+", "/"}
+
+
+@pytest.mark.parametrize("cursor,cantidad", [
+    ("no es base64!", 1),
+    ("%%%", 2),
+    (_codificar_cursor("a", "b"), 1),
+    (_codificar_cursor("a"), 2),
+    ("//8=", 1),  # bytes que no son UTF-8
+])
+def test_cursor_invalido_es_400(cursor, cantidad):
+    with pytest.raises(HTTPException) as error:
+        _decodificar_cursor(cursor, cantidad)
+    assert error.value.status_code == 400
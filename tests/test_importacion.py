@@ -0,0 +1,166 @@
+"""
+Reporte de errores por fila de la importación masiva (src.importacion): parseo de NDJSON/CSV,
+validación con el modelo Candidato y filas rechazadas por MongoDB. Las bases se reemplazan
+por dobles en memoria.
+"""
+import asyncio
+import json
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from src import importacion
+from src.importacion import _Reporte, filas_csv, filas_ndjson, lineas, CAMPO_EVENTOS
+
+
+async def _lista(iterable):
+    return [x async for x in iterable]
+
+
+async def _texto(*lineas_):
+    for linea in lineas_:
+        yield linea
+
+
+def _filas(lector, *lineas_):
+    return asyncio.run(_lista(lector(_texto(*lineas_))))
+
+
+def test_lineas_parte_chunks_sin_cortar_caracteres():
+    async def chunks():
+        datos = "ñandú\r\nsegunda\n\núltima".encode()
+        for i in range(0, len(datos), 3):
+            yield datos[i:i + 3]
+
+    assert asyncio.run(_lista(lineas(chunks()))) == ["ñandú", "segunda", "", "última"]
+
+
+def test_ndjson_reporta_filas_invalidas_con_su_numero():
+    filas = _filas(filas_ndjson, '{"email": "a@test.com"}', "", "{roto", "[1, 2]")
+    assert filas[0] == (1, {"email": "a@test.com"}, None)
+    assert filas[1][0] == 3 and filas[1][1] is None and filas[1][2].startswith("JSON inválido")
+    assert filas[2] == (4, None, "Se esperaba un objeto JSON por línea")
+
+
+def test_csv_normaliza_skills_y_reporta_columnas_de_mas():
+    filas = _filas(
+        filas_csv,
+        "Nombre,Email,Seniority,Skills",
+        'Ana,ana@test.com,Senior,"Python; Docker"',
+        "Beto,beto@test.com,,",
+        "Carla,carla@test.com,Junior,Go,extra",
+    )
+    assert filas[0] == (2, {"nombre": "Ana", "email": "ana@test.com", "seniority": "Senior",
+                            "skills": ["Python", "Docker"]}, None)
+    assert filas[1] == (3, {"nombre": "Beto", "email": "beto@test.com"}, None)
+    assert filas[2] == (4, None, "Se esperaban 4 columnas y hay 5")
+
+
+def test_reporte_cuenta_todos_los_errores_pero_guarda_hasta_el_maximo(monkeypatch):
+    monkeypatch.setattr(importacion, "IMPORT_MAX_ERRORES", 2)
+    reporte = _Reporte()
+    for fila in range(5):
+        reporte.error(fila, None, "mal")
+    assert reporte.cantidad_errores == 5
+    assert [e["fila"] for e in reporte.errores] == [0, 1]
+
+
+class _PerfilesFalsos:
+    def __init__(self, existentes=()):
+        self.existentes = set(existentes)
+        self.insertados = []
+
+    async def insert_many(self, documentos, ordered=True):
+        errores = []
+        for i, documento in enumerate(documentos):
+            documento["_id"] = ObjectId()
+            if documento["email"] in self.existentes:
+                errores.append({"index": i, "code": 11000, "errmsg": "E11000 duplicate key"})
+            else:
+                self.insertados.append(documento)
+        if errores:
+            raise BulkWriteError({"writeErrors": errores})
+
+
+class _MongoFalso:
+    def __init__(self, perfiles):
+        self.perfiles = perfiles
+
+
+@pytest.fixture
+def stores(monkeypatch):
+    perfiles = _PerfilesFalsos(existentes={"existe@test.com"})
+    sincronizados, quitados = [], []
+
+    async def sincronizar(operaciones):
+        for operacion in operaciones.values():
+            operacion.close()
+        sincronizados.append(len(operaciones))
+        return {store: {"ok": True, "error": None} for store in operaciones}
+
+    async def quitar_eventos(ids):
+        quitados.extend(ids)
+
+    monkeypatch.setattr(importacion, "mongo_db_async", _MongoFalso(perfiles))
+    monkeypatch.setattr(importacion, "sincronizar_en_paralelo", sincronizar)
+    monkeypatch.setattr(importacion, "_quitar_eventos", quitar_eventos)
+    return perfiles, sincronizados, quitados
+
+
+def test_lote_reporta_cada_fila_rechazada(stores):
+    perfiles, sincronizados, quitados = stores
+    filas = [
+        (1, {"nombre": "Ana", "email": "ana@test.com", "skills": ["Python"]}, None),
+        (2, None, "JSON inválido: ..."),
+        (3, {"nombre": "Sin email"}, None),
+        (4, {"nombre": "Mal", "email": "no-es-un-email"}, None),
+        (5, {"nombre": "Ana otra vez", "email": "ana@test.com"}, None),
+        (6, {"nombre": "Existe", "email": "existe@test.com"}, None),
+        (7, {"nombre": "Beto", "email": "beto@test.com", "skills": ["Go", "Go", ""]}, None),
+    ]
+    reporte = _Reporte()
+    asyncio.run(importacion._importar_lote(filas, reporte))
+
+    assert reporte.procesadas == 7
+    assert reporte.importadas == 2
+    errores = {e["fila"]: e for e in reporte.errores}
+    assert sorted(errores) == [2, 3, 4, 5, 6]
+    assert errores[2]["error"] == "JSON inválido: ..."
+    assert errores[3]["email"] is None and errores[3]["error"].startswith("email:")
+    assert errores[4]["email"] == "no-es-un-email"
+    assert errores[5] == {"fila": 5, "email": "ana@test.com", "error": "Email repetido en el lote"}
+    assert errores[6] == {"fila": 6, "email": "existe@test.com", "error": "El email ya existe"}
+
+    # Cada perfil viaja con su evento de alta; tras sincronizar se quitan solo de los insertados
+    beto = next(d for d in perfiles.insertados if d["email"] == "beto@test.com")
+    assert [e["tipo"] for e in beto[CAMPO_EVENTOS]] == ["candidato_creado", "matches_candidato"]
+    assert beto[CAMPO_EVENTOS][0]["payload"] == {
+        "email": "beto@test.com", "nombre": "Beto", "seniority": "Junior", "skills": ["Go"]
+    }
+    assert sincronizados == [3]
+    assert quitados == [d["_id"] for d in perfiles.insertados]
+    assert reporte.pendientes_sincronizacion == 0
+
+
+def test_lote_sin_filas_validas_no_escribe(stores):
+    perfiles, sincronizados, _ = stores
+    reporte = _Reporte()
+    asyncio.run(importacion._importar_lote([(1, None, "roto")], reporte))
+    assert reporte.cantidad_errores == 1
+    assert not perfiles.insertados and not sincronizados
+
+
+def test_importar_candidatos_arma_el_reporte(stores, monkeypatch):
+    async def sin_ofertas(skills):
+        return []
+
+    monkeypatch.setattr(importacion, "ofertas_con_skills", sin_ofertas)
+    monkeypatch.setattr(importacion, "IMPORT_LOTE", 2)
+    lineas_ = [json.dumps({"nombre": f"C{i}", "email": f"c{i}@test.com", "skills": ["Python"]}) for i in range(3)]
+    reporte = asyncio.run(importacion.importar_candidatos(filas_ndjson(_texto(*lineas_, "roto"))))
+
+    assert reporte["procesadas"] == 4
+    assert reporte["importadas"] == 3
+    assert reporte["con_error"] == 1
+    assert reporte["errores"][0]["fila"] == 4
+    # Dos lotes: 2 filas + 2 filas (una válida, una rota)
+    assert stores[1] == [3, 3]
@@ -0,0 +1,122 @@
+"""
+Paridad entre motores de matching (MATCHING_ENGINE=cypher e indice): con los mismos candidatos
+los dos deben devolver exactamente los mismos resultados, en el mismo orden.
+La comparación contra Neo4j necesita el grafo levantado (NEO4J_URI); si no responde se saltea.
+"""
+import asyncio
+import pytest
+from src import matching
+from src.database_async import neo4j_driver_async
+from src.scoring import MatrizSkills, skills_con_relacionados
+
+PREFIJO = "paridad-"
+
+PERFILES = [
+    {"email": f"{PREFIJO}ana@test.com", "nombre": "Ana", "seniority": "Senior",
+     "skills": ["Python", "Docker", "FastAPI"], "activo": True},
+    {"email": f"{PREFIJO}beto@test.com", "nombre": "Beto", "seniority": "Junior",
+     "skills": ["python", "React"], "activo": True},
+    {"email": f"{PREFIJO}carla@test.com", "nombre": "Carla", "seniority": "Semi-Senior",
+     "skills": ["Flask", "Kubernetes", "AWS"], "activo": True},
+    {"email": f"{PREFIJO}dario@test.com", "nombre": "Darío", "seniority": "Lead",
+     "skills": ["Python", "Docker", "AWS", "TypeScript"], "activo": False},
+    {"email": f"{PREFIJO}eva@test.com", "nombre": "Eva", "seniority": None,
+     "skills": ["DOCKER", "JavaScript"], "activo": True},
+    {"email": f"{PREFIJO}fede@test.com", "nombre": "Fede", "seniority": "Senior",
+     "skills": ["Next.js", "TypeScript"], "activo": True},
+]
+
+BUSQUEDAS = [
+    ["Python"],
+    ["python", "DOCKER"],
+    ["React", "TypeScript", "Docker"],
+    ["Go"],
+]
+
+SCORING = [
+    (["Python", "Docker"], {}),
+    (["FastAPI", "Docker", "AWS"], {"pesos": {"FastAPI": 3}}),
+    (["JavaScript", "React"], {"seniority_minimo": "Semi-Senior"}),
+    (["python", "docker", "kubernetes", "aws"], {"solo_activos": True, "min_exactos": 2}),
+]
+
+K = 10_000
+
+
+def _del_fixture(resultados):
+    return [r for r in resultados if r["email"].startswith(PREFIJO)]
+
+
+def _usar_motor(monkeypatch, motor: str):
+    indice = matching.IndiceSkills()
+    for perfil in PERFILES:
+        indice.upsert(perfil)
+    monkeypatch.setattr(matching, "MATCHING_ENGINE", motor)
+    monkeypatch.setattr(matching, "indice_skills", indice)
+    monkeypatch.setattr(matching, "_indice_listo", True)
+    monkeypatch.setattr(matching, "_matriz", None)
+
+
+async def _ejecutar_consultas():
+    return (
+        [_del_fixture(await matching.buscar_por_skills(s, K)) for s in BUSQUEDAS],
+        [_del_fixture(await matching.puntuar(s, K, **o)) for s, o in SCORING],
+    )
+
+
+async def _cargar_grafo():
+    async with neo4j_driver_async.session() as session:
+        await session.run(
+            """
+            UNWIND $perfiles AS p
+            MERGE (c:Candidato {id: p.email})
+            SET c.nombre = p.nombre, c.seniority = p.seniority, c.activo = p.activo
+            WITH c, p
+            UNWIND p.skills AS skill
+            MERGE (s:Skill {nombre: skill})
+            MERGE (c)-[:DOMINA]->(s)
+            """,
+            perfiles=PERFILES
+        )
+
+
+async def _limpiar_grafo():
+    async with neo4j_driver_async.session() as session:
+        await session.run(
+            "MATCH (c:Candidato) WHERE c.id STARTS WITH $prefijo DETACH DELETE c",
+            prefijo=PREFIJO
+        )
+
+
+def test_motores_devuelven_lo_mismo(monkeypatch):
+    async def comparar():
+        try:
+            await neo4j_driver_async.verify_connectivity()
+        except Exception as e:
+            pytest.skip(f"Neo4j no disponible: {e}")
+
+        _usar_motor(monkeypatch, "indice")
+        indice = await _ejecutar_consultas()
+
+        _usar_motor(monkeypatch, "cypher")
+        await _limpiar_grafo()
+        await _cargar_grafo()
+        try:
+            cypher = await _ejecutar_consultas()
+        finally:
+            await _limpiar_grafo()
+        return indice, cypher
+
+    indice, cypher = asyncio.run(comparar())
+    assert any(indice[0]) and any(indice[1])
+    assert cypher == indice
+
+
+@pytest.mark.parametrize("skills,opciones", SCORING)
+def test_poblacion_reducida_del_motor_cypher(skills, opciones):
+    # Cypher solo trae candidatos con algún skill pedido o relacionado: no debe cambiar el resultado
+    consulta = set(skills_con_relacionados(skills))
+    perfiles = [matching.perfil_indexado(p) for p in PERFILES]
+    reducidos = [p for p in perfiles if consulta & set(p["skills_lower"])]
+
+    assert MatrizSkills(reducidos).puntuar(skills, K, **opciones) == MatrizSkills(perfiles).puntuar(skills, K, **opciones)
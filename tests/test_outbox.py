@@ -0,0 +1,131 @@
+"""
+Reclamo, reintentos y backoff del outbox (src.outbox) contra una conexión falsa:
+se verifica qué le pide el worker a PostgreSQL, sin levantar la base.
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+import pytest
+from src import outbox
+
+
+class ConexionFalsa:
+    def __init__(self, reclamados=()):
+        self.reclamados = list(reclamados)
+        self.respuestas = []
+        self.consultas = []
+
+    async def fetch(self, query, *args):
+        self.consultas.append((" ".join(query.split()), args))
+        return self.reclamados
+
+    async def execute(self, query, *args):
+        self.consultas.append((" ".join(query.split()), args))
+        return self.respuestas.pop(0) if self.respuestas else "UPDATE 0"
+
+    def ejecutadas(self, inicio: str):
+        return [args for query, args in self.consultas if query.startswith(inicio)]
+
+
+def _evento(id, tipo, intentos=1, **payload):
+    return {"id": id, "tipo": tipo, "payload": json.dumps(payload), "intentos": intentos}
+
+
+@pytest.fixture
+def conexion(monkeypatch):
+    conn = ConexionFalsa()
+
+    @asynccontextmanager
+    async def prestar():
+        yield conn
+
+    monkeypatch.setattr(outbox, "get_postgres_conn_async", prestar)
+    monkeypatch.setattr(outbox, "_manejadores", {})
+    return conn
+
+
+def test_backoff_exponencial_con_tope(monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_BACKOFF_BASE", 1.0)
+    monkeypatch.setattr(outbox, "OUTBOX_BACKOFF_MAX", 300.0)
+    assert [outbox._backoff(i) for i in (1, 2, 3, 4)] == [1, 2, 4, 8]
+    assert outbox._backoff(20) == 300
+
+
+def test_reclamo_con_lote_y_lease_configurados(conexion):
+    asyncio.run(outbox._reclamar_lote(conexion))
+    query, args = conexion.consultas[0]
+    assert "FOR UPDATE SKIP LOCKED" in query
+    assert "intentos = intentos + 1" in query
+    assert args == (outbox.OUTBOX_BATCH_SIZE, outbox.OUTBOX_LOCK_TIMEOUT)
+
+
+def test_lote_vacio(conexion):
+    assert asyncio.run(outbox.procesar_lote()) == 0
+    assert len(conexion.consultas) == 1
+
+
+def test_exitos_fallos_y_reintentos(conexion, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_INTENTOS", 3)
+    vistos = []
+
+    async def ok(payload):
+        vistos.append(payload["n"])
+
+    async def roto(payload):
+        vistos.append(payload["n"])
+        raise RuntimeError("store caído")
+
+    outbox._manejadores.update({"ok": ok, "roto": roto})
+    conexion.reclamados = [
+        _evento(4, "ok", n=4),
+        _evento(1, "ok", n=1),
+        _evento(2, "roto", intentos=1, n=2),
+        _evento(3, "roto", intentos=3, n=3),
+        _evento(5, "desconocido"),
+    ]
+
+    assert asyncio.run(outbox.procesar_lote()) == 5
+    # En orden de id, aunque el reclamo los devuelva desordenados
+    assert vistos == [1, 2, 3, 4]
+
+    fallas = {args[0]: args[1:] for args in conexion.ejecutadas("UPDATE outbox SET estado = $2")}
+    assert fallas[2] == ("pendiente", "store caído", outbox._backoff(1))
+    # Agotó los intentos: queda como fallido para revisión manual
+    assert fallas[3][0] == "fallido"
+    assert fallas[5][0] == "pendiente" and "Sin manejador" in fallas[5][1]
+
+    assert conexion.ejecutadas("UPDATE outbox SET estado = 'procesado'") == [([1, 4],)]
+
+
+def test_renueva_el_lease_del_resto_del_lote(conexion):
+    async def ok(payload):
+        pass
+
+    outbox._manejadores["ok"] = ok
+    conexion.reclamados = [_evento(i, "ok") for i in (1, 2, 3)]
+    asyncio.run(outbox.procesar_lote())
+    assert conexion.ejecutadas("UPDATE outbox SET locked_at = now()") == [([2, 3],), ([3],)]
+
+
+def test_manejador_lento_vence_por_timeout(conexion, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_EVENTO_TIMEOUT", 0.01)
+
+    async def lento(payload):
+        await asyncio.sleep(1)
+
+    outbox._manejadores["lento"] = lento
+    conexion.reclamados = [_evento(1, "lento")]
+    asyncio.run(outbox.procesar_lote())
+    (falla,) = conexion.ejecutadas("UPDATE outbox SET estado = $2")
+    assert falla[1] == "pendiente" and "timeout" in falla[2]
+
+
+def test_limpieza_borra_por_lotes_hasta_vaciar(conexion, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_LIMPIEZA_LOTE", 2)
+    conexion.respuestas = ["DELETE 2", "DELETE 2", "DELETE 1"]
+    assert asyncio.run(outbox.limpiar_procesados()) == 5
+    assert len(conexion.ejecutadas("DELETE FROM outbox")) == 3
+
+
+def test_el_deadline_por_evento_es_menor_al_lease():
+    assert outbox.OUTBOX_EVENTO_TIMEOUT < outbox.OUTBOX_LOCK_TIMEOUT
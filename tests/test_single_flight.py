@@ -0,0 +1,82 @@
+"""
+SingleFlight (src.cache): llamadas concurrentes con la misma clave comparten un solo cálculo,
+y si el que calcula se cancela otro de los que esperaban toma su lugar.
+"""
+import asyncio
+import pytest
+from src.cache import SingleFlight
+
+
+def test_llamadas_concurrentes_calculan_una_vez():
+    async def probar():
+        vuelo, llamadas = SingleFlight(), []
+
+        async def calcular():
+            llamadas.append(1)
+            await asyncio.sleep(0.01)
+            return "valor"
+
+        resultados = await asyncio.gather(*(vuelo.do("k", calcular) for _ in range(5)))
+        return resultados, llamadas, vuelo._en_vuelo
+
+    resultados, llamadas, en_vuelo = asyncio.run(probar())
+    assert resultados == ["valor"] * 5
+    assert len(llamadas) == 1
+    assert not en_vuelo
+
+
+def test_claves_distintas_no_se_agrupan():
+    async def probar():
+        vuelo = SingleFlight()
+
+        async def calcular(valor):
+            await asyncio.sleep(0.01)
+            return valor
+
+        return await asyncio.gather(vuelo.do("a", lambda: calcular(1)), vuelo.do("b", lambda: calcular(2)))
+
+    assert asyncio.run(probar()) == [1, 2]
+
+
+def test_error_se_propaga_a_los_que_esperan():
+    async def probar():
+        vuelo = SingleFlight()
+
+        async def calcular():
+            await asyncio.sleep(0.01)
+            raise ValueError("falló")
+
+        return await asyncio.gather(*(vuelo.do("k", calcular) for _ in range(3)), return_exceptions=True)
+
+    resultados = asyncio.run(probar())
+    assert all(isinstance(r, ValueError) for r in resultados)
+
+
+def test_cancelar_al_lider_pasa_el_calculo_a_otro():
+    async def probar():
+        vuelo, llamadas = SingleFlight(), []
+        liberar = asyncio.Event()
+
+        async def calcular():
+            llamadas.append(1)
+            if len(llamadas) == 1:
+                # El líder queda bloqueado hasta que se lo cancela
+                await liberar.wait()
+            await asyncio.sleep(0.01)
+            return "valor"
+
+        lider = asyncio.create_task(vuelo.do("k", calcular))
+        await asyncio.sleep(0)
+        seguidores = [asyncio.create_task(vuelo.do("k", calcular)) for _ in range(3)]
+        await asyncio.sleep(0)
+        lider.cancel()
+        resultados = await asyncio.gather(*seguidores)
+        with pytest.raises(asyncio.CancelledError):
+            await lider
+        return resultados, llamadas, vuelo._en_vuelo
+
+    resultados, llamadas, en_vuelo = asyncio.run(probar())
+    # Los que esperaban no se cancelan con el líder: uno recalcula y el resto usa su resultado
+    assert resultados == ["valor"] * 3
+    assert len(llamadas) == 2
+    assert not en_vuelo